@@ -95,6 +95,44 @@ def eps_for_Model(Model, n_node, time_limit=0.5):
 
 # }}}
 
+# equations {{{
+
+def equations():
+    import tvb.datatypes.equations as eqs
+    return [eqs.Linear, eqs.Gaussian, eqs.DoubleGaussian, eqs.Sigmoid, eqs.Sinusoid, eqs.Alpha,
+            eqs.PulseTrain, eqs.Gamma, eqs.DoubleExponential]
+
+def eps_for_Equation(Equation, n_node, time_limit=0.5):
+    "Evaluations per second of an equation's expression, with compiled programs shared between equations."
+    from tvb.datatypes.equations import _evaluate
+    equation = Equation()
+    var = numpy.linspace(0.0, 100.0, n_node)
+    # set the pattern once for equations which derive parameters, and to compile the expression
+    equation.pattern = var
+    tic = time.time()
+    n_eval = 0
+    while (time.time() - tic) < time_limit:
+        _evaluate(equation.equation, equation.parameters, var)
+        n_eval += 1
+    toc = time.time()
+    return n_eval / (toc - tic)
+
+def eps_for_numexpr_evaluate(Equation, n_node, time_limit=0.5):
+    "Evaluations per second of the same expression through numexpr.evaluate, for comparison."
+    import numexpr
+    equation = Equation()
+    var = numpy.linspace(0.0, 100.0, n_node)
+    equation.pattern = var
+    tic = time.time()
+    n_eval = 0
+    while (time.time() - tic) < time_limit:
+        numexpr.evaluate(equation.equation, local_dict={'var': var}, global_dict=equation.parameters)
+        n_eval += 1
+    toc = time.time()
+    return n_eval / (toc - tic)
+
+# }}}
+
 def eps_report_for_components(comps, eps_func):
     n_nodes = [2 << i for i in range(14)]
     sys.stdout.write('%30s' % ('n_node',))
@@ -121,5 +159,9 @@ if __name__ == '__main__':
     from tvb.simulator.integrators import RungeKutta4thOrderDeterministic
     integs = list(integrators()) + [RungeKutta4thOrderDeterministic]
     eps_report_for_components(integs, eps_for_Integrator)
+    print 'benchmarking equations'
+    eps_report_for_components(equations(), eps_for_Equation)
+    print 'benchmarking equations through numexpr.evaluate'
+    eps_report_for_components(equations(), eps_for_numexpr_evaluate)
 
 # vim: sw=4 sts=4 ai et foldmethod=marker
@@ -37,11 +37,12 @@ temporal_correlations.CrossCorrelation dataype.
 """
 
 import numpy
+import scipy.fftpack
 import tvb.datatypes.time_series as time_series
 import tvb.datatypes.temporal_correlations as temporal_correlations
 import tvb.basic.traits.core as core
+import tvb.basic.traits.types_basic as basic
 import tvb.basic.traits.util as util
-from scipy.signal.signaltools import correlate
 from tvb.basic.logger.builder import get_logger
 
 LOG = get_logger(__name__)
@@ -49,12 +50,54 @@ LOG = get_logger(__name__)
 
 
 
+def lagged_products(data, first_lag, last_lag):
+    """
+    Cross-correlation sequences of all pairs of columns of `data`, of shape
+    (time, node), for lags first_lag to last_lag inclusive, i.e.::
+
+        result[lag - first_lag, n1, n2] = sum_t data[t + lag, n1] * data[t, n2]
+
+    Each lag is a matrix product, so this is fast when few lags are needed.
+    """
+    tpts = data.shape[0]
+    result = numpy.empty((last_lag - first_lag + 1, data.shape[1], data.shape[1]))
+    for i, lag in enumerate(range(first_lag, last_lag + 1)):
+        if lag >= 0:
+            numpy.dot(data[lag:].T, data[:tpts - lag], out=result[i])
+        else:
+            numpy.dot(data[:tpts + lag].T, data[-lag:], out=result[i])
+    return result
+
+
+def spectral_products(data, first_lag, last_lag, block_bytes=2**26):
+    """
+    As lagged_products, computing all lags at once from the cross spectra of
+    the columns, which is fast when many lags are needed. The cross spectra
+    are formed for blocks of rows of the result of about block_bytes.
+    """
+    tpts, nodes = data.shape
+    nfft = scipy.fftpack.next_fast_len(tpts + max(abs(first_lag), abs(last_lag)))
+    spectra = numpy.fft.rfft(data, nfft, axis=0)
+    lags = numpy.arange(first_lag, last_lag + 1) % nfft
+    result = numpy.empty((lags.size, nodes, nodes))
+    # a block of rows of the cross spectra is as large as spectra times the number of rows
+    rows = max(1, block_bytes // spectra.nbytes)
+    for n1 in range(0, nodes, rows):
+        cross = spectra[:, n1:n1 + rows, numpy.newaxis] * spectra[:, numpy.newaxis, :].conj()
+        result[:, n1:n1 + rows] = numpy.fft.irfft(cross, nfft, axis=0)[lags]
+    return result
+
+
 class CrossCorrelate(core.Type):
     """
     Compute the node-pairwise cross-correlation of the given input 4D TimeSeries DataType.
     
     Return a CrossCorrelation DataType. It contains the cross-correlation
     sequences for all possible combinations of the nodes.
+
+    The offsets are those of `scipy.signal.correlate` with mode "same", i.e.
+    as many offsets as time points, centred on zero, restricted to +- max_lag
+    when it is given.
     
     See: http://www.scipy.org/doc/api_docs/SciPy.signal.signaltools.html#correlate
     """
@@ -63,6 +106,16 @@ class CrossCorrelate(core.Type):
         label="Time Series",
         required=True,
         doc="""The time-series for which the cross correlation sequences are calculated.""")
+
+    max_lag = basic.Float(
+        label="Maximum lag (ms)",
+        required=False,
+        default=None,
+        doc="""Largest temporal offset, positive or negative, for which the cross
+            correlation is computed and stored. By default all offsets are used.""")
+
+    # a narrower window of offsets is computed as one matrix product per offset
+    max_lagged_products = 128
     
     
     def evaluate(self):
@@ -73,27 +126,28 @@ class CrossCorrelate(core.Type):
         self.time_series.trait["data"].log_debug(owner=cls_attr_name)
         
         #(tpts, nodes, nodes, state-variables, modes)
-        result_shape = self.result_shape(self.time_series.data.shape)
+        input_shape = self.time_series.data.shape
+        first_lag, last_lag = self.lag_range(input_shape[0], self.max_lag, self.time_series.sample_period)
+        result_shape = self.result_shape(input_shape, self.max_lag, self.time_series.sample_period)
         LOG.info("result shape will be: %s" % str(result_shape))
-        
+
+        if result_shape[0] <= self.max_lagged_products:
+            products = lagged_products
+        else:
+            products = spectral_products
+
         result = numpy.zeros(result_shape)
-        
-        #TODO: For region level, 4s, 2000Hz, this takes ~3hours...(which makes node_coherence seem positively speedy...)
-        # Probably best to add a keyword for offsets, so we just compute +- some "small" range...
-        # One inter-node correlation, across offsets, for each state-var & mode.
+
+        # All inter-node correlations, across offsets, for each state-var & mode.
         for mode in range(result_shape[4]):
             for var in range(result_shape[3]):
                 data = self.time_series.data[:, var, :, mode]
                 data = data - data.mean(axis=0)[numpy.newaxis, :]
-                #TODO: Work out a way around the 4 level loop:
-                for n1 in range(result_shape[1]):
-                    for n2 in range(result_shape[2]):
-                        result[:, n1, n2, var, mode] = correlate(data[:, n1], data[:, n2], mode="same")
+                result[:, :, :, var, mode] = products(data, first_lag, last_lag)
         
         util.log_debug_array(LOG, result, "result")
         
-        offset = (self.time_series.sample_period *
-                  numpy.arange(-numpy.floor(result_shape[0] / 2.0), numpy.ceil(result_shape[0] / 2.0)))
+        offset = self.time_series.sample_period * numpy.arange(first_lag, last_lag + 1)
 
         cross_corr = temporal_correlations.CrossCorrelation(
             source=self.time_series,
@@ -102,19 +156,35 @@ class CrossCorrelate(core.Type):
             use_storage=False)
         
         return cross_corr
+
+
+    @staticmethod
+    def lag_range(tpts, max_lag=None, sample_period=None):
+        """
+        Returns the first and last offset, in samples, of the result for a
+        time series of tpts time points.
+        """
+        first_lag, last_lag = -(tpts // 2), (tpts - 1) // 2
+        if max_lag is not None:
+            if max_lag < 0:
+                raise ValueError("The maximum lag must not be negative, got %r." % (max_lag, ))
+            max_lag = int(round(max_lag / sample_period))
+            first_lag, last_lag = max(first_lag, -max_lag), min(last_lag, max_lag)
+        return first_lag, last_lag
     
     
-    def result_shape(self, input_shape):
+    def result_shape(self, input_shape, max_lag=None, sample_period=None):
         """Returns the shape of the main result of ...."""
-        result_shape = (input_shape[0], input_shape[2], input_shape[2], input_shape[1], input_shape[3])
+        first_lag, last_lag = self.lag_range(input_shape[0], max_lag, sample_period)
+        result_shape = (last_lag - first_lag + 1, input_shape[2], input_shape[2], input_shape[1], input_shape[3])
         return result_shape
     
     
-    def result_size(self, input_shape):
+    def result_size(self, input_shape, max_lag=None, sample_period=None):
         """
         Returns the storage size in Bytes of the main result of .
         """
-        result_size = numpy.sum(map(numpy.prod, self.result_shape(input_shape))) * 8.0  # Bytes
+        result_size = numpy.sum(map(numpy.prod, self.result_shape(input_shape, max_lag, sample_period))) * 8.0  # Bytes
         return result_size
 
 
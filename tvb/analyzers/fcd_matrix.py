@@ -114,27 +114,20 @@ class FcdCalculator(core.Type):
         result_shape = self.result_shape(input_shape)
 
         fcd = np.zeros(result_shape)
-        fc_stream = {}  # dict where the fc calculated over the sliding window will be stored
+        # the triangular part of the fc is organized as a vector, excluding the diagonal (always ones)
+        triangular = np.triu_indices(input_shape[2], 1)
         start = -sp  # in order to well initialize the first starting point of the FC stream
         for mode in range(result_shape[3]):
             for var in range(result_shape[2]):
+                # the fc calculated over each sliding window, one per row
+                fc_stream = np.empty((result_shape[0], len(triangular[0])))
                 for nfcd in range(result_shape[0]):
                     start += sp
                     current_slice = tuple([slice(int(start), int(start+sw) + 1), slice(var, var + 1),
                                            slice(input_shape[2]), slice(mode, mode + 1)])
                     data = self.time_series.read_data_slice(current_slice).squeeze()
-                    fc = np.corrcoef(data.T)
-                    # the triangular part of the fc is organized as a vector, excluding the diagonal (always ones)
-                    triangular = np.triu_indices(len(fc), 1)
-                    fc_stream[nfcd] = fc[triangular]
-                for i in range(result_shape[0]):
-                    j = i
-                    while j < result_shape[0]:
-                        fci = fc_stream[i]
-                        fcj = fc_stream[j]
-                        fcd[i, j, var, mode] = np.corrcoef(fci, fcj)[0, 1]
-                        fcd[j, i, var, mode] = fcd[i, j, var, mode]
-                        j += 1
+                    fc_stream[nfcd] = np.corrcoef(data.T)[triangular]
+                fcd[:, :, var, mode] = fc_stream_correlation(fc_stream, overwrite_input=True)
 
         util.log_debug_array(LOG, fcd, "FCD")
 
@@ -210,6 +203,33 @@ class FcdCalculator(core.Type):
 
 
 # Methods:
+def fc_stream_correlation(fc_stream, block_bytes=2**26, overwrite_input=False):
+    """
+    Pearson correlation between all pairs of rows of fc_stream, as np.corrcoef(fc_stream) up to
+    rounding, the sums being ordered differently. The upper triangle is computed for blocks of rows
+    of about block_bytes and mirrored block by block, so that memory use beyond fc_stream and the
+    result is a copy of fc_stream, centred, or nothing if overwrite_input allows centring in place.
+    """
+    n_windows, n_pairs = fc_stream.shape
+    centred = fc_stream if overwrite_input else fc_stream.copy()
+    centred -= centred.mean(axis=1)[:, np.newaxis]
+    stddev = np.sqrt(np.einsum('ij,ij->i', centred, centred) / (n_pairs - 1))
+    fcd = np.empty((n_windows, n_windows))
+    rows = max(1, block_bytes // (8 * n_windows))
+    for i in range(0, n_windows, rows):
+        block = np.dot(centred[i:i + rows], centred[i:].T) / (n_pairs - 1)
+        block /= stddev[i:i + rows, np.newaxis]
+        block /= stddev[np.newaxis, i:]
+        np.clip(block, -1, 1, out=block)
+        # the diagonal square of the block is mirrored from its upper triangle, the rest to the lower triangle
+        n_rows = block.shape[0]
+        square = np.triu(block[:, :n_rows])
+        fcd[i:i + n_rows, i:i + n_rows] = square + np.triu(square, 1).T
+        fcd[i:i + n_rows, i + n_rows:] = block[:, n_rows:]
+        fcd[i + n_rows:, i:i + n_rows] = block[:, n_rows:].T
+    return fcd
+
+
 def spectral_dbscan(fcd, n_dim=2, eps=0.3, min_samples=50):
     fcd = fcd - fcd.min()
     se = SpectralEmbedding(n_dim, affinity="precomputed")
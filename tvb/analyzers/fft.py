@@ -95,31 +95,25 @@ class FFT(core.Type):
         cls_attr_name = self.__class__.__name__ + ".time_series"
         self.time_series.trait["data"].log_debug(owner=cls_attr_name)
         
-        tpts = self.time_series.data.shape[0]
+        data_shape = self.time_series.read_data_shape()
+        tpts = data_shape[0]
         time_series_length = tpts * self.time_series.sample_period
         
         #Segment time-series, overlapping if necessary
         nseg = int(numpy.ceil(time_series_length / self.segment_length))
         if nseg > 1:
-            seg_tpts = numpy.ceil(self.segment_length / self.time_series.sample_period)
+            seg_tpts = int(numpy.ceil(self.segment_length / self.time_series.sample_period))
             overlap = (seg_tpts * nseg - tpts) / (nseg - 1.0)
-            starts = [max(seg * (seg_tpts - overlap), 0) for seg in range(nseg)]
-            segments = [self.time_series.data[start:start + seg_tpts]
-                        for start in starts]
-            segments = [segment[:, :, :, numpy.newaxis] for segment in segments]
-            time_series = numpy.concatenate(segments, axis=4)
+            starts = [int(max(seg * (seg_tpts - overlap), 0)) for seg in range(nseg)]
         else:
             self.segment_length = time_series_length
-            time_series = self.time_series.data[:, :, :, numpy.newaxis]
-            seg_tpts = time_series.shape[0]
+            seg_tpts = tpts
+            starts = [0]
         
         LOG.debug("Segment length being used is: %s" % self.segment_length)
         
-        #Base-line correct the segmented time-series  
-        time_series = sp_signal.detrend(time_series, axis=0)
-        util.log_debug_array(LOG, time_series, "time_series")
-        
         #Apply windowing function
+        window_mask = None
         if self.window_function is not None and self.window_function != [None]:
             if self.window_function not in SUPPORTED_WINDOWING_FUNCTIONS:
                 LOG.error("Windowing function is: %s" % self.window_function)
@@ -127,13 +121,18 @@ class FFT(core.Type):
             else:
                 window_function = eval("".join(("numpy.", self.window_function[0])))
                 window_mask = numpy.reshape(window_function(seg_tpts),
-                                            (seg_tpts, 1, 1, 1, 1))
+                                            (seg_tpts, 1, 1, 1))
+
+        #Calculate the FFT, one segment at a time so that only one is held in memory
+        nfreq = seg_tpts / 2
+        result = numpy.empty((nfreq, ) + tuple(data_shape[1:]) + (nseg, ), dtype=numpy.complex128)
+        for seg, start in enumerate(starts):
+            time_series = self.time_series.read_data_slice((slice(start, start + seg_tpts), ))
+            #Base-line correct the segmented time-series
+            time_series = sp_signal.detrend(time_series, axis=0)
+            if window_mask is not None:
                 time_series = time_series * window_mask
-
-        #Calculate the FFT
-        result = numpy.fft.fft(time_series, axis=0)
-        nfreq = result.shape[0] / 2
-        result = result[1:nfreq + 1, :]
+            result[..., seg] = numpy.fft.fft(time_series, axis=0)[1:nfreq + 1]
         util.log_debug_array(LOG, result, "result")
 
         spectra = spectral.FourierSpectrum(source=self.time_series,
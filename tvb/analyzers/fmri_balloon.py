@@ -62,10 +62,50 @@ import tvb.basic.traits.core as core
 import tvb.basic.traits.types_basic as basic
 import tvb.simulator.integrators as integrators_module
 from tvb.basic.logger.builder import get_logger
+from numba import njit
 
 LOG = get_logger(__name__)
 
 
+
+@njit
+def _balloon_dfun(s, f, v, q, x, k_s, k_f, k_o, i_alpha, E0, c_E0):
+    "The balloon model equations for one node, as `BalloonModel.balloon_dfun`."
+    ds = x - k_s * s - k_f * (f - 1)
+    df = s
+    dv = k_o * (f - v ** i_alpha)
+    dq = k_o * ((f * (1. - c_E0 ** (1. / f)) / E0) - (v ** i_alpha) * (q / v))
+    return ds, df, dv, dq
+
+
+
+@njit
+def _integrate_balloon(state, x, first, heun, v_out, q_out, dt, k_s, k_f, k_o, i_alpha, E0, c_E0):
+    """
+    Integrate the balloon model state (4, nodes) in place over the input x
+    (time, nodes) from time point `first`, storing v and q at each time point,
+    with the operations of the HeunDeterministic or EulerDeterministic scheme.
+    """
+    for t in range(first, x.shape[0]):
+        for i in range(state.shape[1]):
+            s, f, v, q = state[0, i], state[1, i], state[2, i], state[3, i]
+            ds, df, dv, dq = _balloon_dfun(s, f, v, q, x[t, i], k_s, k_f, k_o, i_alpha, E0, c_E0)
+            if heun:
+                ds_, df_, dv_, dq_ = _balloon_dfun(s + dt * ds, f + dt * df, v + dt * dv, q + dt * dq,
+                                                   x[t, i], k_s, k_f, k_o, i_alpha, E0, c_E0)
+                s = s + (ds + ds_) * dt / 2.0
+                f = f + (df + df_) * dt / 2.0
+                v = v + (dv + dv_) * dt / 2.0
+                q = q + (dq + dq_) * dt / 2.0
+            else:
+                s = s + dt * ds
+                f = f + dt * df
+                v = v + dt * dv
+                q = q + dt * dq
+            state[0, i], state[1, i], state[2, i], state[3, i] = s, f, v, q
+            v_out[t, i], q_out[t, i] = v, q
+
+
 class BalloonModel(core.Type):
     """
 
@@ -213,6 +253,8 @@ class BalloonModel(core.Type):
 
 
 
+    block_bytes = 2 ** 26
+
     def evaluate(self):
         """
         Calculate simulated BOLD signal
@@ -224,9 +266,19 @@ class BalloonModel(core.Type):
         #      input is the sum over the state-variables. Only time-series
         #      from basic monitors should be used as inputs.
 
-        neural_activity, t_int = self.input_transformation(self.time_series, self.neural_input_transformation)
-        input_shape = neural_activity.shape
-        result_shape = self.result_shape(input_shape)
+        if self.neural_input_transformation not in ("none", "abs_diff", "sum"):
+            LOG.error("Bad operation/transformation mode, must be one of:")
+            LOG.error("('abs_diff', 'sum', 'none')")
+            raise Exception("Bad transformation mode")
+
+        input_shape = self.time_series.read_data_shape()
+        if self.neural_input_transformation == "abs_diff":
+            t_int = (self.time_series.time[1:] - self.time_series.time[0:-1]) / 1000.  # (s)
+            input_shape = (input_shape[0] - 1, ) + input_shape[1:]
+        else:
+            t_int = self.time_series.time / 1000.  # (s)
+            input_shape = (input_shape[0], 1) + input_shape[2:]
+        result_shape = self.result_shape((input_shape[0], 1) + input_shape[2:])
         LOG.debug("Result shape will be: %s" % str(result_shape))
 
         if self.dt is None:
@@ -239,14 +291,70 @@ class BalloonModel(core.Type):
             msg = "Integration time step shouldn't be smaller than the sampling period of the input signal." 
             LOG.error(msg)
 
-        balloon_nvar = 4           
+        # the time series is read twice, block by block, once for the mean of the neural
+        # activity and once to integrate, trading a second pass for memory on long series
+        total = 0.0
+        for block in self._neural_input_blocks():
+            total = total + block.sum(axis=0)
+        mean = total / input_shape[0]
+
+        # Do some checks:
+        if numpy.isnan(mean).any():
+            LOG.warning("NaNs detected in the neural activity!!")
+
+        # normalise the time-series and solve equations, block by block
+        y_b = numpy.empty(result_shape)
+        step = 0
+        centred_blocks = (block - mean[numpy.newaxis, :] for block in self._neural_input_blocks())
+        for bold in self.bold_blocks(centred_blocks):
+            y_b[step:step + bold.shape[0]] = bold
+            step += bold.shape[0]
+        LOG.debug("Max value: %s" % str(y_b.max()))
+
+        sample_period = 1. / self.dt
+
+        bold_signal = time_series.TimeSeriesRegion(
+            data=y_b,
+            time=t_int,
+            sample_period=sample_period,
+            sample_period_unit='s',
+            use_storage=False)
+
+        return bold_signal
 
-        #NOTE: hard coded initial conditions
-        state = numpy.zeros((input_shape[0], balloon_nvar, input_shape[2], input_shape[3]))  # s
-        state[0, 1, :] = 1.  # f
-        state[0, 2, :] = 1.  # v
-        state[0, 3, :] = 1.  # q
 
+    def _neural_input_blocks(self):
+        "Read the neural input of the time series block by block, see `input_transformation`."
+        previous = None
+        for _, block in self.time_series.read_data_blocks(block_bytes=self.block_bytes):
+            if self.neural_input_transformation == "none":
+                yield block[:, 0:1]
+            elif self.neural_input_transformation == "sum":
+                yield numpy.sum(block, axis=1)[:, numpy.newaxis]
+            else:
+                if previous is not None:
+                    block = numpy.concatenate((previous, block))
+                previous = block[-1:]
+                yield abs(numpy.diff(block, axis=0))
+
+
+    def bold_blocks(self, neural_activity):
+        """
+        Integrate the balloon model over an iterable of blocks of neural
+        activity, of shape (time, state-variables, nodes, modes), of which
+        the first state variable is used, yielding the BOLD signal for each
+        block, of shape (time, 1, nodes, modes).
+
+        The state of the balloon model is carried from one block to the
+        next, so the memory used does not depend on the length of the
+        activity, which may be given as it is simulated. The first time
+        point gives the initial conditions. `evaluate` centres the activity
+        on its temporal mean first.
+
+        The deterministic Euler and Heun schemes are integrated by compiled
+        loops, with results equal to those of the integrator's scheme, and
+        other integrators by calling their scheme at each time step.
+        """
         # BOLD model coefficients
         k = self.compute_derived_parameters()
         k1, k2, k3 = k[0], k[1], k[2]
@@ -256,7 +364,12 @@ class BalloonModel(core.Type):
         self.integrator.configure()
         LOG.debug("Integration time step size will be: %s seconds" % str(self.integrator.dt))
 
-        scheme = self.integrator.scheme
+        compiled = (type(self.integrator) in (integrators_module.HeunDeterministic,
+                                              integrators_module.EulerDeterministic)
+                    and self.integrator.clamped_state_variable_values is None)
+        heun = type(self.integrator) is integrators_module.HeunDeterministic
+        parameters = (self.dt, 1. / self.tau_s, 1. / self.tau_f, 1. / self.tau_o, 1. / self.alpha,
+                      self.E0, 1. - self.E0)
 
         # NOTE: the following variables are not used in this integration but
         # required due to the way integrators scheme has been defined.
@@ -264,56 +377,51 @@ class BalloonModel(core.Type):
         local_coupling = 0.0
         stimulus = 0.0
 
-        # Do some checks:
-        if numpy.isnan(neural_activity).any():
-            LOG.warning("NaNs detected in the neural activity!!")
-
-        # normalise the time-series.
-        neural_activity = neural_activity - neural_activity.mean(axis=0)[numpy.newaxis, :]
-
-        # solve equations
-        for step in range(1, t_int.shape[0]):
-            state[step, :] = scheme(state[step - 1, :], self.balloon_dfun,
-                                    neural_activity[step, :], local_coupling, stimulus)
-            if numpy.isnan(state[step, :]).any():
+        state = None
+        for block in neural_activity:
+            if block.shape[0] == 0:
+                continue
+            if state is None:
+                #NOTE: hard coded initial conditions
+                balloon_nvar = 4
+                state = numpy.zeros((balloon_nvar, ) + block.shape[2:])  # s
+                state[1:] = 1.  # f, v, q
+                first = 1
+            else:
+                first = 0
+            v = numpy.empty((block.shape[0], ) + block.shape[2:])
+            q = numpy.empty((block.shape[0], ) + block.shape[2:])
+            v[:first], q[:first] = state[2], state[3]
+
+            # solve equations
+            if compiled:
+                n = state[0].size
+                _integrate_balloon(state.reshape((4, n)), block[:, 0].reshape((-1, n)), first, heun,
+                                   v.reshape((-1, n)), q.reshape((-1, n)), *parameters)
+            else:
+                for step in range(first, block.shape[0]):
+                    state = self.integrator.scheme(state, self.balloon_dfun, block[step],
+                                                   local_coupling, stimulus)
+                    v[step], q[step] = state[2], state[3]
+            if numpy.isnan(v).any() or numpy.isnan(q).any():
                 LOG.warning("NaNs detected...")
 
-        # NOTE: just for the sake of clarity, define the variables used in the BOLD model
-        s = state[:, 0, :]
-        f = state[:, 1, :]
-        v = state[:, 2, :]
-        q = state[:, 3, :]
-
-        #import pdb; pdb.set_trace()
-
-        # BOLD models
-        if self.bold_model == "nonlinear":
-            """
-            Non-linear BOLD model equations.
-            Page 391. Eq. (13) top in [Stephan2007]_
-            """
-            y_bold = numpy.array(self.V0 * (k1 * (1. - q) + k2 * (1. - q / v) + k3 * (1. - v)))
-            y_b = y_bold[:, numpy.newaxis, :, :]
-            LOG.debug("Max value: %s" % str(y_b.max()))
-
-        else:
-            """
-            Linear BOLD model equations.
-            Page 391. Eq. (13) bottom in [Stephan2007]_ 
-            """
-            y_bold = numpy.array(self.V0 * ((k1 + k2) * (1. - q) + (k3 - k2) * (1. - v)))
-            y_b = y_bold[:, numpy.newaxis, :, :]
-
-        sample_period = 1. / self.dt
-
-        bold_signal = time_series.TimeSeriesRegion(
-            data=y_b,
-            time=t_int,
-            sample_period=sample_period,
-            sample_period_unit='s',
-            use_storage=False)
-
-        return bold_signal
+            # BOLD models
+            if self.bold_model == "nonlinear":
+                """
+                Non-linear BOLD model equations.
+                Page 391. Eq. (13) top in [Stephan2007]_
+                """
+                y_bold = numpy.array(self.V0 * (k1 * (1. - q) + k2 * (1. - q / v) + k3 * (1. - v)))
+
+            else:
+                """
+                Linear BOLD model equations.
+                Page 391. Eq. (13) bottom in [Stephan2007]_ 
+                """
+                y_bold = numpy.array(self.V0 * ((k1 + k2) * (1. - q) + (k3 - k2) * (1. - v)))
+
+            yield y_bold[:, numpy.newaxis, :, :]
 
 
     def compute_derived_parameters(self):
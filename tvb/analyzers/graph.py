@@ -35,8 +35,163 @@ Useful graph analyses.
 
 """
 
+import copy
 import numpy
-import networkx
+import scipy.sparse
+import scipy.sparse.csgraph
+from numba import njit
+
+
+
+@njit
+def _shortest_path_lengths(indptr, indices, removed, sources, lengths):
+    """
+    Breadth-first search from each of the sources over the graph with the
+    given CSR structure, without the removed nodes, writing the number of
+    edges on the shortest paths to each node, or inf if it is unreachable,
+    in the rows of lengths.
+    """
+    n = lengths.shape[1]
+    frontier = numpy.empty(n, numpy.int64)
+    next_frontier = numpy.empty(n, numpy.int64)
+    for i in range(sources.shape[0]):
+        row = lengths[i]
+        row[:] = numpy.inf
+        row[sources[i]] = 0.0
+        if removed[sources[i]]:
+            continue
+        frontier[0] = sources[i]
+        n_frontier = 1
+        d = 0.0
+        while n_frontier > 0:
+            d += 1.0
+            n_next = 0
+            for j in range(n_frontier):
+                v = frontier[j]
+                for k in range(indptr[v], indptr[v + 1]):
+                    t = indices[k]
+                    if row[t] == numpy.inf and not removed[t]:
+                        row[t] = d
+                        next_frontier[n_next] = t
+                        n_next += 1
+            frontier, next_frontier = next_frontier, frontier
+            n_frontier = n_next
+
+
+
+@njit
+def _sources_through(indptr, indices, indptr_T, indices_T, removed, lengths, node):
+    """
+    Sources of the searches whose shortest path lengths change when node is
+    removed, i.e. from which some successor of node has no other predecessor
+    as close as node.
+    """
+    n = lengths.shape[0]
+    through = numpy.zeros(n, numpy.bool_)
+    for s in range(n):
+        level = lengths[s, node]
+        if s == node or level == numpy.inf:
+            continue
+        for j in range(indptr[node], indptr[node + 1]):
+            w = indices[j]
+            if w == node or removed[w] or lengths[s, w] != level + 1:
+                continue
+            alternative = False
+            for k in range(indptr_T[w], indptr_T[w + 1]):
+                u = indices_T[k]
+                if u != node and not removed[u] and lengths[s, u] == level:
+                    alternative = True
+                    break
+            if not alternative:
+                through[s] = True
+                break
+    return through
+
+
+
+@njit
+def _shortest_path_counts(A, indptr, indices, data, L, N):
+    """
+    Lengths L and numbers N of shortest paths between all nodes of the
+    graph A, as computed by the algebraic path count of `betweenness_bin`,
+    by breadth-first search from each node over the CSR form of A.
+    As there, paths are weighted by the product of the entries of A along
+    them, and the length of the path to a neighbour is the entry of A.
+    Returns the diameter, the largest number of edges on a shortest path.
+    """
+    n = A.shape[0]
+    level = numpy.zeros(n, numpy.int64)
+    frontier = numpy.empty(n, numpy.int64)
+    next_frontier = numpy.empty(n, numpy.int64)
+    diameter = 0
+    for s in range(n):
+        level[:] = 0
+        level[s] = 1
+        n_frontier = 0
+        for t in range(n):
+            L[s, t] = A[s, t]
+            N[s, t] = A[s, t]
+            if A[s, t] != 0 and t != s:
+                level[t] = 1
+                frontier[n_frontier] = t
+                n_frontier += 1
+        L[s, s] = 1.0
+        N[s, s] = 1.0
+        d = 1
+        while n_frontier > 0:
+            diameter = max(diameter, d)
+            d += 1
+            n_next = 0
+            for i in range(n_frontier):
+                v = frontier[i]
+                for j in range(indptr[v], indptr[v + 1]):
+                    t = indices[j]
+                    if level[t] == 0:
+                        level[t] = d
+                        L[s, t] = d
+                        next_frontier[n_next] = t
+                        n_next += 1
+                    if level[t] == d:
+                        N[s, t] += N[s, v] * data[j]
+            frontier, next_frontier = next_frontier, frontier
+            n_frontier = n_next
+        for t in range(n):
+            if level[t] == 0:
+                L[s, t] = numpy.inf
+            if N[s, t] == 0:
+                N[s, t] = 1.0
+        L[s, s] = 0.0
+    return diameter
+
+
+
+@njit
+def _dependency_sums(indptr_T, indices_T, data_T, L, N, diameter):
+    """
+    Betweenness centrality from the lengths and numbers of shortest paths,
+    accumulating the dependencies of each source on the nodes from the
+    farthest back to the nearest, over the CSR form of A.T.
+    """
+    n = L.shape[0]
+    centrality = numpy.zeros(n)
+    dependency = numpy.zeros(n)
+    weighted_sum = numpy.zeros(n)
+    for s in range(n):
+        dependency[:] = 0.0
+        for d in range(diameter, 1, -1):
+            weighted_sum[:] = 0.0
+            for w in range(n):
+                if L[s, w] == d:
+                    c = (1 + dependency[w]) / N[s, w]
+                    for j in range(indptr_T[w], indptr_T[w + 1]):
+                        weighted_sum[indices_T[j]] += data_T[j] * c
+            for v in range(n):
+                if L[s, v] == d - 1:
+                    dependency[v] += weighted_sum[v] * N[s, v]
+        for v in range(n):
+            centrality[v] += dependency[v]
+    return centrality
+
 
 
 def betweenness_bin(A):
@@ -65,40 +220,21 @@ def betweenness_bin(A):
     
     """
     
-    n   = len(A)
-    I   = numpy.eye(n)        # logical ID matrix                                        
-    d   = 1                   # path length
-    number_of_paths_d         = A.copy()           # number of paths of length |d|
-    number_of_shortest_paths_d= A.copy()           # number of shortest paths of length |d|
-    number_of_shortest_paths  = A.copy()           # number of shortest paths of any length
-    length_of_shortest_paths  = A.copy()           # length of shortest paths
-        
-    number_of_shortest_paths[numpy.where(I)] = 1
-    length_of_shortest_paths[numpy.where(I)] = 1
-
-    #compute the number of shortest paths and their lengths
-    while numpy.any(number_of_shortest_paths_d):
-        d += 1
-        number_of_paths_d          = numpy.dot(number_of_paths_d, A)
-        number_of_shortest_paths_d = number_of_paths_d * (length_of_shortest_paths == 0)
-        number_of_shortest_paths  += number_of_shortest_paths_d
-        length_of_shortest_paths   = length_of_shortest_paths + d * (number_of_shortest_paths_d != 0)
+    A = numpy.asarray(A, dtype=numpy.float64)
+    n = len(A)
 
-    length_of_shortest_paths[length_of_shortest_paths == 0] = numpy.inf       # length for disconnected vertices is inf
-    length_of_shortest_paths[numpy.where(I)] = 0.0
-    number_of_shortest_paths[number_of_shortest_paths == 0] = 1.0  # number of shortest paths for disconn vertices is 1
+    # the number of shortest paths and their lengths, by breadth-first search
+    # from each node instead of powers of A, as sparse graphs have few edges
+    adjacency = scipy.sparse.csr_matrix(A)
+    length_of_shortest_paths = numpy.empty((n, n))
+    number_of_shortest_paths = numpy.empty((n, n))
+    diam = _shortest_path_counts(A, adjacency.indptr, adjacency.indices, adjacency.data,
+                                 length_of_shortest_paths, number_of_shortest_paths)
 
-    dependency = numpy.zeros((n, n))  # node on node dependency
-    diam = d - 1                      # graph diameter
-    
     #calculate dependency
-    for d in xrange(diam, 1, -1):
-        temp = (numpy.dot(((length_of_shortest_paths == d) * (1 + dependency) / number_of_shortest_paths), A.T)
-                * ((length_of_shortest_paths == (d - 1)) * number_of_shortest_paths))
-                #temp: dependencies on vertices |d-1| from source
-        dependency += temp
-                
-    return dependency.sum(axis=0)
+    predecessors = adjacency.T.tocsr()
+    return _dependency_sums(predecessors.indptr, predecessors.indices, predecessors.data,
+                            length_of_shortest_paths, number_of_shortest_paths, diam)
 
 
 
@@ -126,7 +262,7 @@ def efficiency_bin(A, compute_local_efficiency=False):
     **References:** [1] Latora and Marchiori (2001) Phys Rev Lett 87:198701.
     
     
-    .. note:: Algorithm: algebraic path count
+    .. note:: Algorithm: breadth first search from each node
     .. note:: Original: Mika Rubinov, UNSW, 2008-2010 - From BCT 2012-12-04
     .. note:: Tested with  Numpy 1.7
     
@@ -181,25 +317,83 @@ def distance_inv(G):
     :param G: binary undirected connection matrix
     :returns: D: matrix of inverse distances
     """
-    L = numpy.zeros(G.shape)
-    D = numpy.eye(G.shape[0])
-    n = 1
-    nPATH = G.copy()                     # n-path matrix
-    L[nPATH != 0] = 1.                   # shortest n-path matrix
-
-    while L.sum() != 0:
-        D += n * L
-        n += 1
-        nPATH = numpy.dot(nPATH, G)
-        L = (nPATH > 0) * (D == 0)
-
-    D[D == 0] = numpy.inf
+    adjacency = scipy.sparse.csr_matrix(G != 0)
+    n = G.shape[0]
+    D = numpy.empty((n, n))
+    _shortest_path_lengths(adjacency.indptr, adjacency.indices, numpy.zeros(n, dtype=bool), numpy.arange(n), D)
+    return _inverse_distances(D, numpy.diag(G) != 0)
+
+
+
+def _inverse_distances(D, loops):
+    """
+    Invert a matrix of shortest path lengths with zeros on the diagonal as
+    `distance_inv`, where nodes with a self connection are at distance 2
+    from themselves.
+    """
+    D = D.copy()
+    numpy.fill_diagonal(D, 1.0 + loops)
     D = 1 / D                                # invert distance
-    D = D - numpy.eye(G.shape[0])
+    D = D - numpy.eye(D.shape[0])
     return D
 
 
 
+class _Lesion(object):
+    """
+    Inverse shortest path lengths and first connected component of a graph,
+    which are updated as nodes are removed from it, by searching again only
+    from the nodes whose shortest path lengths change.
+    """
+
+    def __init__(self, A):
+        n = A.shape[0]
+        adjacency = scipy.sparse.csr_matrix(A != 0)
+        predecessors = adjacency.T.tocsr()
+        undirected = adjacency + predecessors
+        self.structure = adjacency.indptr, adjacency.indices, predecessors.indptr, predecessors.indices
+        self.undirected = undirected.indptr, undirected.indices
+        self.removed = numpy.zeros(n, dtype=bool)
+        self.loops = adjacency.diagonal() != 0
+        self.lengths = numpy.empty((n, n))
+        self.inverse = numpy.empty((n, n))
+        self._search(numpy.arange(n))
+        self.component = numpy.empty((1, n))
+        _shortest_path_lengths(self.undirected[0], self.undirected[1], self.removed, numpy.zeros(1, int), self.component)
+
+    def _search(self, sources):
+        lengths = numpy.empty((sources.size, self.lengths.shape[1]))
+        _shortest_path_lengths(self.structure[0], self.structure[1], self.removed, sources, lengths)
+        self.lengths[sources] = lengths
+        lengths[numpy.arange(sources.size), sources] = 1.0 + self.loops[sources]
+        self.inverse[sources] = 1 / lengths
+        self.inverse[sources, sources] -= 1.0
+
+    def remove(self, node):
+        "Remove all connections of node."
+        if self.removed[node]:
+            return
+        sources = numpy.flatnonzero(_sources_through(*self.structure + (self.removed, self.lengths, node)))
+        self.removed[node] = True
+        self.loops[node] = False
+        self.lengths[:, node] = numpy.inf
+        self.inverse[:, node] = 0.0
+        self._search(numpy.r_[node, sources])
+        if numpy.isfinite(self.component[0, node]):
+            _shortest_path_lengths(self.undirected[0], self.undirected[1], self.removed, numpy.zeros(1, int),
+                                   self.component)
+
+    def global_efficiency(self):
+        "Global efficiency as `efficiency_bin`."
+        n = self.inverse.shape[0]
+        return self.inverse.sum() / (n ** 2 - n)
+
+    def first_component_size(self):
+        "Size of the connected component of the first node as `get_components_sizes`."
+        return numpy.isfinite(self.component).sum()
+
+
+
 def get_components_sizes(A):
     """
     Get connected components sizes.
@@ -215,8 +409,9 @@ def get_components_sizes(A):
         - size  of the largest component
     
     :raises: Value Error - If A is not square.
-              
-    .. warning::       Requires NetworkX
+
+    .. note:: As the first component found is the one containing the first node,
+              this is the size of that component, which may not be the largest.
 
     **Author:**        Paula Sanz Leon
     
@@ -233,19 +428,10 @@ def get_components_sizes(A):
     else:
         pass
 
-    # Binarize without modifying the original matrix (in case A is weighted)
-    temp_A = A.copy()
-    temp_A[temp_A > 0] = 1.0    
-
-    # Set diagonal elements to one
-    if numpy.diag(A).sum() != A.shape[0]:
-       numpy.fill_diagonal(temp_A, 1.0)
-    
-    # build a networkX graph to get largest connected component.
-    components = networkx.connected_components(networkx.from_numpy_matrix(numpy.matrix(temp_A)))
-    # For the time being returns the size of the largest component
-    component_sizes = [len(x) for x in components][0]
-    return component_sizes
+    # The first component is the one of the first node: breadth first search from it
+    # over the connections, in either direction.
+    return scipy.sparse.csgraph.breadth_first_order(scipy.sparse.csr_matrix(A != 0), 0, directed=False,
+                                                    return_predecessors=False).size
 
 
 
@@ -284,6 +470,7 @@ def sequential_random_deletion(white_matter, random_sequence, nor):
     temp_strength = white_matter.weights.copy()
     temp_degree   = white_matter.weights.copy()
     temp_degree[temp_degree > 0.0] = 1.0
+    lesion = _Lesion(temp_degree)
 
     for i, idx in enumerate(random_sequence):
             # delete rows
@@ -305,10 +492,11 @@ def sequential_random_deletion(white_matter, random_sequence, nor):
             node_degree[:, i] = in_degree + out_degree
         
             # efficiency
-            global_efficieny[i] = efficiency_bin(temp_degree)
+            lesion.remove(idx)
+            global_efficieny[i] = lesion.global_efficiency()
         
             # largest connected component
-            largest_component[i] = get_components_sizes(temp_degree)
+            largest_component[i] = lesion.first_component_size()
             
     return node_strength, node_degree, global_efficieny, largest_component
 
@@ -355,6 +543,9 @@ def sequential_targeted_deletion(white_matter, nor):
     temp_degree   = white_matter.weights.copy()
     temp_bc       = white_matter.weights.copy()
     temp_degree[temp_degree > 0.0] = 1.0
+    # the three binary graphs are the same before the first lesion
+    lesions = [_Lesion(temp_degree)]
+    lesions += [copy.deepcopy(lesions[0]) for _ in range(2)]
 
     for idx in range(nor - 2):
 
@@ -387,15 +578,14 @@ def sequential_targeted_deletion(white_matter, nor):
             temp_bc[sorted_bc_indices[-1], :] = 0.0
             temp_bc[:, sorted_bc_indices[-1]] = 0.0
             
-            # global efficiency (BU)
-            global_efficiency[idx, 0] = efficiency_bin(temp_strength)  # compute the global eff of the binary matrix ver
-            global_efficiency[idx, 1] = efficiency_bin(temp_degree)
-            global_efficiency[idx, 2] = efficiency_bin(temp_bc)
-        
-            # largest connected component (BU)
-            largest_component[idx, 0] = get_components_sizes(temp_strength)
-            largest_component[idx, 1] = get_components_sizes(temp_degree)
-            largest_component[idx, 2] = get_components_sizes(temp_bc)
+            lesions[0].remove(sorted_strength_indices[-1])
+            lesions[1].remove(sorted_degree_indices[-1])
+            lesions[2].remove(sorted_bc_indices[-1])
+
+            # global efficiency (BU) and largest connected component (BU)
+            for j, lesion in enumerate(lesions):
+                global_efficiency[idx, j] = lesion.global_efficiency()
+                largest_component[idx, j] = lesion.first_component_size()
             
     return node_strength, node_degree, node_betweenness_centrality, global_efficiency, largest_component
 
@@ -38,6 +38,29 @@ TODO: Convert sampen to a traited class
 
 """
 import numpy
+from scipy.spatial import cKDTree
+
+
+
+def _count_matches(y, n, r, na=numpy.newaxis, r_=numpy.r_):
+    """
+    Count the pairs of distinct templates of n consecutive values of y, all
+    of whose values differ by less than r, i.e. whose Chebyshev distance is
+    less than r.
+
+    The pairs are counted by a k-d tree, without comparing every pair of
+    templates. Templates with non-finite values, which match no others, are
+    left out.
+    """
+    templates = y[r_[0:n] + r_[0:y.size - n + 1][:, na]]
+    templates = templates[numpy.isfinite(templates).all(axis=1)]
+    if not r > 0 or templates.shape[0] < 2:
+        return numpy.int64(0)
+    tree = cKDTree(templates)
+    # the tree counts ordered pairs, including each template with itself, up to
+    # and including a distance, so use the largest distance less than r
+    pairs = tree.count_neighbors(tree, numpy.nextafter(r, 0), p=numpy.inf)
+    return numpy.int64((pairs - templates.shape[0]) // 2)
 
 
 
@@ -54,6 +77,9 @@ def sampen(y, m=2, r=None, qse=False, taus=1, info=False,
     Currently, the implementation is lazy and expects or coerces scale factors
     to integer values.
 
+    If y is 2D, e.g. (time, nodes), the entropy of each column is computed,
+    with its own default r, and the node axis is the last of the result.
+
     With qse=True (default) the probability p is normalized for the value
     of r, giving the quadratic sample entropy, such that results from different
     values of r can be meaningfully compared (ref 2).
@@ -71,33 +97,27 @@ def sampen(y, m=2, r=None, qse=False, taus=1, info=False,
 
     """
 
-    # if multiple scales given, run on each
-    if type(taus) in (list, numpy.ndarray):
-        return numpy.array([sampen(y, m=m, r=r, qse=qse, taus=int(tau)) for tau in taus])
+    y = numpy.asarray(y)
 
-    # helper function to reformat arrays for matching
-    subseq = lambda y, n: y[tile(r_[0:n], (y.size - n + 1, 1)) + r_[0:y.size - n + 1][:, na]]
+    # if a 2D signal is given, e.g. (time, nodes), run on each column
+    if y.ndim > 1:
+        return numpy.array([sampen(y_, m=m, r=r, qse=qse, taus=taus, info=info) for y_ in y.T]).T
 
     # default value of r
     if r is None:
         r = 0.15 * y.std()
 
+    # if multiple scales given, run on each
+    if type(taus) in (list, numpy.ndarray):
+        return numpy.array([sampen(y, m=m, r=r, qse=qse, taus=int(tau)) for tau in taus])
+
     # if we have a scale factor, coarsen time series 
     if taus > 1:
         y = y[:y.shape[0] / taus * taus].reshape((-1, taus)).mean(axis=1)
 
-    # compute embedding of signal dims m, m+1, initialize match counts to 0
-    Y1 = subseq(y, m)
-    Y2 = subseq(y, m + 1)
-    c1 = 0
-    c2 = 0
-
-    # check for matches
-    for i in range(Y1.shape[0] - 1):
-        c1 += (abs(tile(Y1[i], (Y1.shape[0] - i - 1, 1)) - Y1[i + 1:]) < r).all(axis=1).sum()
-
-    for i in range(Y2.shape[0] - 1):
-        c2 += (abs(tile(Y2[i], (Y2.shape[0] - i - 1, 1)) - Y2[i + 1:]) < r).all(axis=1).sum()
+    # count matches of embedding of signal dims m, m+1
+    c1 = _count_matches(y, m, r)
+    c2 = _count_matches(y, m + 1, r)
 
     # ref 2, last paragraph of methods, warn inaccurate estimate
     if c2 < 5:
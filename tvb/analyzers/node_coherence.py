@@ -95,28 +95,38 @@ def coherence_mlab(data, sample_rate, nfft=256):
     return coh, freq
 
 
-def coherence(data, sample_rate, nfft=256, imag=False):
-    "Vectorized coherence calculation by windowed FFT"
+def coherence(data, sample_rate, nfft=256, imag=False, block_bytes=2**26):
+    """
+    Vectorized coherence calculation by windowed FFT
+
+    The windows are read from data, which may be memory-mapped, and
+    transformed in blocks whose cross spectra take about block_bytes.
+    """
     nt, ns, nn, nm = data.shape
     nwin = nt / nfft
     if nwin < 1:
         raise ValueError(
             "Not enough time points ({0}) to compute an FFT, given a "
             "window size of nfft={1}.".format(nt, nfft))
-    # ignore leftover data; need shape (nn, ... , nwin, nfft)
-    wins = data[:nwin * nfft]\
-        .copy()\
-        .transpose((2, 1, 3, 0))\
-        .reshape((nn, ns, nm, nwin, nfft))
-    wins *= hamming(nfft)
-    F = numpy.fft.fft(wins)
     fs = numpy.fft.fftfreq(nfft, 1e3 / sample_rate)
-    # broadcasts to [node_i, node_j, ..., window, time]
-    G = F[:, numpy.newaxis] * F.conj()
-    if imag:
-        G = G.imag
-    dG = numpy.array([G[i, i] for i in range(nn)])
-    C = (numpy.abs(G)**2 / (dG[:, numpy.newaxis] * dG)).mean(axis=-2)
+    C = 0.0
+    block_nwin = max(1, block_bytes // (16 * nn * nn * ns * nm * nfft))
+    # ignore leftover data
+    for first in range(0, nwin, block_nwin):
+        last = min(first + block_nwin, nwin)
+        # need shape (nn, ... , nwin, nfft)
+        wins = numpy.array(data[first * nfft:last * nfft])\
+            .transpose((2, 1, 3, 0))\
+            .reshape((nn, ns, nm, last - first, nfft))
+        wins *= hamming(nfft)
+        F = numpy.fft.fft(wins)
+        # broadcasts to [node_i, node_j, ..., window, time]
+        G = F[:, numpy.newaxis] * F.conj()
+        if imag:
+            G = G.imag
+        dG = numpy.array([G[i, i] for i in range(nn)])
+        C += (numpy.abs(G)**2 / (dG[:, numpy.newaxis] * dG)).sum(axis=-2)
+    C /= nwin
     mask = fs > 0.0
     # C_ = numpy.abs(C.mean(axis=0).mean(axis=0))
     return numpy.transpose(C[..., mask], (4, 0, 1, 2, 3)), fs[mask]
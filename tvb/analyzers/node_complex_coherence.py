@@ -49,13 +49,6 @@ LOG = get_logger(__name__)
 SUPPORTED_WINDOWING_FUNCTIONS = ("hamming", "bartlett", "blackman", "hanning")
 
 
-#NOTE: Work only with 2D TimeSeries -- otherwise a MemoryError will raise
-        # My first attempts made use of itertools on the 4D TimeSeries but they were 
-        # fruitless.
-        # Nested `for` loops seem a 'good' solution instead of creating enormous ndarrays
-        # to compute the FFT and derived complex spectra at once
-#TODO: add more logs 
-
 class NodeComplexCoherence(core.Type):
     """
     A class for calculating the FFT of a TimeSeries and returning
@@ -82,6 +75,11 @@ class NodeComplexCoherence(core.Type):
         
     By default the time series is segmented into 1 second `epoch` blocks and 0.5
     second 50% overlapping `segments` to which a Hanning function is applied. 
+
+    The time series is read in blocks of segments of at most `block_bytes`,
+    so recordings which do not fit in memory can be analysed, and the cross
+    spectra of all frequencies are accumulated as one batched matrix product
+    per block.
     
     """
     
@@ -179,6 +177,9 @@ class NodeComplexCoherence(core.Type):
         order = -1,
         doc = """This attribute appears to be related to an input projection 
             matrix... Which is not yet implemented""")
+
+    # approximate size of the blocks of segments read from the time series
+    block_bytes = 2**26
         
     
     def evaluate(self):
@@ -189,14 +190,12 @@ class NodeComplexCoherence(core.Type):
         """
         cls_attr_name = self.__class__.__name__+".time_series"
         self.time_series.trait["data"].log_debug(owner = cls_attr_name)
-        tpts = self.time_series.data.shape[0]
-        time_series_length = tpts * self.time_series.sample_period
-        
-        if len(self.time_series.data.shape) > 2:
-            time_series_data = numpy.squeeze((self.time_series.data.mean(axis=-1)).mean(axis=1))
-        
-        #nchan = time_series_data.shape[1]
-        
+        input_shape = self.time_series.read_data_shape()
+        sample_period = self.time_series.sample_period
+        tpts = input_shape[0]
+        time_series_length = tpts * sample_period
+        nchan = input_shape[2] if len(input_shape) > 2 else input_shape[1]
+
         #NOTE: if we get a projection matrix ... then ...
         #if self.npat > 1: 
         #    data = data * proj
@@ -205,148 +204,80 @@ class NodeComplexCoherence(core.Type):
         #Divide time-series into epochs, no overlapping
         if self.epoch_length > 0.0:
             nepochs = int(numpy.floor(time_series_length / self.epoch_length))
-            epoch_tpts = self.epoch_length / self.time_series.sample_period
+            epoch_tpts = int(self.epoch_length / sample_period)
             time_series_length = self.epoch_length
             tpts = epoch_tpts
         else: 
             self.epoch_length = time_series_length
-            nepochs = int(numpy.ceil(time_series_length / self.epoch_length))
+            nepochs = 1
+            epoch_tpts = tpts
             
         #Segment time-series, overlapping if necessary
         nseg = int(numpy.floor(time_series_length / self.segment_length))
         if nseg > 1:
-            seg_tpts = self.segment_length / self.time_series.sample_period
-            seg_shift_tpts = self.segment_shift / self.time_series.sample_period
+            seg_tpts = int(self.segment_length / sample_period)
+            seg_shift_tpts = int(self.segment_shift / sample_period)
             nseg = int(numpy.floor((tpts - seg_tpts) / seg_shift_tpts) + 1)
         else:
             self.segment_length = time_series_length
-            seg_tpts = time_series_data.shape[0]
-
-        # Frequency vectors
-        freqs = numpy.fft.fftfreq(int(seg_tpts))
-        nfreq = numpy.min([self.max_freq, numpy.floor((seg_tpts + self.zeropad) / 2.0) + 1])
-        freqs = freqs[0:nfreq,] * (1.0/ self.time_series.sample_period)
-        
-        
-        result_shape, av_result_shape = self.result_shape(
-                                        self.time_series.data.shape, 
-                                        self.max_freq, 
-                                        self.epoch_length, 
-                                        self.segment_length, 
-                                        self.segment_shift, 
-                                        self.time_series.sample_period, 
-                                        self.zeropad, 
-                                        self.average_segments)
-        
-        cs = numpy.zeros(result_shape, dtype=numpy.complex128)
-        av = numpy.matrix(numpy.zeros(av_result_shape, dtype=numpy.complex128))
-        coh = numpy.zeros(result_shape, dtype=numpy.complex128)
-
-        # NOTE: result for individual epochs are kept only if npat > 1. Skipping ...
-        #if self.npat > 1:
-        #    if not self.average_segments:
-        #        cs = numpy.zeros((nchan, nchan, nfreq, nepochs, nseg), dtype=numpy.complex128)
-        #        av = numpy.zeros((nchan, nfreq, nepochs, nseg), dtype=numpy.complex128)
-        #    else:
-        #        av = numpy.zeros((nchan, nfreq, nepochs), dtype=numpy.complex128)
-        #        cs = numpy.zeros((nchan, nchan, nfreq, nepochs), dtype=numpy.complex128) 
-  
+            seg_tpts = seg_shift_tpts = tpts
+            nseg = 1
 
+        nfreq = int(numpy.min([self.max_freq, numpy.floor((seg_tpts + self.zeropad) / 2.0) + 1]))
 
         #Apply windowing function
+        window_mask = numpy.ones((seg_tpts, 1))
         if self.window_function is not None:
             if self.window_function not in SUPPORTED_WINDOWING_FUNCTIONS:
                 LOG.error("Windowing function is: %s" % self.window_function)
                 LOG.error("Must be in: %s" % str(SUPPORTED_WINDOWING_FUNCTIONS))
-            
-            window_function = eval("".join(("numpy.", self.window_function)))
-            win = window_function(seg_tpts)
-            window_mask = (numpy.kron(numpy.ones((time_series_data.shape[1], 1)), win)).T
+            window_mask = getattr(numpy, self.window_function)(seg_tpts)[:, numpy.newaxis]
 
-        nave = 0
-    
-        for j in numpy.arange(nepochs):
-            data = time_series_data[j*epoch_tpts:(j+1)*epoch_tpts, :]
-        
-            for i in numpy.arange(nseg): #average over all segments;
-                time_series = data[i*seg_shift_tpts: i*seg_shift_tpts + seg_tpts, :]
-            
-                if self.detrend_ts:
-                    time_series = sp_signal.detrend(time_series, axis=0)
-            
-                datalocfft = numpy.fft.fft(time_series * window_mask, axis=0)
-                datalocfft = numpy.matrix(datalocfft)
-            
-                for f in numpy.arange(nfreq): #for all frequencies
-                    if self.npat == 1:
-                        if not self.average_segments:
-                            cs[:, :, f, i] += numpy.conjugate(
-                                              datalocfft[f, :].conj().T * \
-                                              datalocfft[f, :])
-                            av[:, f, i] += numpy.conjugate(datalocfft[f, :].conj().T)
-                        else:
-                            cs[:, :, f] += numpy.conjugate(
-                                           datalocfft[f,:].conj().T * \
-                                           datalocfft[f, :])
-                            av[:, f] += numpy.conjugate(datalocfft[f, :].conj().T)
-                    else:
-                        if not self.average_segments:
-                            cs[:, :, f, j, i] = numpy.conjugate(
-                                                datalocfft[f, :].conj().T * \
-                                                datalocfft[f, :])
-                            av[:, f, j, i] = numpy.conjugate(datalocfft[f, :].conj().T)  
-                        else:
-                            cs[:, :, f, j] += numpy.conjugate(
-                                           datalocfft[f,:].conj().T *\
-                                           datalocfft[f,:])
-                                                 
-                            av[:, f, j] += numpy.conjugate(datalocfft[f, :].conj().T)  
-                del datalocfft
-          
-            nave += 1.0
-        
-        # End of FORs
-        if not self.average_segments:
-            cs = cs / nave
-            av = av / nave
+        # cross spectra and averages with frequency first, for batched products over frequencies
+        if self.average_segments:
+            cs = numpy.zeros((nfreq, nchan, nchan), dtype=numpy.complex128)
+            av = numpy.zeros((nfreq, nchan), dtype=numpy.complex128)
         else:
+            cs = numpy.zeros((nfreq, nseg, nchan, nchan), dtype=numpy.complex128)
+            av = numpy.zeros((nfreq, nseg, nchan), dtype=numpy.complex128)
+
+        # a segment is read with all state variables and modes, then transformed as complex numbers
+        n_averaged = int(numpy.prod(input_shape[1:])) // nchan
+        block_nseg = max(1, int(self.block_bytes // (seg_tpts * nchan * max(16, 8 * n_averaged))))
+        for j in range(nepochs):
+            for i in range(0, nseg, block_nseg):
+                segments = range(i, min(i + block_nseg, nseg))
+                data = self._read_segments(j * epoch_tpts, segments, seg_tpts, seg_shift_tpts)
+                if self.detrend_ts:
+                    data = sp_signal.detrend(data, axis=1)
+                # (freq, segment, channel)
+                datalocfft = numpy.fft.fft(data * window_mask, axis=1)[:, :nfreq].transpose((1, 0, 2))
+                if self.average_segments:
+                    cs += numpy.matmul(datalocfft.transpose((0, 2, 1)), datalocfft.conj())
+                    av += datalocfft.sum(axis=1)
+                else:
+                    cs[:, segments] += datalocfft[..., numpy.newaxis] * datalocfft[..., numpy.newaxis, :].conj()
+                    av[:, segments] += datalocfft
+
+        nave = float(nepochs)
+        if self.average_segments:
             nave = nave * nseg
-            cs = cs / nave
-            av = av / nave
-        
+        cs /= nave
+        av /= nave
+
         # Subtract average
-        for f in numpy.arange(nfreq):
-            if self.subtract_epoch_average:
-                if self.npat == 1:
-                    if not self.average_segments:
-                        for i in numpy.arange(nseg):
-                            cs[:, :, f, i] = cs[:, :, f, i] - av[:, f, i] *  av[:, f, i].conj().T
-                    else:
-                        cs[:, :, f] = cs[:, :, f] - av[:, f] * av[:, f].conj().T
-                else:
-                    if not self.average_segments:
-                        for i in numpy.arange(nseg):
-                            for j in numpy.arange(nepochs):
-                                cs[:, :, f, j, i] = cs[:, :, f, j, i] - av[:, f, j, i] * av[:, f, j, i].conj().T
-                            
-                    else: 
-                        for j in numpy.arange(nepochs):
-                            cs[:, :, f, j] = cs[:, :, f, j] - av[:, f, j] * av[:, f, j].conj().T
-        
-        #Compute Complex Coherence        
-        ndim = len(cs.shape)
-        if ndim == 3:
-            for i in numpy.arange(cs.shape[2]):
-                temp = numpy.matrix(cs[:, :, i])
-                coh[:, :, i] = cs[:, :, i] / numpy.sqrt((temp.diagonal().conj().T) * temp.diagonal())
-            
-        elif ndim == 4:
-            for i in numpy.arange(cs.shape[2]):
-                for j in numpy.arange(cs.shape[3]):
-                    temp = numpy.matrix(numpy.squeeze(cs[:, :, i, j]))
-                    coh[:, :, i, j] = temp / numpy.sqrt((temp.diagonal().conj().T) * temp.diagonal().T)
-        
-        
+        if self.subtract_epoch_average:
+            cs -= av[..., :, numpy.newaxis] * av[..., numpy.newaxis, :].conj()
+
+        #Compute Complex Coherence
+        auto = cs.diagonal(axis1=-2, axis2=-1)
+        coh = cs / numpy.sqrt(auto.conj()[..., :, numpy.newaxis] * auto[..., numpy.newaxis, :])
+
+        # (channel, channel, freq[, segment])
+        order = (1, 2, 0) if self.average_segments else (2, 3, 0, 1)
+        cs = cs.transpose(order)
+        coh = coh.transpose(order)
+
         util.log_debug_array(LOG, cs, "result")
         spectra = spectral.ComplexCoherenceSpectrum(source = self.time_series,
                                   array_data = coh,
@@ -358,6 +289,21 @@ class NodeComplexCoherence(core.Type):
     #                             fft_points = seg_tpts,
                                   use_storage = False)
         return spectra
+
+
+    def _read_segments(self, first_tpt, segments, seg_tpts, seg_shift_tpts):
+        """
+        Read the given segments of an epoch starting at first_tpt, as an array
+        of shape (segment, time, channel), averaged over state variables and modes.
+        """
+        start = first_tpt + segments[0] * seg_shift_tpts
+        stop = first_tpt + segments[-1] * seg_shift_tpts + seg_tpts
+        data_slice = (slice(start, stop), ) + (slice(None), ) * (len(self.time_series.read_data_shape()) - 1)
+        data = self.time_series.read_data_slice(data_slice)
+        if data.ndim > 2:
+            data = data.mean(axis=-1).mean(axis=1)
+        offsets = (numpy.array(segments) - segments[0]) * seg_shift_tpts
+        return data[offsets[:, numpy.newaxis] + numpy.arange(seg_tpts)]
     
     
     @staticmethod
@@ -367,11 +313,11 @@ class NodeComplexCoherence(core.Type):
         Returns the shape of the main result and the average over epochs
         """
         # this is useless here unless the input could actually be a 2D timeseries
-        nchan = numpy.where(len(input_shape) > 2, input_shape[2], input_shape[1])
-        seg_tpts = segment_length / sample_period
-        seg_shift_tpts = segment_shift / sample_period
-        tpts  = numpy.where(epoch_length > 0.0, epoch_length / sample_period, input_shape[0])
-        nfreq = numpy.min([max_freq, numpy.floor((seg_tpts + zeropad) / 2.0) + 1])
+        nchan = input_shape[2] if len(input_shape) > 2 else input_shape[1]
+        seg_tpts = int(segment_length / sample_period)
+        seg_shift_tpts = int(segment_shift / sample_period)
+        tpts  = int(epoch_length / sample_period) if epoch_length > 0.0 else input_shape[0]
+        nfreq = int(numpy.min([max_freq, numpy.floor((seg_tpts + zeropad) / 2.0) + 1]))
         #nep   = int(numpy.floor(input_shape[0] / epoch_length))
         nseg  = int(numpy.floor((tpts - seg_tpts) / seg_shift_tpts) + 1)
 
@@ -47,6 +47,144 @@ LOG = get_logger(__name__)
 
 
 
+class StreamingCovariance(object):
+    """
+    Temporal covariance between nodes of 4D data given incrementally, e.g.
+    block by block from disk or sample by sample from a running simulation::
+
+        stream = StreamingCovariance()
+        for (time, tavg), in sim(simulation_length=60e3):
+            stream.update(tavg)
+        fc = stream.correlation
+
+    Each block is merged into the running means and co-moments with the
+    update of Chan et al., so the data are read once and memory use does not
+    depend on their length. Samples given one at a time are buffered into
+    blocks of about `block_bytes`, so the co-moments are updated with matrix
+    products rather than one outer product per sample.
+
+    Streams fed separately, e.g. with different parts of the data, can be
+    combined with `merge`.
+
+    The results are as numpy.cov and numpy.corrcoef, for each state variable
+    and mode, i.e. arrays of shape (nodes, nodes, state-variables, modes).
+    """
+
+    block_bytes = 2 ** 26
+
+    def __init__(self):
+        self.count = 0
+        self.mean = None
+        self._comoment = None
+        self._buffer = None
+        self._buffered = 0
+
+    def update(self, data):
+        """
+        Add data of shape (time, state-variables, nodes, modes), or a single
+        sample of shape (state-variables, nodes, modes).
+        """
+        data = numpy.asarray(data)
+        if data.ndim == 3:
+            data = data[numpy.newaxis]
+        self._check_sample_shape(data.shape[1:])
+        block_tpts = self._buffer.shape[0]
+        while data.shape[0] > 0:
+            if self._buffered == 0 and data.shape[0] >= block_tpts:
+                self._merge(data[:block_tpts])
+                data = data[block_tpts:]
+                continue
+            tpts = min(block_tpts - self._buffered, data.shape[0])
+            self._buffer[self._buffered:self._buffered + tpts] = data[:tpts]
+            self._buffered += tpts
+            data = data[tpts:]
+            if self._buffered == block_tpts:
+                self._flush()
+
+    def merge(self, other):
+        "Merge the data given to another stream, with the same sample shape, into this one."
+        if other.mean is None:
+            return
+        self._check_sample_shape(other.mean.shape)
+        self._flush()
+        other._flush()
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        weight = self.count * other.count / float(count)
+        self._comoment += other._comoment
+        for mode in range(delta.shape[2]):
+            for var in range(delta.shape[0]):
+                self._comoment[:, :, var, mode] += weight * numpy.outer(delta[var, :, mode], delta[var, :, mode])
+        self.mean += delta * (other.count / float(count))
+        self.count = count
+
+    def _check_sample_shape(self, sample_shape):
+        "Allocate the running statistics for the first data given, or check that the sample shape is the same."
+        if self.mean is None:
+            self.mean = numpy.zeros(sample_shape)
+            self._comoment = numpy.zeros((sample_shape[1], sample_shape[1], sample_shape[0], sample_shape[2]))
+            block_tpts = max(1, int(self.block_bytes // (8 * numpy.prod(sample_shape))))
+            self._buffer = numpy.empty((block_tpts, ) + sample_shape)
+        elif sample_shape != self.mean.shape:
+            raise ValueError("Data shape %r does not match the sample shape %r of the stream."
+                             % (sample_shape, self.mean.shape))
+
+    def _flush(self):
+        if self._buffered > 0:
+            self._merge(self._buffer[:self._buffered])
+            self._buffered = 0
+
+    def _merge(self, block):
+        "Merge the mean and co-moments of a block of data into the running ones."
+        block_tpts = block.shape[0]
+        count = self.count + block_tpts
+        block_mean = block.mean(axis=0)
+        delta = block_mean - self.mean
+        weight = self.count * block_tpts / float(count)
+        for mode in range(block.shape[3]):
+            for var in range(block.shape[1]):
+                deviation = numpy.ascontiguousarray(block[:, var, :, mode]) - block_mean[var, :, mode]
+                comoment = self._comoment[:, :, var, mode]
+                comoment += numpy.dot(deviation.T, deviation)
+                comoment += weight * numpy.outer(delta[var, :, mode], delta[var, :, mode])
+        self.mean += delta * (block_tpts / float(count))
+        self.count = count
+
+    @property
+    def covariance(self):
+        "Covariance of the data given so far, normalised by the number of samples less one."
+        self._flush()
+        return self._comoment / (self.count - 1)
+
+    @property
+    def correlation(self):
+        "Pearson correlation coefficients of the data given so far, between -1 and 1."
+        result = self.covariance
+        for mode in range(result.shape[3]):
+            for var in range(result.shape[2]):
+                stddev = numpy.sqrt(result[:, :, var, mode].diagonal().copy())
+                result[:, :, var, mode] /= stddev[:, numpy.newaxis]
+                result[:, :, var, mode] /= stddev[numpy.newaxis, :]
+        numpy.clip(result, -1, 1, out=result)
+        return result
+
+
+
+def temporal_covariance(time_series, start=0, stop=None):
+    """
+    Temporal covariance between nodes of a 4D time series over time points
+    start to stop, as numpy.cov, for each state variable and mode, i.e. an
+    array of shape (nodes, nodes, state-variables, modes).
+
+    The data are read once, in blocks, so the time series need not fit in
+    memory; see :class:`StreamingCovariance`.
+    """
+    stream = StreamingCovariance()
+    for _, block in time_series.read_data_blocks(start, stop, block_bytes=stream.block_bytes):
+        stream.update(block)
+    return stream.covariance
+
+
 
 class NodeCovariance(core.Type):
     """
@@ -67,20 +205,14 @@ class NodeCovariance(core.Type):
         cls_attr_name = self.__class__.__name__ + ".time_series"
         self.time_series.trait["data"].log_debug(owner=cls_attr_name)
         
-        data_shape = self.time_series.data.shape
+        data_shape = self.time_series.read_data_shape()
         
         #(nodes, nodes, state-variables, modes)
         result_shape = (data_shape[2], data_shape[2], data_shape[1], data_shape[3])
         LOG.info("result shape will be: %s" % str(result_shape))
         
-        result = numpy.zeros(result_shape)
-        
         #One inter-node temporal covariance matrix for each state-var & mode.
-        for mode in range(data_shape[3]):
-            for var in range(data_shape[1]):
-                data = self.time_series.data[:, var, :, mode]
-                data = data - data.mean(axis=0)[numpy.newaxis, 0]
-                result[:, :, var, mode] = numpy.cov(data.T)
+        result = temporal_covariance(self.time_series)
 
         util.log_debug_array(LOG, result, "result")
 
@@ -40,75 +40,177 @@ a PrincipalComponents datatype.
 #      project source timesereis to component timeserries, etc
 
 import numpy
-import matplotlib.mlab as mlab
 #TODO: Currently built around the Simulator's 4D timeseries -- generalise...
 import tvb.datatypes.time_series as time_series
 import tvb.datatypes.mode_decompositions as mode_decompositions
 import tvb.basic.traits.core as core
+import tvb.basic.traits.types_basic as basic
 import tvb.basic.traits.util as util
+from tvb.analyzers.node_covariance import temporal_covariance
 from tvb.basic.logger.builder import get_logger
 
 LOG = get_logger(__name__)
 
 
 
+def _temporal_mean_std(time_series, block_bytes=2 ** 26):
+    "Temporal mean and standard deviation (ddof=1) of a 4D time series, read once in blocks."
+    count, mean, m2 = 0, 0.0, 0.0
+    for _, block in time_series.read_data_blocks(block_bytes=block_bytes):
+        block_tpts = block.shape[0]
+        total = count + block_tpts
+        block_mean = block.mean(axis=0)
+        delta = block_mean - mean
+        m2 = m2 + ((block - block_mean) ** 2).sum(axis=0) + delta ** 2 * (count * block_tpts / float(total))
+        mean = mean + delta * (block_tpts / float(total))
+        count = total
+    return mean, numpy.sqrt(m2 / (count - 1))
+
+
+
+def correlation_components(time_series, n_components=None):
+    """
+    Principal components of the standardised 4D time series, from the
+    eigen-decomposition of the inter-node correlation matrices, i.e. the
+    fractions of variance explained, of shape (components, state-variables,
+    modes), and the component weights, of shape (components, nodes,
+    state-variables, modes), in order of decreasing variance.
+
+    The time series is read once, in blocks, but the correlation matrices
+    are held in memory, so this is limited to moderate numbers of nodes.
+    """
+    cov = temporal_covariance(time_series)
+    n_nodes, _, n_vars, n_modes = cov.shape
+    n_components = n_components or n_nodes
+    eigenvalues = numpy.zeros((n_nodes, n_vars, n_modes))
+    for mode in range(n_modes):
+        for var in range(n_vars):
+            stddev = numpy.sqrt(cov[:, :, var, mode].diagonal())
+            corr = cov[:, :, var, mode] / numpy.outer(stddev, stddev)
+            # the eigenvectors replace the correlation matrix, to avoid holding both
+            eigenvalues[:, var, mode], cov[:, :, var, mode] = numpy.linalg.eigh(corr)
+    eigenvalues = eigenvalues[::-1].clip(0.0, None)
+    fractions = eigenvalues[:n_components] / eigenvalues.sum(axis=0)
+    weights = cov[:, ::-1][:, :n_components].transpose((1, 0, 2, 3)).copy()
+    return fractions, weights
+
+
+
+def incremental_components(time_series, n_components, oversampling=10, block_bytes=2 ** 26):
+    """
+    Leading principal components of the standardised 4D time series, as
+    `correlation_components`, from an incremental truncated SVD of the data
+    over chunks of time points.
+
+    Only n_components + oversampling singular vectors are kept between
+    chunks, so memory use is proportional to the number of nodes rather than
+    its square, and the time series is read twice, once for the means and
+    standard deviations and once for the decomposition. The result is exact
+    if the data have no more than that many significant components, and
+    otherwise approximate, with the oversampling absorbing most of the error
+    in the retained components.
+    """
+    ts_shape = time_series.read_data_shape()
+    n_tpts, n_vars, n_nodes, n_modes = ts_shape
+    mean, stddev = _temporal_mean_std(time_series, block_bytes)
+    n_fit = min(n_nodes, n_tpts, n_components + oversampling)
+    # the SVD costs grow with the square of the rows, so stack a few chunk rows per retained vector
+    chunk_tpts = max(n_fit, 64)
+    factors = dict(((var, mode), (numpy.zeros((0, )), numpy.zeros((0, n_nodes))))
+                   for var in range(n_vars) for mode in range(n_modes))
+    for _, block in time_series.read_data_blocks(block_bytes=block_bytes):
+        block = (block - mean) / stddev
+        for first in range(0, block.shape[0], chunk_tpts):
+            for (var, mode), (singular_values, vectors) in factors.items():
+                stacked = numpy.vstack((singular_values[:, numpy.newaxis] * vectors,
+                                        block[first:first + chunk_tpts, var, :, mode]))
+                _, singular_values, vectors = numpy.linalg.svd(stacked, full_matrices=False)
+                factors[var, mode] = singular_values[:n_fit], vectors[:n_fit]
+    n_components = min(n_components, n_fit)
+    fractions = numpy.zeros((n_components, n_vars, n_modes))
+    weights = numpy.zeros((n_components, n_nodes, n_vars, n_modes))
+    for (var, mode), (singular_values, vectors) in factors.items():
+        # the variance of the standardised data sums to the number of nodes
+        fractions[:, var, mode] = singular_values[:n_components] ** 2 / ((n_tpts - 1) * n_nodes)
+        weights[:, :, var, mode] = vectors[:n_components]
+    return fractions, weights
+
+
+
 class PCA(core.Type):
     """
     Return principal component weights and the fraction of the variance that 
     they explain. 
     
-    PCA takes time-points as observations and nodes as variables.
-    
-    NOTE: The TimeSeries must be longer(more time-points) than the number of
-          nodes -- Mostly a problem for TimeSeriesSurface datatypes, which, if 
-          sampled at 1024Hz, would need to be greater than 16 seconds long.
+    PCA takes time-points as observations and nodes as variables, and is
+    applied to the standardised time series of each state variable and mode.
+
+    By default all components are computed, from the correlation matrix
+    between nodes. Limiting `n_components`, or the fraction of the variance
+    the components must explain, stores only the retained components, and,
+    for time series with more than `max_covariance_nodes` nodes, such as
+    surface time series, computes them incrementally over chunks of time,
+    without forming the correlation matrix.
     """
     
     time_series = time_series.TimeSeries(
         label = "Time Series",
         required = True,
-        doc = """The timeseries to which the PCA is to be applied. NOTE: The 
-            TimeSeries must be longer(more time-points) than the number of nodes
-            -- Mostly a problem for surface times-series, which, if sampled at
-            1024Hz, would need to be greater than 16 seconds long.""")
-    
-    #TODO: Maybe should support first N components or neccessary components to
-    #      explain X% of the variance. NOTE: For default surface the weights
-    #      matrix has a size ~ 2GB * modes * vars...
+        doc = """The timeseries to which the PCA is to be applied.""")
+
+    n_components = basic.Integer(
+        label = "Number of components",
+        required = False,
+        default = None,
+        doc = """Maximum number of principal components to retain, by
+            default all, i.e. the number of nodes.""")
+
+    explained_variance = basic.Float(
+        label = "Fraction of variance explained",
+        required = False,
+        default = None,
+        doc = """If given, retain only as many components as are needed to
+            explain this fraction of the variance, for every state variable
+            and mode, but no more than the number of components.""")
+
+    max_covariance_nodes = 4096
+    oversampling = 10
+    block_bytes = 2 ** 26
     
     def evaluate(self):
         """
-        Compute the temporal covariance between nodes in the time_series. 
+        Compute the principal components of the time_series.
         """
         cls_attr_name = self.__class__.__name__+".time_series"
         self.time_series.trait["data"].log_debug(owner = cls_attr_name)
         
-        ts_shape = self.time_series.data.shape
+        ts_shape = self.time_series.read_data_shape()
+        n_components = min(self.n_components or ts_shape[2], ts_shape[2])
         
-        #Need more measurements than variables
-        if ts_shape[0] < ts_shape[2]:
-            msg = "PCA requires a longer timeseries (tpts > number of nodes)."
+        #Need more measurements than components
+        if ts_shape[0] <= n_components:
+            msg = "PCA requires a longer timeseries (tpts > number of components)."
             LOG.error(msg)
             raise Exception, msg
         
-        #(nodes, nodes, state-variables, modes)
-        weights_shape = (ts_shape[2], ts_shape[2], ts_shape[1], ts_shape[3])
-        LOG.info("weights shape will be: %s" % str(weights_shape))
-        
-        fractions_shape = (ts_shape[2], ts_shape[1], ts_shape[3])
-        LOG.info("fractions shape will be: %s" % str(fractions_shape))
+        if n_components < ts_shape[2] and ts_shape[2] > self.max_covariance_nodes:
+            LOG.info("computing %d components incrementally" % n_components)
+            fractions, weights = incremental_components(self.time_series, n_components,
+                                                        self.oversampling, self.block_bytes)
+        else:
+            fractions, weights = correlation_components(self.time_series, n_components)
         
-        weights = numpy.zeros(weights_shape)
-        fractions = numpy.zeros(fractions_shape)
+        if self.explained_variance is not None:
+            needed = (fractions.cumsum(axis=0) < self.explained_variance).sum(axis=0) + 1
+            n_retained = min(needed.max(), fractions.shape[0])
+            fractions, weights = fractions[:n_retained], weights[:n_retained].copy()
         
-        #One inter-node temporal covariance matrix for each state-var & mode.
-        for mode in range(ts_shape[3]):
-            for var in range(ts_shape[1]):
-                data = self.time_series.data[:, var, :, mode]
-                data_pca = mlab.PCA(data)
-                fractions[:, var, mode ] = data_pca.fracs
-                weights[:, :, var, mode] = data_pca.Wt
+        # fix the arbitrary sign of each component, making its largest weight positive
+        largest = abs(weights).argmax(axis=1)
+        components, variables, modes = numpy.ogrid[:weights.shape[0], :weights.shape[2], :weights.shape[3]]
+        weights *= numpy.sign(weights[components, largest, variables, modes])[:, numpy.newaxis]
         
+        LOG.info("weights shape is: %s" % str(weights.shape))
         util.log_debug_array(LOG, fractions, "fractions")
         util.log_debug_array(LOG, weights, "weights")
         
@@ -126,9 +228,10 @@ class PCA(core.Type):
         Returns the shape of the main result of the PCA analysis -- compnnent 
         weights matrix and a vector of fractions.
         """
-        weights_shape = (input_shape[2], input_shape[2], input_shape[1],
+        n_components = min(self.n_components or input_shape[2], input_shape[2])
+        weights_shape = (n_components, input_shape[2], input_shape[1],
                          input_shape[3])
-        fractions_shape = (input_shape[2], input_shape[1], input_shape[3])
+        fractions_shape = (n_components, input_shape[1], input_shape[3])
         return [weights_shape, fractions_shape]
     
     
@@ -150,8 +253,9 @@ class PCA(core.Type):
         result_size = self.result_size(input_shape)
         extend_size = result_size #Main arrays
         extend_size = extend_size + numpy.prod(input_shape) * 8.0 #norm_source
-        extend_size = extend_size + numpy.prod(input_shape) * 8.0 #component_time_series
-        extend_size = extend_size + numpy.prod(input_shape) * 8.0 #normalised_component_time_series
+        component_shape = (input_shape[0], input_shape[1], self.result_shape(input_shape)[1][0], input_shape[3])
+        extend_size = extend_size + numpy.prod(component_shape) * 8.0 #component_time_series
+        extend_size = extend_size + numpy.prod(component_shape) * 8.0 #normalised_component_time_series
         return extend_size
 
 
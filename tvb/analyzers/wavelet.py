@@ -39,8 +39,10 @@ WaveletSpectrum datatype.
 
 """
 
+import itertools
+import multiprocessing
 import numpy
-import scipy.signal as signal
+import scipy.fftpack
 import tvb.datatypes.time_series as time_series
 import tvb.datatypes.spectral as spectral
 import tvb.basic.traits.core as core
@@ -54,6 +56,40 @@ SUPPORTED_WAVELET_FUNCTIONS = ("morlet",)
 
 
 
+def decimated_convolutions(data, wavelets, temporal_step, nt):
+    """
+    Convolve each column of `data`, of shape (time, signal), with each of
+    the `wavelets`, of odd lengths, as `scipy.signal.convolve(.., 'same')`,
+    keeping every `temporal_step`-th of the first `nt` * `temporal_step`
+    samples, i.e. an array of shape (wavelet, nt, signal).
+
+    The spectrum of the data is computed once, for a length that is a
+    multiple of temporal_step. Only the kept samples are transformed back for
+    each wavelet, by folding the product of the spectra into temporal_step
+    times fewer frequencies, after shifting it by the offset of the 'same'
+    part of the full convolution.
+    """
+    tpts, nsig = data.shape
+    max_len = max(len(wvlt) for wvlt in wavelets)
+    nfold = scipy.fftpack.next_fast_len(int(numpy.ceil((tpts + max_len - 1) / float(temporal_step))))
+    nfft = temporal_step * nfold
+    spectrum = numpy.fft.fft(data, nfft, axis=0)
+    index = numpy.arange(nfft)
+    coef = numpy.empty((len(wavelets), nt, nsig), dtype=numpy.complex128)
+    for i, wvlt in enumerate(wavelets):
+        offset = (len(wvlt) - 1) // 2
+        shift = numpy.exp(2j * numpy.pi * (index * offset % nfft) / nfft)
+        product = spectrum * (numpy.fft.fft(wvlt, nfft) * shift)[:, numpy.newaxis]
+        folded = product.reshape((temporal_step, nfold, nsig)).sum(axis=0)
+        coef[i] = numpy.fft.ifft(folded, axis=0)[:nt] / temporal_step
+    return coef
+
+
+def _decimated_convolutions(args):
+    return decimated_convolutions(*args)
+
+
+
 class ContinuousWaveletTransform(core.Type):
     """
     A class for calculating the wavelet transform of a TimeSeries object of TVB
@@ -61,6 +97,11 @@ class ContinuousWaveletTransform(core.Type):
     range of the result can be specified. The mother wavelet can also be 
     specified... (So far, only Morlet.)
     
+    The signals are convolved with the wavelets through their spectra, in
+    blocks of about `block_bytes`, optionally distributed over `processes`
+    local processes, and only the samples of the result's sample period are
+    computed.
+    
     References:
         .. [TBetal_1996] C. Tallon-Baudry et al, *Stimulus Specificity of 
             Phase-Locked and Non-Phase-Locked 40 Hz Visual Responses in Human.*,
@@ -111,6 +152,19 @@ class ContinuousWaveletTransform(core.Type):
         default = 5.0,
         required = True,
         doc = """NFC. Must be greater than 5. Ratios of the center frequencies to bandwidths.""")
+
+    block_bytes = basic.Integer(
+        label = "Block size (bytes)",
+        default = 2**26,
+        required = False,
+        doc = """Approximate memory used to transform a block of signals at once.""")
+
+    processes = basic.Integer(
+        label = "Number of processes",
+        default = 1,
+        required = False,
+        doc = """Number of local processes transforming blocks of signals. By
+            default the blocks are transformed in this process.""")
     
     
     
@@ -173,8 +227,7 @@ class ContinuousWaveletTransform(core.Type):
         
         coef_shape = (nf, nt, ts_shape[1], ts_shape[2], ts_shape[3])
         
-        coef = numpy.zeros(coef_shape, dtype = numpy.complex128)
-        util.log_debug_array(LOG, coef, "coef")
+        wavelets = []
         scales = numpy.arange(0, nf, 1)
         for i in scales:
             f0 = freqs[i]
@@ -184,17 +237,26 @@ class ContinuousWaveletTransform(core.Type):
             wvlt = A * numpy.exp(-x**2 / (2.0 * SDt**2) ) * numpy.exp(2j * numpy.pi * f0 * x )
             wvlt = numpy.hstack((numpy.conjugate(wvlt[-1:0:-1]), wvlt))
             #util.log_debug_array(LOG, wvlt, "wvlt")
-            
-            for var in range(ts_shape[1]):
-                for node in range(ts_shape[2]):
-                    for mode in range(ts_shape[3]):
-                        data = self.time_series.data[:, var, node, mode]
-                        wt = signal.convolve(data, wvlt, 'same')
-                        #util.log_debug_array(LOG, wt, "wt")
-                        res = wt[0::temporal_step]
-                        #NOTE: this is a horrible horrible quick hack (alas, a solution) to avoid broadcasting errors
-                        # when using dt and sample periods which are not powers of 2.
-                        coef[i, :, var, node, mode] = res if len(res) == nt else res[:coef.shape[1]] 
+            wavelets.append(wvlt)
+
+        # all (var, node, mode) signals are transformed in blocks, distributed over local processes if asked
+        data = self.time_series.data.reshape((ts_shape[0], -1))
+        block_size = max(1, int(self.block_bytes // (3 * 16 * (ts_shape[0] + max(map(len, wavelets))))))
+        starts = range(0, data.shape[1], block_size)
+        tasks = ((data[:, i:i + block_size], wavelets, temporal_step, nt) for i in starts)
+        processes = min(self.processes or 1, len(starts))
+        LOG.info("Transforming %d signals in %d blocks on %d processes", data.shape[1], len(starts), processes)
+        coef = numpy.empty((nf, nt, data.shape[1]), dtype=numpy.complex128)
+        pool = multiprocessing.Pool(processes) if processes > 1 else None
+        try:
+            blocks = pool.imap(_decimated_convolutions, tasks) if pool else itertools.imap(_decimated_convolutions, tasks)
+            for i, block in zip(starts, blocks):
+                coef[..., i:i + block_size] = block
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        coef = coef.reshape(coef_shape)
                         
         
         util.log_debug_array(LOG, coef, "coef")
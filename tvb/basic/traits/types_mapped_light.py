@@ -45,6 +45,7 @@ Important:
 """
 
 import numpy
+import logging
 from scipy import sparse
 from tvb.basic.logger.builder import get_logger
 from tvb.basic.traits.util import get
@@ -258,6 +259,9 @@ class Array(Type):
         or ::
             self.trait["array_name"].log_debug(owner=self.__class__.__name__)
         """
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            # avoid scanning large, possibly memory-mapped, arrays for nothing
+            return
         name = ".".join((owner, self.trait.name))
         sts = str(self.__class__)
         if self.trait.value is not None and self.trait.value.size != 0:
@@ -37,6 +37,7 @@ All the little functions that make life nicer in the Traits package.
 """
 
 import numpy
+import logging
 import collections
 import inspect
 from tvb.basic.profile import TvbProfile
@@ -87,6 +88,10 @@ def log_debug_array(log, array, array_name, owner=""):
         return
         # Hide this logs in web-mode, with storage, because we have multiple storage exceptions
 
+    if not log.isEnabledFor(logging.DEBUG):
+        # avoid scanning large, possibly memory-mapped, arrays for nothing
+        return
+
     if owner != "":
         name = ".".join((owner, array_name))
     else:
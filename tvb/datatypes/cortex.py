@@ -175,10 +175,13 @@ class Cortex(surfaces.CorticalSurface):
         """
         LOG.info("Computing local connectivity matrix")
         loc_con_cutoff = self.local_connectivity.cutoff
-        self.compute_geodesic_distance_matrix(max_dist=loc_con_cutoff)
+        self.compute_geodesic_distance_matrix(max_dist=loc_con_cutoff,
+                                              processes=self.local_connectivity.processes)
 
-        self.local_connectivity.matrix_gdist = self.geodesic_distance_matrix.copy()
+        self.local_connectivity.matrix_gdist = self.geodesic_distance_matrix
         self.local_connectivity.compute()  # Evaluate equation based distance
+        # Drop the reference, the surface holds the distances for reuse.
+        self.local_connectivity.matrix_gdist = None
         self.local_connectivity.trait["matrix"].log_debug(owner=self.__class__.__name__ + ".local_connectivity")
 
         #HACK FOR DEBUGGING CAUSE TRAITS REPORTS self.local_connectivity.trait["matrix"] AS BEING EMPTY...
@@ -37,8 +37,10 @@ methods that are associated with the Equation datatypes.
 
 """
 import json
+import collections
 import numpy
 import numexpr
+from numexpr.necompiler import getContext, getExprNames, getType, evaluate_lock
 from tvb.basic.traits import core, parameters_factory, types_basic as basic
 from tvb.basic.logger.builder import get_logger
 
@@ -48,6 +50,42 @@ LOG = get_logger(__name__)
 # give smoother results at the cost of some performance
 DEFAULT_PLOT_GRANULARITY = 1024
 
+# numexpr options for the expressions of this module, those numexpr.evaluate would use here
+_NUMEXPR_CONTEXT = getContext({'truediv': False})
+
+# input names, VML use and compiled programs of each expression, shared by all equations of this
+# process, dropping the least recently used expression beyond _COMPILED_EXPRESSIONS_SIZE
+_COMPILED_EXPRESSIONS_SIZE = 256
+_compiled_expressions = collections.OrderedDict()
+
+
+def _evaluate(expression, parameters, var):
+    """
+    Evaluate expression as numexpr.evaluate(expression, local_dict={'var': var},
+    global_dict=parameters) does, but keep what numexpr derives from the expression,
+    so that equations with the same expression neither parse nor compile it again.
+    Programs are looked up by the types of the arguments, which are only converted to
+    arrays to build the numexpr signature of a new program.
+    """
+    compiled = _compiled_expressions.pop(expression, None)
+    if compiled is None:
+        names, uses_vml = getExprNames(expression, _NUMEXPR_CONTEXT)
+        compiled = names, uses_vml, {}
+        if len(_compiled_expressions) >= _COMPILED_EXPRESSIONS_SIZE:
+            _compiled_expressions.popitem(last=False)
+    _compiled_expressions[expression] = compiled
+    names, uses_vml, programs = compiled
+    arguments = [var if name == 'var' else parameters[name] for name in names]
+    key = tuple(getattr(argument, 'dtype', type(argument)) for argument in arguments)
+    program = programs.get(key)
+    if program is None:
+        signature = [(name, getType(numpy.asarray(argument))) for name, argument in zip(names, arguments)]
+        program = programs[key] = numexpr.NumExpr(expression, signature, **_NUMEXPR_CONTEXT)
+    with evaluate_lock:
+        if uses_vml:
+            return program(*arguments, ex_uses_vml=True)
+        return program(*arguments)
+
 
 class Equation(basic.MapAsJson, core.Type):
     "Base class for Equation data types."
@@ -74,6 +112,10 @@ class Equation(basic.MapAsJson, core.Type):
                 should be able to take defaults and sensible ranges from any
                 traited information that was provided.""")
 
+    # whether the pattern at each point depends only on the variable at that point,
+    # so that it may be evaluated piecewise
+    pointwise = True
+
     # sci
 
     def _find_summary_info(self):
@@ -106,7 +148,7 @@ class Equation(basic.MapAsJson, core.Type):
 
         """
 
-        self._pattern = numexpr.evaluate(self.equation, global_dict=self.parameters)
+        self._pattern = _evaluate(self.equation, self.parameters, var)
 
     pattern = property(fget=_get_pattern, fset=_set_pattern)
 
@@ -426,13 +468,9 @@ class PulseTrain(TemporalApplicableEquation):
 
         """
 
-        # rolling in the deep ...
+        # the pulses start at onset, so each time point is evaluated on its own
         onset = self.parameters["onset"]
-        off = var < onset
-        var = numpy.roll(var, off.sum() + 1)
-        var[..., off] = 0.0
-        self._pattern = numexpr.evaluate(self.equation, global_dict=self.parameters)
-        self._pattern[..., off] = 0.0
+        self._pattern = numpy.where(var < onset, 0.0, _evaluate(self.equation, self.parameters, var - onset))
 
     pattern = property(fget=_get_pattern, fset=_set_pattern)
 
@@ -505,8 +543,7 @@ class Gamma(HRFKernelEquation):
             product *= i + 1
 
         self.parameters["factorial"] = product
-        self._pattern = numexpr.evaluate(self.equation,
-                                         global_dict=self.parameters)
+        self._pattern = _evaluate(self.equation, self.parameters, var)
         self._pattern /= max(self._pattern)
         self._pattern *= self.parameters["a"]
 
@@ -565,7 +602,7 @@ class DoubleExponential(HRFKernelEquation):
 
         """
 
-        self._pattern = numexpr.evaluate(self.equation, global_dict=self.parameters)
+        self._pattern = _evaluate(self.equation, self.parameters, var)
         self._pattern /= max(self._pattern)
 
         self._pattern *= self.parameters["a"]
@@ -694,6 +731,6 @@ class MixtureOfGammas(HRFKernelEquation):
         self.parameters["gamma_a_1"] = sp_gamma(self.parameters["a_1"])
         self.parameters["gamma_a_2"] = sp_gamma(self.parameters["a_2"])
 
-        self._pattern = numexpr.evaluate(self.equation, global_dict=self.parameters)
+        self._pattern = _evaluate(self.equation, self.parameters, var)
 
     pattern = property(fget=_get_pattern, fset=_set_pattern)
\ No newline at end of file
@@ -62,31 +62,37 @@ class LocalConnectivity(types_mapped.MappedType):
         doc="Distance at which to truncate the evaluation in mm.",
         order=3)
 
+    processes = basic.Integer(
+        label="Processes",
+        default=1,
+        use_storage=False,
+        doc="Number of local processes computing the geodesic distances, by default only this one.",
+        order=-1)
+
     def compute(self):
         """
         Compute current Matrix.
+
+        The geodesic distances in matrix_gdist are left unchanged, so that
+        the matrix can be computed again for another equation.
         """
         LOG.info("Mapping geodesic distance through the LocalConnectivity.")
 
         #Start with data being geodesic_distance_matrix, then map it through equation
-        self.equation.pattern = self.matrix_gdist.data
+        gdist_matrix = self.matrix_gdist.tocsc()
+        self.equation.pattern = gdist_matrix.data
+        data = self.equation.pattern
 
-        #Then replace original data with result...
-        self.matrix_gdist.data = self.equation.pattern
+        def with_data(values):
+            "Sparse matrix with the structure of the distances, sharing their indices."
+            return scipy.sparse.csc_matrix((values, gdist_matrix.indices, gdist_matrix.indptr),
+                                           shape=gdist_matrix.shape)
 
         #Homogenise spatial discretisation effects across the surface
-        nv = self.matrix_gdist.shape[0]
-        ind = numpy.arange(nv, dtype=int)
-        pos_mask = self.matrix_gdist.data > 0.0
-        neg_mask = self.matrix_gdist.data < 0.0
-        pos_con = self.matrix_gdist.copy()
-        neg_con = self.matrix_gdist.copy()
-        pos_con.data[neg_mask] = 0.0
-        neg_con.data[pos_mask] = 0.0
-        pos_contrib = pos_con.sum(axis=1)
-        pos_contrib = numpy.array(pos_contrib).squeeze()
-        neg_contrib = neg_con.sum(axis=1)
-        neg_contrib = numpy.array(neg_contrib).squeeze()
+        pos_mask = data > 0.0
+        neg_mask = data < 0.0
+        pos_contrib = numpy.array(with_data(numpy.where(pos_mask, data, 0.0)).sum(axis=1)).squeeze()
+        neg_contrib = numpy.array(with_data(numpy.where(neg_mask, data, 0.0)).sum(axis=1)).squeeze()
         pos_mean = pos_contrib.mean()
         neg_mean = neg_contrib.mean()
         if ((pos_mean != 0.0 and any(pos_contrib == 0.0)) or
@@ -103,11 +109,13 @@ class LocalConnectivity(types_mapped.MappedType):
         pos_hf[pos_contrib != 0] = pos_mean / pos_contrib[pos_contrib != 0]
         neg_hf = numpy.zeros(shape=neg_contrib.shape)
         neg_hf[neg_contrib != 0] = neg_mean / neg_contrib[neg_contrib != 0]
-        pos_hf_diag = scipy.sparse.csc_matrix((pos_hf, (ind, ind)), shape=(nv, nv))
-        neg_hf_diag = scipy.sparse.csc_matrix((neg_hf, (ind, ind)), shape=(nv, nv))
-        homogenious_conn = (pos_hf_diag * pos_con) + (neg_hf_diag * neg_con)
 
-        #Then replace unhomogenised result with the spatially homogeneous one...
+        #Scale each entry by the factor of its row, for the sign of its value
+        rows = gdist_matrix.indices
+        homogenious_conn = scipy.sparse.csc_matrix(
+            (numpy.where(pos_mask, pos_hf[rows], neg_hf[rows]) * data, rows.copy(), gdist_matrix.indptr.copy()),
+            shape=gdist_matrix.shape)
+        homogenious_conn.eliminate_zeros()
         if not homogenious_conn.has_sorted_indices:
             homogenious_conn.sort_indices()
 
@@ -158,21 +166,26 @@ class LocalConnectivity(types_mapped.MappedType):
                                           self.METADATA_ARRAY_MEAN,
                                           self.METADATA_ARRAY_SHAPE])
 
-    def compute_sparse_matrix(self):
+    def compute_sparse_matrix(self, processes=None):
         """
         NOTE: Before calling this method, the surface field
         should already be set on the local connectivity.
 
-        Computes the sparse matrix for this local connectivity.
+        Computes the sparse matrix for this local connectivity, using
+        ``processes`` local processes, by default the processes trait, for the
+        geodesic distances. The distances are kept on the surface, so that
+        changing the equation and computing again does not recompute them
+        for the same cutoff, until the surface's
+        clear_geodesic_distance_matrix is called.
         """
         if self.surface is None:
             raise AttributeError('Require surface to compute local connectivity.')
 
-        self.matrix_gdist = surfaces.gdist.local_gdist_matrix(
-            self.surface.vertices.astype(numpy.float64),
-            self.surface.triangles.astype(numpy.int32),
-            max_distance=self.cutoff)
+        if processes is None:
+            processes = self.processes
+        self.surface.compute_geodesic_distance_matrix(self.cutoff, processes)
+        self.matrix_gdist = self.surface.geodesic_distance_matrix
 
         self.compute()
-        # Avoid having a large data-set in memory.
+        # Drop the reference, the surface holds the distances for reuse.
         self.matrix_gdist = None
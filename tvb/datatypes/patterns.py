@@ -139,10 +139,26 @@ class SpatioTemporalPattern(SpatialPattern, SpatioTemporalCall):
     """
 
     temporal = equations.TemporalApplicableEquation(label="Temporal Equation", order=3)
+
+    streaming = basic.Bool(
+        label="Streaming evaluation", default=False, order=-1,
+        doc="""If True, a simulation evaluates the temporal equation in blocks of
+        time points as it advances, rather than over its whole length at once,
+        and updates only the nodes with non-zero spatial pattern at each step.""")
+
     #space must be shape (x, 1); time must be shape (1, t)
     time = None
     _temporal_pattern = None
 
+    # number of time points evaluated at once when streaming
+    stream_block_length = 1024
+    _stream_dt = None
+    _stream_whole_time = False
+    _stream_nodes = None
+    _stream_weights = None
+    _stream_start = None
+    _stream_values = None
+
     def _find_summary_info(self):
         """ Extend the base class's summary dictionary. """
         summary = super(SpatioTemporalPattern, self)._find_summary_info()
@@ -175,6 +191,51 @@ class SpatioTemporalPattern(SpatialPattern, SpatioTemporalCall):
         self.time = time
         self.temporal_pattern = self.time
 
+    def configure_streaming(self, dt, length):
+        """
+        Prepare streaming evaluation, see `stream`, for time points spaced by
+        dt (ms) over length (ms), after the spatial pattern has been configured.
+        Temporal equations which are not pointwise are still evaluated over the
+        whole time axis at once.
+        """
+        self._stream_dt = dt
+        self._stream_whole_time = not self.temporal.pointwise
+        if self._stream_whole_time:
+            self.configure_time(numpy.r_[0.0:length:dt].reshape((1, -1)))
+        self._stream_nodes = numpy.nonzero(self.spatial_pattern[:, 0])[0]
+        self._stream_weights = self.spatial_pattern[self._stream_nodes, 0]
+        self._stream_start = None
+        self._stream_values = None
+
+    def get_stream_state(self):
+        "Return the state of streaming evaluation, to continue it with `set_stream_state`."
+        values = None if self._stream_values is None else self._stream_values.copy()
+        return self._stream_start, values
+
+    def set_stream_state(self, state):
+        "Continue streaming evaluation from a state returned by `get_stream_state`."
+        start, values = state
+        self._stream_start = start
+        self._stream_values = None if values is None else values.copy()
+
+    def stream(self, temporal_index):
+        """
+        Return the indices of the stimulated nodes and the pattern at those
+        nodes for the given time index. The temporal equation is evaluated for
+        blocks of `stream_block_length` time points, so memory does not depend
+        on the length of the simulation.
+        """
+        if self._stream_whole_time:
+            return self._stream_nodes, self._stream_weights * self.temporal_pattern[0, temporal_index]
+        start = self._stream_start
+        if start is None or not start <= temporal_index < start + self.stream_block_length:
+            start = temporal_index
+            time = numpy.arange(start, start + self.stream_block_length) * self._stream_dt
+            self.temporal.pattern = time.reshape((1, -1))
+            self._stream_values = numpy.reshape(self.temporal.pattern, (-1, ))
+            self._stream_start = start
+        return self._stream_nodes, self._stream_weights * self._stream_values[temporal_index - start]
+
 
 class StimuliRegion(SpatioTemporalPattern):
     """
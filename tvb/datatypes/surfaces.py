@@ -42,7 +42,11 @@ methods that are associated with the surfaces data.
 
 import warnings
 import json
+import hashlib
+import collections
+import multiprocessing
 import numpy
+import scipy.sparse
 import tvb.basic.traits.types_basic as basic
 import tvb.datatypes.arrays as arrays
 from tvb.basic.traits import util, exceptions
@@ -70,6 +74,73 @@ except ImportError:
 LOG = get_logger(__name__)
 
 
+def _partition_vertices(vertices, n_blocks):
+    "Split vertex indices into spatially compact blocks by recursive bisection of the largest block."
+    blocks = [numpy.arange(vertices.shape[0])]
+    while len(blocks) < n_blocks:
+        blocks.sort(key=len)
+        block = blocks.pop()
+        positions = vertices[block]
+        axis = positions.ptp(axis=0).argmax()
+        block = block[numpy.argsort(positions[:, axis], kind='mergesort')]
+        blocks += [block[:len(block) // 2], block[len(block) // 2:]]
+    return blocks
+
+
+def _local_gdist_block(args):
+    """
+    Compute the rows of the truncated geodesic distance matrix for a block of
+    source vertices, on the part of the mesh within reach of the block.
+
+    """
+    vertices, triangles, block, max_distance, halo = args
+    # paths shorter than max_distance only cross triangles with a vertex within halo of the block
+    near = gdist.compute_gdist(vertices, triangles, source_indices=block, max_distance=halo) <= halo
+    sub_triangles = triangles[near[triangles].any(axis=1)]
+    sub_vertices = numpy.unique(sub_triangles)
+    local_index = numpy.zeros(vertices.shape[0], dtype=numpy.int32) - 1
+    local_index[sub_vertices] = numpy.arange(sub_vertices.size, dtype=numpy.int32)
+    block = block[local_index[block] >= 0]
+    dist = gdist.local_gdist_matrix(vertices[sub_vertices], local_index[sub_triangles], max_distance=max_distance)
+    rows = dist.tocsr()[local_index[block]].tocoo()
+    return block[rows.row], sub_vertices[rows.col], rows.data
+
+
+def local_gdist_matrix(vertices, triangles, max_distance, processes=1):
+    """
+    Compute the sparse matrix of geodesic distances from each vertex to the
+    vertices within ``max_distance`` of it, as ``gdist.local_gdist_matrix``,
+    in this process, or distributing the work over ``processes`` local
+    processes if more than one are asked for.
+
+    The vertices are split into spatially compact blocks, one per process,
+    and the rows of each block are computed on the part of the mesh within
+    geodesic reach of the block, so that the result is the same as for the
+    whole mesh. The margin around each block is extra work, so the speed up
+    decreases as ``max_distance`` grows relative to the size of the surface.
+
+    """
+    vertices = vertices.astype(numpy.float64)
+    triangles = triangles.astype(numpy.int32)
+    if processes is None or processes <= 1:
+        return gdist.local_gdist_matrix(vertices, triangles, max_distance=max_distance)
+    # propagation may set distances up to an edge beyond max_distance, which must see the same mesh
+    edges = vertices[triangles] - vertices[numpy.roll(triangles, 1, axis=1)]
+    halo = max_distance + 2.0 * numpy.sqrt((edges ** 2).sum(axis=-1)).max()
+    tasks = [(vertices, triangles, block.astype(numpy.int32), max_distance, halo)
+             for block in _partition_vertices(vertices, processes)]
+    LOG.info("Computing geodesic distances within %s mm on %d processes", max_distance, processes)
+    pool = multiprocessing.Pool(processes)
+    try:
+        rows, cols, data = zip(*pool.map(_local_gdist_block, tasks))
+    finally:
+        pool.terminate()
+        pool.join()
+    n_vertices = vertices.shape[0]
+    return scipy.sparse.csc_matrix((numpy.concatenate(data), (numpy.concatenate(rows), numpy.concatenate(cols))),
+                                   shape=(n_vertices, n_vertices))
+
+
 OUTER_SKIN = "Skin Air"
 OUTER_SKULL = "Skull Skin"
 INNER_SKULL = "Brain Skull"
@@ -138,6 +209,94 @@ class ValidationResult(object):
         return '  |  '.join(msg for msg, _ in self.warnings)
 
 
+
+def _csr_structure(rows, columns, shape):
+    "Sorted CSR index pointers and indices of the unique (row, column) pairs."
+    matrix = scipy.sparse.csr_matrix((numpy.ones(rows.size, dtype=numpy.int8), (rows, columns)), shape=shape)
+    matrix.sum_duplicates()
+    return matrix.indptr, matrix.indices
+
+
+
+class MeshTopology(object):
+    """
+    Adjacency of the vertices, edges and triangles of a triangulated mesh,
+    as index arrays in compressed sparse row form: the neighbours of vertex
+    k are ``neighbour_indices[neighbour_indptr[k]:neighbour_indptr[k + 1]]``,
+    and likewise the triangles containing a vertex are given by
+    ``triangle_indptr`` and ``triangle_indices`` and the triangles
+    containing an edge by ``edge_triangle_indptr`` and
+    ``edge_triangle_indices``. All are sorted, as are the rows of the
+    (number_of_edges, 2) array ``edges`` of vertex indices.
+    """
+
+    def __init__(self, triangles, number_of_vertices):
+        triangles = numpy.asarray(triangles, dtype=numpy.int32)
+        number_of_triangles = triangles.shape[0]
+        triangle_ids = numpy.arange(number_of_triangles, dtype=numpy.int32)
+        self.triangle_indptr, self.triangle_indices = _csr_structure(
+            triangles.ravel(), triangle_ids.repeat(3), (number_of_vertices, number_of_triangles))
+
+        # edges ab, ac and bc of each triangle abc, in both directions for the neighbours
+        first, second = triangles[:, [0, 0, 1]].ravel(), triangles[:, [1, 2, 2]].ravel()
+        self.neighbour_indptr, self.neighbour_indices = _csr_structure(
+            numpy.r_[first, second], numpy.r_[second, first], (number_of_vertices, number_of_vertices))
+        rows = numpy.arange(number_of_vertices, dtype=numpy.int32).repeat(numpy.diff(self.neighbour_indptr))
+        upper = rows <= self.neighbour_indices
+        self.edges = numpy.column_stack((rows[upper], self.neighbour_indices[upper]))
+        del rows, upper
+
+        # a triangle contains an edge if it contains both its vertices, so a degenerate
+        # edge aa is contained in all the triangles containing a
+        pairs = numpy.minimum(first, second), numpy.maximum(first, second), triangle_ids.repeat(3)
+        degenerate = self.edges[self.edges[:, 0] == self.edges[:, 1], 0]
+        if degenerate.size:
+            corners = numpy.in1d(triangles.ravel(), degenerate)
+            pairs = [numpy.r_[pair, extra[corners]] for pair, extra in
+                     zip(pairs, (triangles.ravel(), triangles.ravel(), triangle_ids.repeat(3)))]
+        keys = self.edges[:, 0].astype(numpy.int64) * number_of_vertices + self.edges[:, 1]
+        edge_ids = numpy.searchsorted(keys, pairs[0].astype(numpy.int64) * number_of_vertices + pairs[1])
+        self.edge_triangle_indptr, self.edge_triangle_indices = _csr_structure(
+            edge_ids, pairs[2], (self.edges.shape[0], number_of_triangles))
+
+    @property
+    def nbytes(self):
+        arrays = [self.triangle_indptr, self.triangle_indices, self.neighbour_indptr, self.neighbour_indices,
+                  self.edges, self.edge_triangle_indptr, self.edge_triangle_indices]
+        return sum(array.nbytes for array in arrays)
+
+    def neighbours(self, vertices):
+        "Sorted array of the vertices neighbouring any of the given vertices."
+        indptr, indices = self.neighbour_indptr, self.neighbour_indices
+        return numpy.unique(numpy.concatenate([indices[indptr[k]:indptr[k + 1]] for k in vertices] + [indices[:0]]))
+
+
+
+class _IndexRows(collections.Sequence):
+    """
+    Read-only sequence of the rows of a compressed sparse row structure,
+    converted to `container`, e.g. frozenset, when accessed, so that the
+    topology of a surface can be used as lists of sets without building them.
+    """
+
+    def __init__(self, indptr, indices, container=frozenset):
+        self.indptr = indptr
+        self.indices = indices
+        self.container = container
+
+    def __len__(self):
+        return self.indptr.size - 1
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self[i] for i in xrange(*k.indices(len(self)))]
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError("index %d out of range" % k)
+        return self.container(self.indices[self.indptr[k]:self.indptr[k + 1]].tolist())
+
+
 class Surface(MappedType):
     "A base class for other surfaces."
 
@@ -263,18 +422,15 @@ class Surface(MappedType):
         return validation_result
 
     # from scientific surfaces
-    _vertex_neighbours = None
-    _vertex_triangles = None
+    _topology = None
     _triangle_centres = None
     _triangle_angles = None
     _triangle_areas = None
-    _edges = None
-    _number_of_edges = None
     _edge_lengths = None
     _edge_length_mean = None
     _edge_length_min = None
     _edge_length_max = None
-    _edge_triangles = None
+    _region_boundaries = None
 
     def _find_summary_info(self):
         """
@@ -338,13 +494,32 @@ class Surface(MappedType):
         dist = gdist.compute_gdist(verts, tris, source_indices=srcs, **kwd)
         return dist
 
+    # max_dist and mesh digest of the current geodesic_distance_matrix, if computed by compute_geodesic_distance_matrix
+    _geodesic_distance_key = None
+
+    def _mesh_digest(self):
+        "Digest of the vertices and triangles, identifying the mesh a kept result was computed for."
+        digest = hashlib.sha1()
+        for array in (self.vertices, self.triangles):
+            array = numpy.ascontiguousarray(array)
+            digest.update(str((array.shape, array.dtype.str)))
+            digest.update(array)
+        return digest.hexdigest()
+
     # TODO why two methods for this?
-    def compute_geodesic_distance_matrix(self, max_dist):
+    def compute_geodesic_distance_matrix(self, max_dist, processes=1):
         """
         Calculate a sparse matrix of the geodesic distance from each vertex to
         all vertices within max_dist of them on the surface,
 
         ``max_dist``: find the distance to vertices out as far as max_dist.
+        ``processes``: number of local processes to use, by default only this one.
+
+        The matrix is kept in geodesic_distance_matrix, and is not computed
+        again by later calls with the same max_dist on the same mesh. It takes
+        about 12 bytes per pair of vertices within max_dist, e.g. tens of GB
+        for a 260k vertex mesh with the 40 mm default cutoff of a local
+        connectivity, so call clear_geodesic_distance_matrix once done with it.
 
         NOTE: Compute time increases rapidly with max_dist and the memory
         efficiency of the sparse matrices decreases, so, don't use too large a
@@ -358,60 +533,45 @@ class Surface(MappedType):
         #    LOG.error("%s: The geodesic distance library didn't load" % repr(self))
         #    return
 
-        dist = gdist.local_gdist_matrix(self.vertices.astype(numpy.float64),
-                                        self.triangles.astype(numpy.int32),
-                                        max_distance=max_dist)
+        key = max_dist, self._mesh_digest()
+        if self._geodesic_distance_key == key and self.geodesic_distance_matrix is not None:
+            LOG.debug("Reusing geodesic distance matrix for max_dist=%s", max_dist)
+            return
+
+        dist = local_gdist_matrix(self.vertices, self.triangles, max_dist, processes)
 
         self.geodesic_distance_matrix = dist
+        self._geodesic_distance_key = key
+
+    def clear_geodesic_distance_matrix(self):
+        "Release the geodesic distance matrix kept by compute_geodesic_distance_matrix."
+        self.geodesic_distance_matrix = None
+        self._geodesic_distance_key = None
 
     @property
-    def vertex_neighbours(self):
+    def topology(self):
         """
-        List of the set of neighbours for each vertex.
+        MeshTopology of the triangles, computed once and shared by the
+        properties giving the neighbours, triangles and edges of the mesh.
         """
-        if self._vertex_neighbours is None:
-            self._vertex_neighbours = self._find_vertex_neighbours()
-        return self._vertex_neighbours
+        if self._topology is None:
+            self._topology = MeshTopology(self.triangles, self.number_of_vertices)
+            LOG.debug("Surface topology requires %.2f MB", self._topology.nbytes * 2 ** -20)
+        return self._topology
 
-    def _find_vertex_neighbours(self):
+    @property
+    def vertex_neighbours(self):
         """
-        .
+        Sequence of the set of neighbours for each vertex.
         """
-        neighbours = [[] for _ in xrange(self.number_of_vertices)]
-        for k in xrange(self.number_of_triangles):
-            neighbours[self.triangles[k, 0]].append(self.triangles[k, 1])
-            neighbours[self.triangles[k, 0]].append(self.triangles[k, 2])
-            neighbours[self.triangles[k, 1]].append(self.triangles[k, 0])
-            neighbours[self.triangles[k, 1]].append(self.triangles[k, 2])
-            neighbours[self.triangles[k, 2]].append(self.triangles[k, 0])
-            neighbours[self.triangles[k, 2]].append(self.triangles[k, 1])
-
-        neighbours = map(frozenset, neighbours)
-
-        return neighbours
+        return _IndexRows(self.topology.neighbour_indptr, self.topology.neighbour_indices)
 
     @property
     def vertex_triangles(self):
         """
-        List of the set of triangles surrounding each vertex.
+        Sequence of the set of triangles surrounding each vertex.
         """
-        if self._vertex_triangles is None:
-            self._vertex_triangles = self._find_vertex_triangles()
-        return self._vertex_triangles
-
-    def _find_vertex_triangles(self):
-        # self.attr calls __get__@type_mapped which is performance sensitive here
-        triangles = self.triangles
-
-        vertex_triangles = [[] for _ in xrange(self.number_of_vertices)]
-        for k in xrange(self.number_of_triangles):
-            vertex_triangles[triangles[k, 0]].append(k)
-            vertex_triangles[triangles[k, 1]].append(k)
-            vertex_triangles[triangles[k, 2]].append(k)
-
-        vertex_triangles = map(frozenset, vertex_triangles)
-
-        return vertex_triangles
+        return _IndexRows(self.topology.triangle_indptr, self.topology.triangle_indices)
 
     def nth_ring(self, vertex, neighbourhood=2, contains=False):
         """
@@ -422,19 +582,15 @@ class Surface(MappedType):
         vertices from rings 1 to n inclusive.
         """
 
-        ring = set([vertex])
-        local_vertices = set([vertex])
+        ring = local_vertices = numpy.array([vertex])
 
         for _ in range(neighbourhood):
-            neighbours = [self.vertex_neighbours[indx] for indx in ring]
-            neighbours = set(vert for subset in neighbours for vert in subset)
-            ring = neighbours.difference(local_vertices)
-            local_vertices.update(ring)
+            ring = numpy.setdiff1d(self.topology.neighbours(ring), local_vertices, assume_unique=True)
+            local_vertices = numpy.union1d(local_vertices, ring)
 
         if contains:
-            local_vertices.discard(vertex)
-            return frozenset(local_vertices)
-        return frozenset(ring)
+            return frozenset(local_vertices.tolist()) - frozenset([vertex])
+        return frozenset(ring.tolist())
 
     def compute_triangle_normals(self):
         """Calculates triangle normals."""
@@ -456,27 +612,31 @@ class Surface(MappedType):
         Estimates vertex normals, based on triangle normals weighted by the
         angle they subtend at each vertex...
         """
-        vert_norms = numpy.zeros((self.number_of_vertices, 3))
-        bad_normal_count = 0
-        # todo: vectorize this
-        for k in xrange(self.number_of_vertices):
-            try:
-                tri_list = list(self.vertex_triangles[k])
-                angle_mask = self.triangles[tri_list, :] == k
-                angles = self.triangle_angles[tri_list, :]
-                angles = angles[angle_mask][:, numpy.newaxis]
-                angle_scaling = angles / numpy.sum(angles, axis=0)
-                vert_norms[k, :] = numpy.mean(angle_scaling * self.triangle_normals[tri_list, :], axis=0)
-                # Scale by angle subtended.
-                vert_norms[k, :] = vert_norms[k, :] / numpy.sqrt(numpy.sum(vert_norms[k, :] ** 2, axis=0))
-                # Normalise to unit vectors.
-            except (ValueError, FloatingPointError):
-                # If normals are bad, default to position vector
-                # A nicer solution would be to detect degenerate triangles and ignore their
-                # contribution to the vertex normal
-                vert_norms[k, :] = self.vertices[k] / numpy.sqrt(self.vertices[k].dot(self.vertices[k]))
-                bad_normal_count += 1
+        number_of_vertices = self.vertices.shape[0]
+        triangles = self.triangles
+        corners = triangles.ravel()
+        angles = self.triangle_angles.ravel()
+        triangles_per_vertex = numpy.diff(self.topology.triangle_indptr)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            # Scale by angle subtended.
+            angle_scaling = angles / numpy.bincount(corners, angles, number_of_vertices)[corners]
+            vert_norms = numpy.empty((number_of_vertices, 3))
+            for j in range(3):
+                scaled_normals = angle_scaling * numpy.repeat(self.triangle_normals[:, j], 3)
+                vert_norms[:, j] = numpy.bincount(corners, scaled_normals, number_of_vertices) / triangles_per_vertex
+            # Normalise to unit vectors.
+            vert_norms /= numpy.sqrt(numpy.sum(vert_norms ** 2, axis=1))[:, numpy.newaxis]
+
+        # If normals are bad, default to position vector: for vertices without triangles, or in
+        # degenerate ones. A nicer solution would be to detect degenerate triangles and ignore their
+        # contribution to the vertex normal
+        bad_normals = ~numpy.isfinite(vert_norms).all(axis=1) | (triangles_per_vertex == 0)
+        repeated = (triangles[:, [0, 1, 2]] == triangles[:, [1, 2, 0]]).any(axis=1)
+        bad_normals[triangles[repeated].ravel()] = True
+        bad_normal_count = numpy.count_nonzero(bad_normals)
         if bad_normal_count:
+            bad_vertices = self.vertices[bad_normals]
+            vert_norms[bad_normals] = bad_vertices / numpy.sqrt(numpy.sum(bad_vertices ** 2, axis=1))[:, numpy.newaxis]
             self.logger.warn(" %d vertices have bad normals" % bad_normal_count)
         util.log_debug_array(LOG, vert_norms, "vertex_normals", owner=self.__class__.__name__)
         self.vertex_normals = vert_norms
@@ -557,38 +717,18 @@ class Surface(MappedType):
     @property
     def edges(self):
         """
-        A sorted list of the two element tuples(vertex_0, vertex_1) representing
-        the edges of the mesh.
+        A sorted sequence of the two element tuples(vertex_0, vertex_1)
+        representing the edges of the mesh.
         """
-        if self._edges is None:
-            self._edges = self._find_edges()
-        return self._edges
-
-    def _find_edges(self):
-        """
-        Find all the edges of the mesh surface, return them sorted as a list of
-        two element tuple, where the elements are vertex indices.
-        """
-        v0 = numpy.vstack((self.triangles[:, 0][:, numpy.newaxis],
-                           self.triangles[:, 0][:, numpy.newaxis],
-                           self.triangles[:, 1][:, numpy.newaxis]))
-        v1 = numpy.vstack((self.triangles[:, 1][:, numpy.newaxis],
-                           self.triangles[:, 2][:, numpy.newaxis],
-                           self.triangles[:, 2][:, numpy.newaxis]))
-        edges = numpy.hstack((v0, v1))
-        edges.sort(axis=1)
-        edges = set(tuple(edges[k]) for k in xrange(edges.shape[0]))
-        edges = sorted(edges)
-        return edges
+        edges = self.topology.edges
+        return _IndexRows(numpy.arange(0, edges.size + 1, 2), edges.ravel(), tuple)
 
     @property
     def number_of_edges(self):
         """
         The number of edges making up the mesh surface.
         """
-        if self._number_of_edges is None:
-            self._number_of_edges = len(self.edges)
-        return self._number_of_edges
+        return self.topology.edges.shape[0]
 
     @property
     def edge_lengths(self):
@@ -604,9 +744,8 @@ class Surface(MappedType):
         Calculate the Euclidean distance between the pair of vertices that
         define the edges in the ``edges`` attribute.
         """
-        # TODO: Would a Sparse matrix be a more useful data structure for these???
-        elem = numpy.sqrt(((self.vertices[self.edges, :][:, 0, :] -
-                            self.vertices[self.edges, :][:, 1, :]) ** 2).sum(axis=1))
+        edges = self.topology.edges
+        elem = numpy.sqrt(((self.vertices[edges[:, 0], :] - self.vertices[edges[:, 1], :]) ** 2).sum(axis=1))
 
         self.edge_mean_length = float(elem.mean())
         self.edge_min_length = float(elem.min())
@@ -638,18 +777,9 @@ class Surface(MappedType):
     @property
     def edge_triangles(self):
         """
-        List of the pairs of triangles sharing an edge.
+        Sequence of the set of triangles sharing each edge.
         """
-        if self._edge_triangles is None:
-            self._edge_triangles = self._find_edge_triangles()
-        return self._edge_triangles
-
-    def _find_edge_triangles(self):
-        triangles = [None] * self.number_of_edges
-        for k in xrange(self.number_of_edges):
-            triangles[k] = (frozenset(self.vertex_triangles[self.edges[k][0]]) &
-                            frozenset(self.vertex_triangles[self.edges[k][1]]))
-        return triangles
+        return _IndexRows(self.topology.edge_triangle_indptr, self.topology.edge_triangle_indices)
 
     def compute_topological_constants(self):
         """
@@ -661,9 +791,9 @@ class Surface(MappedType):
         We call isolated vertices those who do not belong to at least 3 triangles.
         """
         euler = self.number_of_vertices + self.number_of_triangles - self.number_of_edges
-        triangles_per_vertex = numpy.array(map(len, self.vertex_triangles))
+        triangles_per_vertex = numpy.diff(self.topology.triangle_indptr)
         isolated = numpy.nonzero(triangles_per_vertex < 3)
-        triangles_per_edge = numpy.array(map(len, self.edge_triangles))
+        triangles_per_edge = numpy.diff(self.topology.edge_triangle_indptr)
         pinched_off = numpy.nonzero(triangles_per_edge > 2)
         holes = numpy.nonzero(triangles_per_edge < 2)
         return euler, isolated[0], pinched_off[0], holes[0]
@@ -718,24 +848,20 @@ class Surface(MappedType):
 
         """
 
-        from math import exp, pi
-
         assert fv.shape[0] == self.vertices.shape[0]
         assert hasattr(self, 'geodesic_distance_matrix')
 
-        lbo = numpy.zeros_like(fv)
-        gd = self.geodesic_distance_matrix
-        for w in range(len(self.vertices)):
-            mesh_sum = 0.0
-            for t in range(len(self.triangles)):
-                face_sum = 0.0
-                for p in self.triangles[t]:
-                    face_sum += exp(-gd[w, p] ** 2 / (4 * h)) * (fv[p] - fv[w])
-                face_sum *= self.triangle_areas[t] / 3.0
-                mesh_sum += face_sum
-            lbo[w] = mesh_sum / (4.0 * pi * h ** 2)
+        # the sum over faces is a sum over vertices p, weighted by a third of the area of the faces around p
+        vertex_areas = numpy.bincount(self.triangles.ravel(), numpy.repeat(self.triangle_areas[:, 0], 3),
+                                      self.vertices.shape[0]) / 3.0
+        vertex_areas = vertex_areas.reshape((-1, ) + (1, ) * (fv.ndim - 1))
+        # vertices without a stored geodesic distance are at distance 0, where the kernel is 1
+        kernel = scipy.sparse.csr_matrix(self.geodesic_distance_matrix, dtype=numpy.float64, copy=True)
+        kernel.data = numpy.exp(-kernel.data ** 2 / (4 * h)) - 1.0
+        weighted_fv = vertex_areas * fv
+        lbo = weighted_fv.sum(axis=0) + kernel.dot(weighted_fv) - fv * (vertex_areas.sum() + kernel.dot(vertex_areas))
 
-        return lbo
+        return lbo / (4.0 * numpy.pi * h ** 2)
 
     # TODO
     def scientific_validate(self):
@@ -888,28 +1014,27 @@ class Surface(MappedType):
                                                                         + SPLIT_BUFFER_SIZE)},
                                             KEY_HEMISPHERE: HEMISPHERE_RIGHT}
 
-        ### Iterate Triangles and find the slice where it fits best, based on its vertices indexes:
-        for i in xrange(self.number_of_triangles):
-            current_triangle = [self.triangles[i][j] for j in range(3)]
-            fit_slice, transformed_triangle = self._find_slice(current_triangle)
-
-            if fit_slice is not None:
-                split_triangles[fit_slice].append(transformed_triangle)
-            else:
-                # triangle ignored, as it has vertices over multiple slices.
-                ignored_triangles_counter += 1
-                continue
+        ### Find for each triangle the first slice containing all its vertices:
+        triangles = self.triangles
+        slice_vertices = [self.split_slices[i][KEY_VERTICES] for i in xrange(self.number_of_split_slices)]
+        slice_starts = numpy.array([v[KEY_START] for v in slice_vertices])
+        slice_ends = numpy.array([v[KEY_END] for v in slice_vertices])
+        fits = ((slice_starts <= triangles.min(axis=1)[:, numpy.newaxis]) &
+                (triangles.max(axis=1)[:, numpy.newaxis] < slice_ends))
+        # triangles are ignored if they have vertices over multiple slices.
+        fit_slice = numpy.where(fits.any(axis=1), fits.argmax(axis=1), -1)
+        ignored_triangles_counter = numpy.count_nonzero(fit_slice < 0)
+        for i in xrange(self.number_of_split_slices):
+            split_triangles[i] = triangles[fit_slice == i] - slice_starts[i]
 
-        final_split_triangles = []
         last_triangles_idx = 0
 
         ### Concatenate triangles, to be stored in a single HDF5 array.
         for slice_idx, split_ in enumerate(split_triangles):
             self.split_slices[slice_idx][KEY_TRIANGLES] = {KEY_START: last_triangles_idx,
                                                            KEY_END: last_triangles_idx + len(split_)}
-            final_split_triangles.extend(split_)
             last_triangles_idx += len(split_)
-        self.split_triangles = numpy.array(final_split_triangles, dtype=numpy.int32)
+        self.split_triangles = numpy.concatenate(split_triangles).astype(numpy.int32)
 
         if ignored_triangles_counter > 0:
             LOG.warning("Ignored triangles from multiple hemispheres: " + str(ignored_triangles_counter))
@@ -985,17 +1110,6 @@ class Surface(MappedType):
             slices_number += 1
         return slices_number
 
-    def _find_slice(self, triangle):
-        split_slices = self.split_slices  # because of performance: 1.5 times slower without this
-        mn = min(triangle)
-        mx = max(triangle)
-        for i in xrange(self.number_of_split_slices):
-            v = split_slices[i][KEY_VERTICES]  # extracted for performance
-            slice_start = v[KEY_START]
-            if slice_start <= mn and mx < v[KEY_END]:
-                return i, [triangle[j] - slice_start for j in range(3)]
-        return None, triangle
-
     ####################################### Split for Picking
     #######################################
     def get_pick_vertices_slice(self, slice_number=0):
@@ -1072,11 +1186,20 @@ class Surface(MappedType):
     def generate_region_boundaries(self, region_mapping):
         """
         Return the full region boundaries, including: vertices, normals and lines indices.
+        These are kept for each region mapping data seen, so that they are generated only once.
         """
+        array_data = region_mapping.array_data
+        key = array_data.shape, array_data.dtype.str, hashlib.sha1(numpy.ascontiguousarray(array_data)).hexdigest()
+        if self._region_boundaries is None:
+            self._region_boundaries = {}
+        if key not in self._region_boundaries:
+            self._region_boundaries[key] = self._find_region_boundaries(array_data)
+        return self._region_boundaries[key]
+
+    def _find_region_boundaries(self, array_data):
         boundary_vertices = []
         boundary_lines = []
         boundary_normals = []
-        array_data = region_mapping.array_data
 
         for slice_idx in xrange(self.number_of_split_slices):
             # Generate the boundaries sliced for the off case where we might overflow the buffer capacity
@@ -1084,108 +1207,56 @@ class Surface(MappedType):
             slice_vertices = self.get_vertices_slice(slice_idx)
             slice_normals = self.get_vertex_normals_slice(slice_idx)
             first_index_in_slice = self.split_slices[str(slice_idx)][KEY_VERTICES][KEY_START]
-            # These will keep track of the vertices / triangles / normals for this slice that have
-            # been processed and were found as a part of the boundary
-            processed_vertices = []
-            processed_triangles = []
-            processed_normals = []
-            for triangle in slice_triangles:
-                triangle += first_index_in_slice
-                # Check if there are two points from a triangles that are in separate regions
-                # then send this to further processing that will generate the corresponding
-                # region separation lines depending on the 3rd point from the triangle
-                rt0, rt1, rt2 = array_data[triangle]
-                if rt0 - rt1:
-                    reg_idx1, reg_idx2, dangling_idx = 0, 1, 2
-                elif rt1 - rt2:
-                    reg_idx1, reg_idx2, dangling_idx = 1, 2, 0
-                elif rt2 - rt0:
-                    reg_idx1, reg_idx2, dangling_idx = 2, 0, 1
-                else:
-                    continue
-
-                lines_vert, lines_ind, lines_norm = self._process_triangle(triangle, reg_idx1, reg_idx2, dangling_idx,
-                                                                           first_index_in_slice, array_data,
-                                                                           slice_vertices, slice_normals)
-                ind_offset = len(processed_vertices) / 3
-                processed_vertices.extend(lines_vert)
-                processed_normals.extend(lines_norm)
-                processed_triangles.extend([ind + ind_offset for ind in lines_ind])
-            boundary_vertices.append(processed_vertices)
-            boundary_lines.append(processed_triangles)
-            boundary_normals.append(processed_normals)
+            lines_vert, lines_ind, lines_norm = self._region_separation_lines(
+                slice_triangles, array_data[slice_triangles + first_index_in_slice], slice_vertices, slice_normals)
+            boundary_vertices.append(lines_vert.ravel().tolist())
+            boundary_lines.append(lines_ind.tolist())
+            boundary_normals.append(lines_norm.ravel().tolist())
         return numpy.array([boundary_vertices, boundary_lines, boundary_normals])
 
     @staticmethod
-    def _process_triangle(triangle, reg_idx1, reg_idx2, dangling_idx, indices_offset,
-                          region_mapping_array, vertices, normals):
-        """
-        Process a triangle and generate the required data for a region separation.
-        :param triangle: the actual triangle as a 3 element vector
-        :param reg_idx1: the first vertex that is in a 'conflicting' region
-        :param reg_idx2: the second vertex that is in a 'conflicting' region
-        :param dangling_idx: the third vector for which we know nothing yet.
-                    Depending on this we might generate a line, or a 3 star centered in the triangle
-        :param indices_offset: to take into account the slicing
-        :param region_mapping_array: the region mapping raw array for which the regions are computed
+    def _region_separation_lines(triangles, regions, vertices, normals):
+        """
+        Generate the region separation lines within the triangles with vertices in separate regions.
+        A triangle spanning 2 regions gets a line cutting through the middle of the two edges between
+        the regions, and a triangle spanning 3 regions a 3-way star, from its center to the middle of
+        each edge.
+        :param triangles: the triangles, as indices into vertices and normals
+        :param regions: the region of each vertex of the triangles
         :param vertices: the current vertex slice
         :param normals: the current normals slice
-        """
-
-        def _star_triangle(point0, point1, point2, result_array):
-            """
-            Helper function that for a given triangle generates a 3-way star centered in the triangle center
-            """
-            center_vertex = [(point0[i] + point1[i] + point2[i]) / 3 for i in xrange(3)]
-            mid_line1 = [(point0[i] + point1[i]) / 2 for i in xrange(3)]
-            mid_line2 = [(point1[i] + point2[i]) / 2 for i in xrange(3)]
-            mid_line3 = [(point2[i] + point0[i]) / 2 for i in xrange(3)]
-            result_array.extend(center_vertex)
-            result_array.extend(mid_line1)
-            result_array.extend(mid_line2)
-            result_array.extend(mid_line3)
-
-        def _slice_triangle(point0, point1, point2, result_array):
-            """
-            Helper function that for a given triangle generates a line cutting thtough the middle of two edges.
-            """
-            mid_line1 = [(point0[i] + point1[i]) / 2 for i in xrange(3)]
-            mid_line2 = [(point0[i] + point2[i]) / 2 for i in xrange(3)]
-            result_array.extend(mid_line1)
-            result_array.extend(mid_line2)
-
-        # performance opportunity: we are computing some values available in caller
-
-        p0 = vertices[triangle[reg_idx1] - indices_offset]
-        p1 = vertices[triangle[reg_idx2] - indices_offset]
-        p2 = vertices[triangle[dangling_idx] - indices_offset]
-        n0 = normals[triangle[reg_idx1] - indices_offset]
-        n1 = normals[triangle[reg_idx2] - indices_offset]
-        n2 = normals[triangle[dangling_idx] - indices_offset]
-        result_vertices = []
-        result_normals = []
-
-        dangling_reg = region_mapping_array[triangle[dangling_idx]]
-        reg_1 = region_mapping_array[triangle[reg_idx1]]
-        reg_2 = region_mapping_array[triangle[reg_idx2]]
-
-        if dangling_reg != reg_1 and dangling_reg != reg_2:
-            # Triangle is actually spanning 3 regions. Create a vertex in the center of the triangle, which connects to
-            # the middle of each edge
-            _star_triangle(p0, p1, p2, result_vertices)
-            _star_triangle(n0, n1, n2, result_normals)
-            result_lines = [0, 1, 0, 2, 0, 3]
-        elif dangling_reg == reg_1:
-            # Triangle spanning only 2 regions, draw a line through the middle of the triangle
-            _slice_triangle(p1, p0, p2, result_vertices)
-            _slice_triangle(n1, n0, n2, result_normals)
-            result_lines = [0, 1]
-        else:
-            # Triangle spanning only 2 regions, draw a line through the middle of the triangle
-            _slice_triangle(p0, p1, p2, result_vertices)
-            _slice_triangle(n0, n1, n2, result_normals)
-            result_lines = [0, 1]
-        return result_vertices, result_lines, result_normals
+        :returns: the vertices, lines indices and normals of the separation lines
+        """
+        # Order the vertices of the triangles spanning regions so that the first two are in separate regions,
+        # the third, dangling one being in either of these, or in a third region
+        separated = regions != regions[:, [1, 2, 0]]
+        spanning = separated.any(axis=1)
+        order = (separated.argmax(axis=1)[spanning, numpy.newaxis] + numpy.arange(3)) % 3
+        rows = numpy.arange(order.shape[0])[:, numpy.newaxis]
+        triangles = triangles[spanning][rows, order]
+        regions = regions[spanning][rows, order]
+        star = (regions[:, 2] != regions[:, 0]) & (regions[:, 2] != regions[:, 1])
+        dangling_in_first = regions[:, 2] == regions[:, 0]
+
+        points_per_triangle = numpy.where(star, 4, 2)
+        points_mask = numpy.arange(4) < points_per_triangle[:, numpy.newaxis]
+        lines_mask = numpy.arange(6) < 2 * (points_per_triangle[:, numpy.newaxis] - 1)
+        first_points = numpy.cumsum(points_per_triangle) - points_per_triangle
+        lines = (numpy.array([0, 1, 0, 2, 0, 3]) + first_points[:, numpy.newaxis])[lines_mask]
+
+        def _line_points(points):
+            p0, p1, p2 = points[:, 0], points[:, 1], points[:, 2]
+            result = numpy.empty((points.shape[0], 4, 3), dtype=points.dtype)
+            # a star joins the center to the middle of each edge, a line the middles of two edges
+            # from the vertex alone in its region
+            result[:, 0] = numpy.where(star[:, numpy.newaxis], (p0 + p1 + p2) / 3, (p0 + p1) / 2)
+            result[:, 1] = numpy.where(star[:, numpy.newaxis], (p0 + p1) / 2,
+                                       numpy.where(dangling_in_first[:, numpy.newaxis], (p1 + p2) / 2, (p0 + p2) / 2))
+            result[:, 2] = (p1 + p2) / 2
+            result[:, 3] = (p2 + p0) / 2
+            return result[points_mask]
+
+        return _line_points(vertices[triangles]), lines, _line_points(normals[triangles])
 
 
 # TODO consider using just an enum on surface to indicate type, avoid excess classes.
@@ -143,6 +143,36 @@ class TimeSeries(types_mapped.MappedType):
         """
         return self.get_data('data', data_slice)
 
+    def read_data_blocks(self, start=0, stop=None, block_bytes=2 ** 26):
+        """
+        Iterate over the data from time point start to stop in consecutive
+        blocks of about block_bytes, yielding (first time point, block).
+        """
+        data_shape = self.read_data_shape()
+        stop = data_shape[0] if stop is None else min(stop, data_shape[0])
+        block_tpts = max(1, int(block_bytes // (8 * numpy.prod(data_shape[1:]))))
+        for first in range(start, stop, block_tpts):
+            yield first, numpy.asarray(self.read_data_slice((slice(first, min(first + block_tpts, stop)), )))
+
+    @classmethod
+    def from_data_file(cls, file_name, shape=None, dtype=numpy.float64, **kwargs):
+        """
+        Create a time series whose data is memory-mapped from a .npy file,
+        so that it is read from disk as it is used instead of held in memory.
+
+        If shape is given, a new file of that shape and dtype is created, to
+        be filled in by the caller, e.g. block by block from a simulation;
+        otherwise the existing file is opened read-only.
+
+        The analysers read such data in blocks, so that time series larger
+        than memory can be analysed.
+        """
+        if shape is None:
+            data = numpy.load(file_name, mmap_mode='r')
+        else:
+            data = numpy.lib.format.open_memmap(file_name, mode='w+', dtype=dtype, shape=tuple(shape))
+        return cls(data=data, **kwargs)
+
     def read_time_page(self, current_page, page_size, max_size=None):
         """
         Compute time for current page.
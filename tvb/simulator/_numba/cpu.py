@@ -0,0 +1,300 @@
+"""
+Compiled CPU integration loop for region simulations.
+
+The loop integrates blocks of steps in Numba, covering delayed coupling, the
+integration scheme, the model equations and the history update, and only
+returns to Python with the trajectory of a block, at monitor sampling points.
+
+"""
+
+import math
+import numpy
+from numba import njit
+from tvb.simulator import coupling as coupling_module, integrators, noise as noise_module
+from tvb.simulator.models import linear, oscillator, wong_wang
+
+
+# model equations for one node, taking state variables, coupling variables, local coupling
+# and parameters, and returning the derivatives, as defined next to each model
+
+MODELS = {
+    oscillator.Generic2dOscillator: (oscillator._g2d_node, 'tau I a b c d e f g beta alpha gamma'),
+    oscillator.Kuramoto: (oscillator._kuramoto_node, 'omega'),
+    linear.Linear: (linear._linear_node, 'gamma'),
+    wong_wang.ReducedWongWang: (wong_wang._rww_node, 'a b d gamma tau_s w J_N I_o'),
+}
+
+
+def make_dfun(node_dfun, n_svar, n_cvar, n_param):
+    "Construct model equations over nodes, with parameters P of shape (n_param, n_node)."
+    ns = {'node_dfun': njit(getattr(node_dfun, 'py_func', node_dfun))}
+    template = "def dfun(dX, X, C, P):\n    for i in range(X.shape[1]):\n        %s, = node_dfun(%s)"
+    # region simulations have no local coupling
+    args = (['X[%d, i]' % (v, ) for v in range(n_svar)] + ['C[%d, i]' % (c, ) for c in range(n_cvar)]
+            + ['0.0'] + ['P[%d, i]' % (p, ) for p in range(n_param)])
+    template %= ', '.join('dX[%d, i]' % (v, ) for v in range(n_svar)), ', '.join(args)
+    exec template in ns
+    return njit(ns['dfun'])
+
+
+# coupling functions, pre-summation on (x_i, x_j), post-summation on sum
+
+@njit
+def _pre_identity(xi, xj, p):
+    return xj
+
+
+@njit
+def _pre_difference(xi, xj, p):
+    return xj - xi
+
+
+@njit
+def _pre_sin_difference(xi, xj, p):
+    return math.sin(xj - xi)
+
+
+@njit
+def _pre_tanh(xi, xj, p):
+    return p[0] * (1 + math.tanh((p[1] * xj - p[2]) / p[3]))
+
+
+@njit
+def _post_identity(gx, p, n_cvar):
+    return gx
+
+
+@njit
+def _post_linear(gx, p, n_cvar):
+    return p[0] * gx + p[1]
+
+
+@njit
+def _post_scale(gx, p, n_cvar):
+    return p[0] * gx
+
+
+@njit
+def _post_kuramoto(gx, p, n_cvar):
+    return p[0] / n_cvar * gx
+
+
+@njit
+def _post_sigmoid(gx, p, n_cvar):
+    return p[0] + ((p[1] - p[0]) / (1.0 + math.exp(-p[3] * ((gx - p[2]) / p[4]))))
+
+
+COUPLINGS = {
+    coupling_module.Linear: (_pre_identity, '', _post_linear, 'a b'),
+    coupling_module.Scaling: (_pre_identity, '', _post_scale, 'a'),
+    coupling_module.Difference: (_pre_difference, '', _post_scale, 'a'),
+    coupling_module.Kuramoto: (_pre_sin_difference, '', _post_kuramoto, 'a'),
+    coupling_module.HyperbolicTangent: (_pre_tanh, 'a b midpoint sigma', _post_identity, ''),
+    coupling_module.Sigmoidal: (_pre_identity, '', _post_sigmoid, 'cmin cmax midpoint a sigma'),
+}
+
+
+# integration schemes, Z is the scaled noise realization for the step, or zero
+
+def make_euler_scheme(dfun):
+    "Construct Euler scheme for given model equations."
+
+    @njit
+    def scheme(X, C, P, dt, Z, k1, k2, k3, k4, inter):
+        dfun(k1, X, C, P)
+        for v in range(X.shape[0]):
+            for i in range(X.shape[1]):
+                X[v, i] = X[v, i] + dt * k1[v, i] + Z[v, i]
+
+    return scheme
+
+
+def make_heun_scheme(dfun):
+    "Construct Heun scheme for given model equations."
+
+    @njit
+    def scheme(X, C, P, dt, Z, k1, k2, k3, k4, inter):
+        dfun(k1, X, C, P)
+        for v in range(X.shape[0]):
+            for i in range(X.shape[1]):
+                inter[v, i] = X[v, i] + dt * k1[v, i] + Z[v, i]
+        dfun(k2, inter, C, P)
+        for v in range(X.shape[0]):
+            for i in range(X.shape[1]):
+                X[v, i] = X[v, i] + (k1[v, i] + k2[v, i]) * dt / 2.0 + Z[v, i]
+
+    return scheme
+
+
+def make_rk4_scheme(dfun):
+    "Construct Runge-Kutta 4th order scheme for given model equations."
+
+    @njit
+    def scheme(X, C, P, dt, Z, k1, k2, k3, k4, inter):
+        dt2 = dt / 2.0
+        dt6 = dt / 6.0
+        dfun(k1, X, C, P)
+        for v in range(X.shape[0]):
+            for i in range(X.shape[1]):
+                inter[v, i] = X[v, i] + dt2 * k1[v, i]
+        dfun(k2, inter, C, P)
+        for v in range(X.shape[0]):
+            for i in range(X.shape[1]):
+                inter[v, i] = X[v, i] + dt2 * k2[v, i]
+        dfun(k3, inter, C, P)
+        for v in range(X.shape[0]):
+            for i in range(X.shape[1]):
+                inter[v, i] = X[v, i] + dt * k3[v, i]
+        dfun(k4, inter, C, P)
+        for v in range(X.shape[0]):
+            for i in range(X.shape[1]):
+                X[v, i] = X[v, i] + dt6 * (k1[v, i] + 2.0 * k2[v, i] + 2.0 * k3[v, i] + k4[v, i])
+
+    return scheme
+
+
+SCHEMES = {
+    integrators.EulerDeterministic: make_euler_scheme,
+    integrators.EulerStochastic: make_euler_scheme,
+    integrators.HeunDeterministic: make_heun_scheme,
+    integrators.HeunStochastic: make_heun_scheme,
+    integrators.RungeKutta4thOrderDeterministic: make_rk4_scheme,
+}
+
+
+def make_region_loop(scheme, pre, post):
+    "Construct loop over steps for given scheme and coupling functions."
+
+    @njit
+    def loop(step0, X, buf, traj, Z, cvars, rows, cols, idelays, weights, dt, P, pre_p, post_p):
+        n_time, n_cvar = buf.shape[0], buf.shape[1]
+        C = numpy.zeros((n_cvar, X.shape[1]))
+        k1, k2, k3, k4 = numpy.empty_like(X), numpy.empty_like(X), numpy.empty_like(X), numpy.empty_like(X)
+        inter = numpy.empty_like(X)
+        for s in range(traj.shape[0]):
+            step = step0 + s
+            # delayed coupling, with x_i taken as in SparseCoupling
+            t_now = (step - 1) % n_time
+            C[:] = 0.0
+            for k in range(weights.size):
+                i, j = rows[k], cols[k]
+                t_delayed = (step - 1 - idelays[k] + n_time) % n_time
+                for c in range(n_cvar):
+                    C[c, i] += weights[k] * pre(buf[t_now, c, j], buf[t_delayed, c, j], pre_p)
+            for c in range(n_cvar):
+                for i in range(X.shape[1]):
+                    C[c, i] = post(C[c, i], post_p, n_cvar)
+            # integrate & update history
+            scheme(X, C, P, dt, Z[s % Z.shape[0]], k1, k2, k3, k4, inter)
+            t_step = step % n_time
+            for c in range(n_cvar):
+                for i in range(X.shape[1]):
+                    buf[t_step, c, i] = X[cvars[c], i]
+            traj[s] = X
+
+    return loop
+
+
+_loops = {}
+
+
+def _get_loop(model, coupling, integrator):
+    key = type(model), type(coupling), type(integrator)
+    if key not in _loops:
+        node_dfun, param_names = MODELS[type(model)]
+        dfun = make_dfun(node_dfun, model._nvar, len(model.cvar), len(param_names.split()))
+        pre, _, post, _ = COUPLINGS[type(coupling)]
+        _loops[key] = make_region_loop(SCHEMES[type(integrator)](dfun), pre, post)
+    return _loops[key]
+
+
+def check_support(sim):
+    "Raise ValueError if simulator cannot be run by the compiled loop."
+    unsupported = []
+    if sim.surface is not None:
+        unsupported.append('surface')
+    if sim.stimulus is not None:
+        unsupported.append('stimulus')
+    if type(sim.model) not in MODELS or sim.model.number_of_modes != 1:
+        unsupported.append('model %s' % (sim.model.__class__.__name__, ))
+    if type(sim.coupling) not in COUPLINGS:
+        unsupported.append('coupling %s' % (sim.coupling.__class__.__name__, ))
+    else:
+        for names in COUPLINGS[type(sim.coupling)][1::2]:
+            for name in names.split():
+                if numpy.size(getattr(sim.coupling, name)) != 1:
+                    unsupported.append('non-scalar coupling parameter %s' % (name, ))
+    if type(sim.integrator) not in SCHEMES:
+        unsupported.append('integrator %s' % (sim.integrator.__class__.__name__, ))
+    elif isinstance(sim.integrator, integrators.IntegratorStochastic):
+        noise = sim.integrator.noise
+        if type(noise) is not noise_module.Additive or noise.ntau > 0.0:
+            unsupported.append('noise %s' % (noise.__class__.__name__, ))
+    if sim.integrator.clamped_state_variable_values is not None:
+        unsupported.append('clamped state variables')
+    if unsupported:
+        raise ValueError("The numba backend does not support %s." % (', '.join(unsupported), ))
+
+
+class RegionLoop(object):
+    "Runs a configured region simulator in compiled blocks of steps."
+
+    max_block = 1024
+
+    def __init__(self, sim):
+        check_support(sim)
+        self.sim = sim
+        self.loop = _get_loop(sim.model, sim.coupling, sim.integrator)
+        n_node = sim.number_of_nodes
+        _, param_names = MODELS[type(sim.model)]
+        self.P = numpy.array([numpy.broadcast_to(getattr(sim.model, name).reshape((-1, )), (n_node, ))
+                              for name in param_names.split()], dtype=numpy.float64)
+        _, pre_names, _, post_names = COUPLINGS[type(sim.coupling)]
+        self.pre_p, self.post_p = [numpy.array([float(numpy.ravel(getattr(sim.coupling, name))[0])
+                                                for name in names.split()] + [0.0])
+                                   for names in (pre_names, post_names)]
+        self.state = None
+        self.step = None
+
+    def _noise(self, n_step, shape):
+        "Scaled noise for a block of steps, drawn as the NumPy integrators would."
+        integrator = self.sim.integrator
+        if not isinstance(integrator, integrators.IntegratorStochastic):
+            return numpy.zeros((1, ) + shape)
+        noise = integrator.noise
+        realization = noise.generate((n_step, ) + shape + (1, ))
+        realization *= noise.gfun(None)
+        return realization[..., 0]
+
+    def _block_length(self, step, last_step):
+        "Number of steps until next monitor sampling point or end of simulation."
+        n_step = min(last_step - step + 1, self.max_block)
+        for monitor in self.sim.monitors:
+            istep = getattr(monitor, 'istep', None)
+            if istep:
+                n_step = min(n_step, (-step) % istep + 1)
+        return n_step
+
+    def __call__(self, first_step, n_steps, state):
+        "Generate monitor outputs for n_steps steps starting at first_step."
+        sim, history = self.sim, self.sim.history
+        X = state[..., 0].copy()
+        buf = history.buffer[..., 0]
+        cvars = sim.model.cvar.astype(numpy.intc)
+        args = (cvars, history.nnz_row_el_idx, history.nnz_col_el_idx, history.nnz_idelays, history.nnz_weights,
+                float(sim.integrator.dt), self.P, self.pre_p, self.post_p)
+        step, last_step = first_step, first_step + n_steps - 1
+        self.state, self.step = state, first_step - 1
+        while step <= last_step:
+            n_step = self._block_length(step, last_step)
+            traj = numpy.empty((n_step, ) + X.shape)
+            Z = self._noise(n_step, X.shape)
+            self.loop(step, X, buf, traj, Z, *args)
+            # observe on (svar, step, node, mode) to evaluate all steps at once
+            observed = sim.model.observe(traj[..., numpy.newaxis].transpose((1, 0, 2, 3)))
+            observed = observed.transpose((1, 0, 2, 3))
+            output = [monitor.record_block(step, observed) for monitor in sim.monitors]
+            self.state, self.step = X[..., numpy.newaxis], step + n_step - 1
+            if any(outputi is not None for outputi in output):
+                yield output
+            step += n_step
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Batched parameter sweeps of region simulations.
+
+A BatchSimulator runs several parameter sets of an otherwise identical region
+simulation in a single integration loop. Instances are stacked along the mode
+axis of the state, so that history, coupling and the model equations are
+evaluated once per step for all instances, while each instance is recorded by
+its own copy of the monitors.
+
+.. moduleauthor:: Marmaduke Woodman <marmaduke.woodman@univ-amu.fr>
+
+"""
+
+import copy
+import time
+import numpy
+import tvb.basic.traits.types_basic as basic
+from tvb.simulator import integrators
+from tvb.simulator.models.base import ModelNumbaDfun
+from .common import get_logger
+from .history import OffsetSparseHistory
+from .simulator import Simulator
+
+
+LOG = get_logger(__name__)
+
+
+def _resolve(obj, path):
+    "Resolve dotted attribute path, e.g. 'integrator.noise.nsig', to (owner, attribute name)."
+    names = path.split('.')
+    for name in names[:-1]:
+        obj = getattr(obj, name)
+    return obj, names[-1]
+
+
+class BatchSimulator(Simulator):
+    """
+    A Simulator which integrates a set of parameter variations of a region
+    simulation in a single loop.
+
+    The ``sweep`` attribute maps dotted attribute paths, relative to the
+    simulator, to sequences of values, one per instance, e.g.::
+
+        sim = BatchSimulator(connectivity=conn, coupling=coupling.Linear(),
+                             sweep={'coupling.a': [0.001, 0.002, 0.004],
+                                    'integrator.noise.nsig': [1e-5, 1e-5, 1e-4]})
+        for ts_xs in sim.run():  # one entry per instance
+            (t, tavg), = ts_xs
+
+    Only array valued attributes of the model, coupling and noise can be
+    swept, and the model must have a single mode, as instances are stacked
+    along the mode axis. Swept noise parameters, such as nsig, are broadcast
+    to (state variables, 1, instances), as noise applies per state variable.
+    All instances start from the same initial history and noise stream state,
+    so that each instance reproduces the run obtained from `instance_simulator`,
+    up to round-off of the model equations. Their noise is therefore drawn once
+    per step, for one instance, and shared by all of them.
+
+    """
+
+    sweep = basic.Dict(
+        label="Parameter sweep",
+        default={},
+        required=True,
+        doc="""Maps dotted attribute paths, e.g. 'coupling.a' or 'model.tau',
+        to sequences of values, one value per instance of the batch.""")
+
+    _template = None
+    _initial = None
+    _instance_monitors = None
+
+    @property
+    def number_of_instances(self):
+        "Number of parameter sets in the batch."
+        sizes = set(len(values) for values in self.sweep.values())
+        if len(sizes) != 1:
+            raise ValueError("Swept parameters must all have the same number of values, got %r" % (sizes, ))
+        return sizes.pop()
+
+    def configure(self, full_configure=True):
+        """
+        Configure the batch: the simulator is first configured as a single
+        instance, then its state, history and parameters are expanded along
+        the mode axis for all instances.
+
+        """
+        n_inst = self.number_of_instances
+        if self.surface is not None:
+            raise ValueError("BatchSimulator supports region simulations only.")
+        if self.model.number_of_modes != 1:
+            raise ValueError("BatchSimulator requires a model with a single mode, %s has %d."
+                             % (self.model.__class__.__name__, self.model.number_of_modes))
+        if not isinstance(self.monitors, (list, tuple)):
+            self.monitors = [self.monitors]
+        self._template = Simulator(
+            connectivity=self.connectivity, conduction_speed=self.conduction_speed,
+            coupling=copy.deepcopy(self.coupling), model=copy.deepcopy(self.model),
+            integrator=copy.deepcopy(self.integrator), stimulus=self.stimulus,
+            initial_conditions=self.initial_conditions, simulation_length=self.simulation_length,
+            monitors=copy.deepcopy(self.monitors))
+        self._instance_monitors = [copy.deepcopy(self.monitors) for _ in range(n_inst)]
+        super(BatchSimulator, self).configure(full_configure=full_configure)
+        for monitors in self._instance_monitors:
+            for monitor in monitors:
+                monitor.configure()
+                monitor.config_for_sim(self)
+        self._configure_batch_state(n_inst)
+        self._configure_sweep(n_inst)
+        LOG.info('Batch of %d instances configured for sweep over %s', n_inst, ', '.join(sorted(self.sweep.keys())))
+        return self
+
+    def _configure_batch_state(self, n_inst):
+        "Expand state, history and noise along mode axis."
+        noise = getattr(self.integrator, 'noise', None)
+        self._initial = {
+            'step': self.current_step,
+            'state': self.current_state.copy(),
+            'buffer': self.history.buffer.copy(),
+            'rng': noise.random_stream.get_state() if noise is not None else None,
+            'eta': noise._eta.copy() if noise is not None and noise._eta is not None else None,
+        }
+        self.current_state = numpy.tile(self.current_state, (1, 1, n_inst))
+        buffer = numpy.tile(self.history.buffer, (1, 1, 1, n_inst))
+        self.history = OffsetSparseHistory(self.connectivity.weights, self.connectivity.idelays,
+                                     self.model.cvar, n_inst)
+        self.history.initialize(buffer)
+        self.model.number_of_modes = n_inst
+        if isinstance(self.integrator, integrators.IntegratorStochastic):
+            if self._initial['eta'] is not None:
+                noise._eta = numpy.tile(self._initial['eta'], (1, 1, n_inst))
+            noise.generate = self._generate_instance_noise
+
+    def _configure_sweep(self, n_inst):
+        "Set swept parameters, broadcasting along the instance (mode) axis."
+        if isinstance(self.model, ModelNumbaDfun):
+            # gufunc dfuns are written for a single mode, use equivalent NumPy form
+            self.model.dfun = self.model._numpy_dfun
+            for name in self.model.trait.keys():
+                value = getattr(self.model, name)
+                if isinstance(value, numpy.ndarray) and value.shape == (self.number_of_nodes, ):
+                    setattr(self.model, name, value.reshape((-1, 1)))
+        for path, values in self.sweep.items():
+            owner, name = _resolve(self, path)
+            if not isinstance(getattr(owner, name), numpy.ndarray):
+                raise ValueError("Swept attribute %r is not an array attribute." % (path, ))
+            values = numpy.array(values, dtype=numpy.float64).reshape((n_inst, ))
+            if owner is getattr(self.integrator, 'noise', None):
+                # gfun must have one entry per state variable along its first axis
+                values = numpy.tile(values, (self.model.nvar, 1, 1))
+            setattr(owner, name, values)
+        if 'model' in set(path.split('.')[0] for path in self.sweep):
+            self.model.update_derived_parameters()
+
+    def _generate_instance_noise(self, shape, lo=-1.0, hi=1.0):
+        """
+        Generate noise for all instances with a single draw: the streams of
+        their single runs start in the same state, so they draw the same
+        numbers, and only the coloured noise state differs between instances.
+        """
+        noise = self.integrator.noise
+        realization = noise.__class__.generate(noise, shape[:-1] + (1, ), lo, hi)
+        if realization.shape != shape:
+            realization = numpy.repeat(realization, shape[-1], axis=-1)
+        return realization
+
+    def _loop_monitor_output(self, step, state):
+        observed = self.model.observe(state)
+        output = []
+        for i, monitors in enumerate(self._instance_monitors):
+            observed_i = observed[..., i:i + 1]
+            output.append([monitor.record(step, observed_i) for monitor in monitors])
+        if any(outputi is not None for instance in output for outputi in instance):
+            return output
+
+    def instance_simulator(self, i):
+        """
+        Build and configure the single Simulator equivalent to the i-th
+        instance of the batch, starting from the same state as the batch.
+
+        """
+        sim = copy.deepcopy(self._template)
+        for path, values in self.sweep.items():
+            owner, name = _resolve(sim, path)
+            setattr(owner, name, numpy.array([values[i]], dtype=numpy.float64))
+        sim.configure()
+        sim.current_step = self._initial['step']
+        sim.current_state = self._initial['state'].copy()
+        sim.history.initialize(self._initial['buffer'].copy())
+        if self._initial['rng'] is not None:
+            sim.integrator.noise.random_stream.set_state(self._initial['rng'])
+            if self._initial['eta'] is not None:
+                sim.integrator.noise._eta = self._initial['eta'].copy()
+        return sim
+
+    def run(self, **kwds):
+        "Convenience method to call the simulator with **kwds and collect output data per instance."
+        n_mon = len(self.monitors)
+        ts = [[[] for _ in range(n_mon)] for _ in self._instance_monitors]
+        xs = [[[] for _ in range(n_mon)] for _ in self._instance_monitors]
+        wall_time_start = time.time()
+        for data in self(**kwds):
+            for its, ixs, idata in zip(ts, xs, data):
+                for tl, xl, t_x in zip(its, ixs, idata):
+                    if t_x is not None:
+                        t, x = t_x
+                        tl.append(t)
+                        xl.append(x)
+        elapsed_wall_time = time.time() - wall_time_start
+        LOG.info("%.3f s elapsed for %d instances, %.3fx real time", elapsed_wall_time, len(ts),
+                 elapsed_wall_time * 1e3 / self.simulation_length)
+        return [[(numpy.array(tl), numpy.array(xl)) for tl, xl in zip(its, ixs)]
+                for its, ixs in zip(ts, xs)]
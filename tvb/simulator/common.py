@@ -38,6 +38,7 @@ A module of classes and functions of common use.
 """
 
 import numpy
+import scipy.sparse
 import os
 import zipfile
 import logging
@@ -229,6 +230,42 @@ def iround(x):
     return int(y) + (y > 0)
 
 
+class RegionAverage(object):
+    """
+    Averages node data within the region each node is mapped to.
+
+    The averaging is held as a sparse (region, node) matrix with weights one
+    over the number of nodes in each region, so it is built once per mapping
+    and each application is a single sparse product over the node axis.
+
+    >>> average = RegionAverage(numpy.array([0, 0, 1]))
+    >>> average(numpy.array([1.0, 3.0, 5.0]))
+    array([2., 5.])
+
+    """
+
+    def __init__(self, region_mapping, n_region=None):
+        self.region_mapping = numpy.asarray(region_mapping, dtype=numpy.intp)
+        self.n_node = self.region_mapping.size
+        if n_region is None:
+            n_region = self.region_mapping.max() + 1
+        self.n_region = n_region
+        self.nodes_per_region = numpy.bincount(self.region_mapping, minlength=n_region)
+        empty, = numpy.where(self.nodes_per_region == 0)
+        if empty.size > 0:
+            raise ValueError("No nodes are mapped to regions %r." % (empty.tolist(), ))
+        weights = 1.0 / self.nodes_per_region[self.region_mapping]
+        self.matrix = scipy.sparse.csr_matrix(
+            (weights, (self.region_mapping, numpy.arange(self.n_node))),
+            shape=(self.n_region, self.n_node))
+
+    def __call__(self, data, axis=0):
+        "Average data over regions along axis, which must have one entry per node."
+        data = numpy.moveaxis(numpy.asarray(data), axis, 0)
+        average = self.matrix.dot(data.reshape((self.n_node, -1)))
+        return numpy.moveaxis(average.reshape((self.n_region, ) + data.shape[1:]), 0, axis)
+
+
 class Buffer(object):
     """
     Draft of a history object that allows us to track the current
@@ -82,6 +82,7 @@ following:
 
 """
 import numpy
+import scipy.sparse
 
 import tvb.basic.traits.core as core
 import tvb.basic.traits.types_basic as basic
@@ -145,8 +146,14 @@ class SparseCoupling(Coupling):
     A coupling implementation which takes advantage of a sparse weights structure to reduce the
     number of coupling terms evaluated.
 
+    A subclass whose `pre` depends only on the delayed afferent state x_j may set `separable`,
+    in which case the weighted sum over afferents is a sparse matrix product, and neither x_i
+    nor the weighted terms are built per connection.
+
     """
 
+    separable = False
+
     def _lri(self, nnz_row_el_idx):
         "Flat array of indices afferent, non-zero-weight connections."
         if not hasattr(self, '_cached_lri'):
@@ -156,9 +163,21 @@ class SparseCoupling(Coupling):
             LOG.debug('lri.size %d nzr.size %d', self._cached_lri.size, self._cached_nzr.size)
         return self._cached_lri, self._cached_nzr
 
+    def _sparse_weights(self, history):
+        "Sparse (node, connection) weights matrix summing connection terms into target nodes."
+        if not hasattr(self, '_cached_sparse_weights'):
+            h = history # type: SparseHistory
+            self._cached_sparse_weights = scipy.sparse.csr_matrix(
+                (h.nnz_weights, (h.nnz_row_el_idx, numpy.r_[:h.n_nnzw])), shape=(h.n_node, h.n_nnzw))
+        return self._cached_sparse_weights
+
     def __call__(self, step, history):
         h = history # type: SparseHistory
         x_i, x_j = h.query_sparse(step)
+        if self.separable:
+            weights = self._sparse_weights(h)
+            sum = numpy.array([weights.dot(pre_cvar) for pre_cvar in self.pre(x_i, x_j)])
+            return self.post(sum)
         sum = numpy.zeros_like(x_i)
         x_i = x_i[:, h.nnz_col_el_idx]
         pre = self.pre(x_i, x_j)
@@ -177,6 +196,8 @@ class Linear(SparseCoupling):
 
     """
 
+    separable = True
+
     a = arrays.FloatArray(
         label=":math:`a`",
         default=numpy.array([0.00390625,]),
@@ -207,6 +228,8 @@ class Scaling(SparseCoupling):
 
     """
 
+    separable = True
+
     a = basic.Float(
         label="Scaling factor",
         default=0.00390625,
@@ -233,6 +256,8 @@ class HyperbolicTangent(SparseCoupling):
 
     """
 
+    separable = True
+
     a = arrays.FloatArray(
         label=":math:`a`",
         default=numpy.array([1.0]),
@@ -268,7 +293,7 @@ class HyperbolicTangent(SparseCoupling):
         return simple_gen_astr(self, 'a b midpoint sigma')
 
 
-class Sigmoidal(Coupling):
+class Sigmoidal(SparseCoupling):
     r"""
     Provides a sigmoidal coupling function of the form
 
@@ -282,6 +307,8 @@ class Sigmoidal(Coupling):
 
     """
 
+    separable = True
+
     cmin = arrays.FloatArray(
         label=":math:`c_{min}`",
         default=numpy.array([-1.0,]),
@@ -324,7 +351,7 @@ class Sigmoidal(Coupling):
         return self.cmin + ((self.cmax - self.cmin) / (1.0 + numpy.exp(-self.a *((gx - self.midpoint) / self.sigma))))
 
 
-class SigmoidalJansenRit(Coupling):
+class SigmoidalJansenRit(SparseCoupling):
     r"""
     Provides a sigmoidal coupling function as described in the 
     Jansen and Rit model, of the following form
@@ -336,6 +363,8 @@ class SigmoidalJansenRit(Coupling):
 
     """
 
+    separable = True
+
     cmin = arrays.FloatArray(
         label=":math:`c_{min}`",
         default=numpy.array([0.0,]),
@@ -375,8 +404,8 @@ class SigmoidalJansenRit(Coupling):
         return simple_gen_astr(self, 'cmin cmax midpoint a r')
 
     def pre(self, x_i, x_j):
-        pre = self.cmax / (1.0 + numpy.exp(self.r * (self.midpoint - (x_j[:, 0] - x_j[:, 1]))))
-        return pre[:, numpy.newaxis]
+        pre = self.cmax / (1.0 + numpy.exp(self.r * (self.midpoint - (x_j[0] - x_j[1]))))
+        return pre[numpy.newaxis]
 
     def post(self, gx):
         return self.a * gx
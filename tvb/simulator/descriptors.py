@@ -34,6 +34,7 @@ Data descriptors for declaring workspace for algorithms and checking usage.
 
 """
 
+import copy
 import numpy
 import collections
 import weakref
@@ -54,6 +55,18 @@ class StaticAttr(object):
         else:
             super(StaticAttr, self).__setattr__(name, value)
 
+    def __deepcopy__(self, memo):
+        "Copy including descriptor state, which is held by the descriptors; read-only arrays are shared."
+        other = object.__new__(type(self))
+        memo[id(self)] = other
+        for klass in type(self).__mro__:
+            for attr in vars(klass).values():
+                if isinstance(attr, (NDArray, Final)) and self in attr.instance_state:
+                    attr._copy_state(self, other, memo)
+        for name, value in vars(self).items():
+            object.__setattr__(other, name, copy.deepcopy(value, memo))
+        return other
+
 
 class ImmutableAttrError(AttributeError):
     "Error due to modifying an immutable attribute."
@@ -111,6 +124,12 @@ class NDArray(StaticAttr):
         else:
             return self._get_or_create_state(instance).array
 
+    def _copy_state(self, instance, other, memo):
+        state = self.instance_state[instance]
+        shared = self.read_only and state.initialized
+        array = state.array if shared else copy.deepcopy(state.array, memo)
+        self.instance_state[other] = NDArray.State(array, state.initialized)
+
     def __set__(self, instance, value):
         state = self._get_or_create_state(instance)
         if self.read_only:
@@ -144,6 +163,9 @@ class Final(object):
     def _correct_type(self, value):
         return isinstance(value, self.type)
 
+    def _copy_state(self, instance, other, memo):
+        self.instance_state[other] = self.instance_state[instance]
+
     def __set__(self, instance, value):
         state = self._get_or_create_state(instance) # type: Final.State
         if state.initialized:
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Parameter grid exploration across local processes.
+
+A SimulationFarm runs one configured Simulator for each point of a parameter
+grid, distributing the points over a pool of worker processes. The base
+simulator is configured once, before the workers are started, so that the
+work which does not depend on the explored parameters, e.g. loading data,
+converting delays and building the history indices, is shared by all points.
+
+"""
+
+import copy
+import itertools
+import multiprocessing
+import traceback
+import collections
+import numpy
+from .common import get_logger
+from .batch import _resolve
+
+
+LOG = get_logger(__name__)
+
+
+class FarmResult(collections.namedtuple('FarmResult', 'index parameters output error')):
+    """
+    Outcome of one grid point: `output` is the return value of Simulator.run,
+    or None if the point failed, in which case `error` holds the formatted
+    traceback.
+
+    """
+    __slots__ = ()
+
+
+# attribute paths which can be set on a configured simulator without configuring it again
+_LIGHT_PREFIXES = 'model.', 'coupling.', 'integrator.noise.nsig'
+
+# base simulator of the worker processes, set by _initialize_worker
+_base_simulator = None
+
+
+def _initialize_worker(simulator):
+    global _base_simulator
+    _base_simulator = simulator
+
+
+def _point_simulator(base, parameters):
+    "Copy the configured base simulator, sharing read-only structure, and set the point's parameters."
+    memo = {id(base.connectivity): base.connectivity}
+    if base.surface is not None:
+        memo[id(base.surface)] = base.surface
+    sim = copy.deepcopy(base, memo)
+    for path, value in parameters.items():
+        owner, name = _resolve(sim, path)
+        setattr(owner, name, numpy.array(value, dtype=numpy.float64).reshape((-1, )))
+    paths = parameters.keys()
+    if not all(path.startswith(_LIGHT_PREFIXES) for path in paths):
+        LOG.debug('Configuring simulator again for parameters %r', paths)
+        sim.configure()
+        return sim
+    if any(path.startswith('model.') for path in paths):
+        sim.model.update_derived_parameters()
+    if any(path.startswith('integrator.noise.') for path in paths):
+        sim._configure_integrator_noise()
+    return sim
+
+
+def _run_point(index_parameters):
+    "Run a single grid point in a worker, returning its FarmResult."
+    index, parameters = index_parameters
+    try:
+        output = _point_simulator(_base_simulator, parameters).run()
+        return FarmResult(index, parameters, output, None)
+    except Exception:
+        return FarmResult(index, parameters, None, traceback.format_exc())
+
+
+class SimulationFarm(object):
+    """
+    Runs a Simulator for every point of a parameter grid on local processes.
+
+    The grid maps dotted attribute paths, relative to the simulator, to
+    sequences of values, and its points are all combinations of those values,
+    e.g.::
+
+        farm = SimulationFarm(sim, {'coupling.a': [0.001, 0.01], 'model.a': [-2.0, -1.0]})
+        for result in farm.run():
+            if result.error is None:
+                (t, tavg), = result.output
+        if farm.failed:
+            results = list(farm.retry())
+
+    A sequence of dicts may also be given as grid, one per point. Results are
+    yielded as points complete, so not in order of `index`. Failed points do
+    not interrupt the others; they are kept in `failed` and can be run again
+    with `retry`.
+
+    The base simulator is configured once and copied for each point, sharing
+    its connectivity and surface, so all points start from the same initial
+    history and noise stream state. Parameters of the model, coupling and
+    noise amplitude are set on the copy directly; other parameters, such as
+    the integration time step or conduction speed, require configuring the
+    copy again.
+
+    """
+
+    def __init__(self, simulator, grid, processes=None):
+        self.simulator = simulator
+        if isinstance(grid, dict):
+            paths = sorted(grid.keys())
+            grid = [dict(zip(paths, values)) for values in itertools.product(*[grid[path] for path in paths])]
+        self.points = list(grid)
+        self.processes = processes or multiprocessing.cpu_count()
+        self.failed = {}
+
+    @property
+    def number_of_points(self):
+        return len(self.points)
+
+    def run(self, indices=None):
+        """
+        Run the points with given indices, by default all, yielding a
+        FarmResult for each point as it completes.
+
+        """
+        if indices is None:
+            indices = range(self.number_of_points)
+        tasks = [(i, self.points[i]) for i in indices]
+        if self.simulator.history is None:
+            self.simulator.configure()
+        LOG.info('Running %d grid points on %d processes', len(tasks), self.processes)
+        if self.processes == 1:
+            _initialize_worker(self.simulator)
+            results, pool = itertools.imap(_run_point, tasks), None
+        else:
+            pool = multiprocessing.Pool(self.processes, _initialize_worker, (self.simulator, ))
+            results = pool.imap_unordered(_run_point, tasks)
+        try:
+            for result in results:
+                if result.error is None:
+                    self.failed.pop(result.index, None)
+                else:
+                    LOG.error('Grid point %d %r failed:\n%s', result.index, result.parameters, result.error)
+                    self.failed[result.index] = result.error
+                yield result
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+    def retry(self):
+        "Run the failed points again, yielding their results."
+        return self.run(sorted(self.failed.keys()))
@@ -179,6 +179,47 @@ class SparseHistory(DenseHistory):
         return nbytes
 
 
+class OffsetSparseHistory(SparseHistory):
+    """
+    Sparse history with precomputed flat offsets for delayed reads.
+
+    The flat buffer index of each delayed value is the sum of a constant offset,
+    depending only on the delay, cvar, source node and mode, and a term depending
+    only on the step. Offsets are computed once, so a query adds a scalar to them
+    and gathers into preallocated arrays, wrapping indices past the end of the
+    buffer, instead of recomputing modular time indices for each connection.
+
+    As the delayed state is gathered into the same array at each query, it is
+    only valid until the next query: copy it to keep it longer. `query` and
+    `SparseCoupling` use it before the next step.
+
+    """
+
+    nnz_offsets = NDArray(('n_cvar', 'n_nnzw', 'n_mode'), numpy.intp)
+    nnz_flat_idx = NDArray(('n_cvar', 'n_nnzw', 'n_mode'), numpy.intp, read_only=False)
+    sparse_delayed_state = NDArray(('n_cvar', 'n_nnzw', 'n_mode'), 'f', read_only=False)
+
+    def __init__(self, weights, delays, cvars, n_mode):
+        super(OffsetSparseHistory, self).__init__(weights, delays, cvars, n_mode)
+        # for s = step % n_time, (n_time - 1 - delay + s) * stride wraps to (step - 1 - delay) % n_time * stride
+        time_offsets = (self.n_time - 1 - self.nnz_idelays.astype(numpy.intp)) * self.time_stride
+        self.nnz_offsets = time_offsets.reshape((-1, 1)) + self.const_indices
+
+    def query_sparse(self, step):
+        "Current and delayed state, where the latter is overwritten by the next query."
+        numpy.add(self.nnz_offsets, (step % self.n_time) * self.time_stride, out=self.nnz_flat_idx)
+        numpy.take(self.buffer.reshape((-1, )), self.nnz_flat_idx, out=self.sparse_delayed_state, mode='wrap')
+        current_state = self.buffer[(step - 1) % self.n_time]
+        return current_state, self.sparse_delayed_state
+
+    @property
+    def nbytes(self):
+        arrays = 'nnz_offsets nnz_flat_idx sparse_delayed_state'.split()
+        nbytes = sum([getattr(self, ary).nbytes for ary in arrays])
+        nbytes += SparseHistory.nbytes.fget(self)
+        return nbytes
+
+
 # implement in order  NumPy, Numba & OpenCL versions
 
 # simulator.history becomes impl instance
@@ -66,5 +66,10 @@ class Linear(Model):
     def dfun(self, state, coupling, local_coupling=0.0):
         x, = state
         c, = coupling
-        dx = self.gamma * x + c + local_coupling * x
-        return numpy.array([dx])
\ No newline at end of file
+        dx, = _linear_node(x, c, local_coupling * x, self.gamma)
+        return numpy.array([dx])
+
+
+def _linear_node(x, c, lc, gamma):
+    "Linear model equations, for arrays of nodes or, compiled, for one node."
+    return gamma * x + c + lc,
\ No newline at end of file
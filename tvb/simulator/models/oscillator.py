@@ -33,7 +33,7 @@ Oscillator models.
 
 from .base import Model, ModelNumbaDfun, LOG, numpy, basic, arrays
 import numexpr
-from numba import guvectorize, float64
+from numba import guvectorize, float64, njit
 
 
 
@@ -418,14 +418,20 @@ class Generic2dOscillator(ModelNumbaDfun):
         return deriv.T[..., numpy.newaxis]
 
 
+@njit
+def _g2d_node(V, W, c_0, lc_0, tau, I, a, b, c, d, e, f, g, beta, alpha, gamma):
+    "Generic 2D oscillator model equations for one node, also used by the compiled loop."
+    V2 = V * V
+    dV = d * tau * (alpha * W - f * V2*V + e * V2 + g * V + gamma * I + gamma * c_0 + lc_0)
+    dW = d * (a + b * V + c * V2 - beta * W) / tau
+    return dV, dW
+
+
 @guvectorize([(float64[:],) * 16], '(n),(m)' + ',()'*13 + '->(n)', nopython=True)
 def _numba_dfun_g2d(vw, c_0, tau, I, a, b, c, d, e, f, g, beta, alpha, gamma, lc_0, dx):
-    "Gufunc for reduced Wong-Wang model equations."
-    V = vw[0]
-    V2 = V * V
-    W = vw[1]
-    dx[0] = d[0] * tau[0] * (alpha[0] * W - f[0] * V2*V + e[0] * V2 + g[0] * V + gamma[0] * I[0] + gamma[0] * c_0[0] + lc_0[0])
-    dx[1] = d[0] * (a[0] + b[0] * V + c[0] * V2 - beta[0] * W) / tau[0]
+    "Gufunc for generic 2D oscillator model equations."
+    dx[0], dx[1] = _g2d_node(vw[0], vw[1], c_0[0], lc_0[0], tau[0], I[0], a[0], b[0], c[0], d[0], e[0], f[0],
+                             g[0], beta[0], alpha[0], gamma[0])
 
 
 class Kuramoto(Model):
@@ -520,13 +526,16 @@ class Kuramoto(Model):
         #B) Strength of the interactions
         #local_range_coupling = local_coupling * numpy.sin(theta)
 
-        I = coupling[0, :] + local_range_coupling
-
         if not hasattr(self, 'derivative'):
             self.derivative = numpy.empty((1,) + theta.shape)
 
         # phase update
-        self.derivative[0] = self.omega + I
+        self.derivative[0], = _kuramoto_node(theta, coupling[0, :], local_range_coupling, self.omega)
 
         # all this pi makeh me have great hungary, can has sum NaN?
         return self.derivative
+
+
+def _kuramoto_node(theta, c_0, lc_0, omega):
+    "Kuramoto model equations, for arrays of nodes or, compiled, for one node."
+    return omega + (c_0 + lc_0),
@@ -32,20 +32,25 @@ Models based on Wong-Wang's work.
 """
 
 from .base import ModelNumbaDfun, LOG, numpy, basic, arrays
-from numba import guvectorize, float64
+from numba import guvectorize, float64, njit
 
-@guvectorize([(float64[:],)*11], '(n),(m)' + ',()'*8 + '->(n)', nopython=True)
-def _numba_dfun(S, c, a, b, d, g, ts, w, j, io, dx):
-    "Gufunc for reduced Wong-Wang model equations."
 
-    if S[0] < 0.0:
-        dx[0] = 0.0 - S[0]
-    elif S[0] > 1.0:
-        dx[0] = 1.0 - S[0]
-    else:
-        x = w[0]*j[0]*S[0] + io[0] + j[0]*c[0]
-        h = (a[0]*x - b[0]) / (1 - numpy.exp(-d[0]*(a[0]*x - b[0])))
-        dx[0] = - (S[0] / ts[0]) + (1.0 - S[0]) * h * g[0]
+@njit
+def _rww_node(S, c, lc, a, b, d, g, ts, w, j, io):
+    "Reduced Wong-Wang model equations for one node, also used by the compiled loop."
+    if S < 0.0:
+        return 0.0 - S,
+    elif S > 1.0:
+        return 1.0 - S,
+    x = w*j*S + io + j*(c + lc)
+    h = (a*x - b) / (1 - numpy.exp(-d*(a*x - b)))
+    return - (S / ts) + (1.0 - S) * h * g,
+
+
+@guvectorize([(float64[:],)*12], '(n),(m)' + ',()'*9 + '->(n)', nopython=True)
+def _numba_dfun(S, c, lc, a, b, d, g, ts, w, j, io, dx):
+    "Gufunc for reduced Wong-Wang model equations."
+    dx[0], = _rww_node(S[0], c[0], lc[0], a[0], b[0], d[0], g[0], ts[0], w[0], j[0], io[0])
 
 
 class ReducedWongWang(ModelNumbaDfun):
@@ -192,7 +197,8 @@ class ReducedWongWang(ModelNumbaDfun):
 
     def dfun(self, x, c, local_coupling=0.0):
         x_ = x.reshape(x.shape[:-1]).T
-        c_ = c.reshape(c.shape[:-1]).T + local_coupling * x[0]
-        deriv = _numba_dfun(x_, c_, self.a, self.b, self.d, self.gamma,
+        c_ = c.reshape(c.shape[:-1]).T
+        lc = local_coupling * x[0, :, 0]
+        deriv = _numba_dfun(x_, c_, lc, self.a, self.b, self.d, self.gamma,
                         self.tau_s, self.w, self.J_N, self.I_o)
         return deriv.T[..., numpy.newaxis]
\ No newline at end of file
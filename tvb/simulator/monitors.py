@@ -54,7 +54,15 @@ Conversion of power of 2 sample-rates(Hz) to Monitor periods(ms)
 
 """
 
+import os
+import copy
+import json
+import atexit
+import shutil
+import tempfile
 import numpy
+import scipy.sparse
+from tvb.basic.profile import TvbProfile
 from tvb.datatypes.time_series import (TimeSeries, TimeSeriesRegion,
     TimeSeriesEEG, TimeSeriesMEG, TimeSeriesSEEG, TimeSeriesSurface)
 from tvb.simulator.common import get_logger, simple_gen_astr
@@ -70,12 +78,160 @@ import tvb.datatypes.equations as equations
 import tvb.basic.traits.util as util
 import tvb.basic.traits.types_basic as basic
 import tvb.basic.traits.core as core
-from tvb.simulator.common import iround, numpy_add_at
+from tvb.simulator.common import iround, numpy_add_at, RegionAverage
 
 
 LOG = get_logger(__name__)
 
 
+class StreamedArray(object):
+    """
+    Read-only array view on a raw binary file of samples, which grows as
+    samples are appended. Only complete samples are visible, so it can be read
+    while another process or thread is still writing. The writer saves the
+    sample shape and dtype next to the file, at `header_path`, where a reader
+    constructed on the same path finds them.
+
+    """
+
+    def __init__(self, path, dtype=numpy.float64):
+        self.path = path
+        self.dtype = numpy.dtype(dtype)
+        self.sample_shape = None
+        self._file = None
+
+    @property
+    def header_path(self):
+        return self.path + '.json'
+
+    def _read_header(self):
+        if self.sample_shape is None and os.path.exists(self.header_path):
+            with open(self.header_path) as header_file:
+                header = json.load(header_file)
+            self.dtype = numpy.dtype(str(header['dtype']))
+            self.sample_shape = tuple(header['sample_shape'])
+
+    def _write_header(self):
+        # written aside and renamed, so readers never see a partial header
+        partial_path = self.header_path + '.partial'
+        with open(partial_path, 'w') as header_file:
+            json.dump({'dtype': self.dtype.str, 'sample_shape': list(self.sample_shape)}, header_file)
+        os.rename(partial_path, self.header_path)
+
+    @property
+    def shape(self):
+        self._read_header()
+        if self.sample_shape is None:
+            return (0, )
+        sample_size = self.dtype.itemsize * int(numpy.prod(self.sample_shape))
+        return (os.path.getsize(self.path) // sample_size, ) + self.sample_shape
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        shape = self.shape
+        if shape[0] == 0:
+            return numpy.empty(shape, self.dtype)[key]
+        return numpy.array(numpy.memmap(self.path, self.dtype, 'r', shape=shape)[key])
+
+    def __array__(self, dtype=None):
+        return self[:] if dtype is None else self[:].astype(dtype)
+
+    def append(self, sample):
+        "Append a sample to the file, visible to readers on return."
+        sample = numpy.asarray(sample, self.dtype)
+        if self.sample_shape is None:
+            self.sample_shape = sample.shape
+            self._file = open(self.path, 'wb')
+            self._write_header()
+        elif sample.shape != self.sample_shape:
+            raise ValueError('Sample shape %r does not match stream sample shape %r.'
+                             % (sample.shape, self.sample_shape))
+        self._file.write(sample.tobytes())
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class TimeSeriesSink(object):
+    """
+    Writes the samples of a monitor to a time series on disk as they are
+    produced, so that memory use does not grow with simulation length.
+
+    With framework storage, samples are appended to the time series' HDF5 file.
+    Otherwise, its `data` and `time` are set to :class:`StreamedArray` views on
+    raw files in `directory`. If no directory is given, a temporary one is made,
+    which is removed by `remove` or at the latest when the interpreter exits.
+    In both cases samples written so far are available through `read_data_slice`
+    and `read_data_page` while the simulation is running.
+
+    The sink is closed with `close`, or on leaving a `with` block::
+
+        with monitor.stream_to(time_series):
+            simulator.run()
+
+    """
+
+    temporary_directory = None
+
+    def __init__(self, time_series, directory=None):
+        self.time_series = time_series
+        self.use_storage = TvbProfile.current.TRAITS_CONFIGURATION.use_storage
+        if not self.use_storage:
+            if directory is None:
+                directory = self.temporary_directory = tempfile.mkdtemp(prefix='tvb-stream-')
+                atexit.register(shutil.rmtree, directory, True)
+            prefix = time_series.__class__.__name__ + '-'
+            fd, data_path = tempfile.mkstemp(suffix='-data.bin', prefix=prefix, dir=directory)
+            os.close(fd)
+            fd, time_path = tempfile.mkstemp(suffix='-time.bin', prefix=prefix, dir=directory)
+            os.close(fd)
+            time_series.data = StreamedArray(data_path)
+            time_series.time = StreamedArray(time_path)
+
+    def write(self, time, sample):
+        "Write the monitor output sample for the given time."
+        ts = self.time_series
+        if self.use_storage:
+            ts.write_data_slice(numpy.asarray(sample)[numpy.newaxis])
+            ts.write_time_slice(numpy.r_[time])
+        else:
+            ts.data.append(sample)
+            ts.time.append(time)
+
+    def close(self):
+        "Close files and configure the time series with the final data shape."
+        ts = self.time_series
+        if self.use_storage:
+            ts.close_file()
+        else:
+            ts.data.close()
+            ts.time.close()
+        if ts.read_data_shape()[0] > 0:
+            ts.configure()
+
+    def remove(self):
+        "Close the sink and remove the temporary directory it made, with the samples in it."
+        self.close()
+        if self.temporary_directory is not None:
+            shutil.rmtree(self.temporary_directory, True)
+            self.temporary_directory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
 class Monitor(core.Type):
     """
     Abstract base class for monitor implementations.
@@ -104,6 +260,28 @@ class Monitor(core.Type):
     dt = None
     voi = None
     _stock = numpy.empty([])
+    sink = None
+
+    # attributes which change while recording, saved in simulator checkpoints
+    _run_state = ()
+
+    def get_run_state(self):
+        "Return a copy of the state accumulated while recording."
+        return dict((name, copy.deepcopy(getattr(self, name, None))) for name in self._run_state)
+
+    def set_run_state(self, run_state):
+        "Restore state returned by `get_run_state` on a monitor configured identically."
+        for name, value in run_state.items():
+            setattr(self, name, copy.deepcopy(value))
+
+    def stream_to(self, time_series, directory=None):
+        """
+        Write samples collected by `Simulator.run` to the given time series on
+        disk instead of keeping them in memory, see :class:`TimeSeriesSink`.
+
+        """
+        self.sink = TimeSeriesSink(time_series, directory)
+        return self.sink
 
     def __str__(self):
         clsname = self.__class__.__name__
@@ -137,6 +315,22 @@ class Monitor(core.Type):
 
         return self.sample(step, observed)
 
+    def record_block(self, step, observed):
+        """Record a block of consecutive observed states, the first at given step.
+
+        This is used by compiled simulation loops, which return to Python only
+        at sampling points, so at most the last state of the block produces a
+        sample, which is returned. Subclasses may override this method with a
+        vectorized equivalent.
+
+        """
+        output = None
+        for i, observed_i in enumerate(observed):
+            maybe_output = self.record(step + i, observed_i)
+            if maybe_output is not None:
+                output = maybe_output
+        return output
+
     def sample(self, step, state):
         """
         This method provides monitor output, and should be overridden by subclasses.
@@ -224,6 +418,9 @@ class SubSample(Monitor):
             time = step * self.dt
             return [time, state[self.voi, :]]
 
+    def record_block(self, step, observed):
+        return self.sample(step + observed.shape[0] - 1, observed[-1])
+
 
 class SpatialAverage(Monitor):
     """
@@ -267,7 +464,7 @@ class SpatialAverage(Monitor):
         if self.spatial_mask.size == 0:
             self.is_default_special_mask = True
             if not (simulator.surface is None):
-                self.spatial_mask = simulator.surface.region_mapping
+                self.spatial_mask = simulator.region_average.region_mapping
             else:
                 conn = simulator.connectivity
                 if self.default_mask[0] == 'cortical':
@@ -298,20 +495,20 @@ class SpatialAverage(Monitor):
             raise Exception(msg)
 
         util.log_debug_array(LOG, self.spatial_mask, "spatial_mask", owner=self.__class__.__name__)
-        spatial_sum = numpy.zeros((number_of_nodes, number_of_areas))
-        spatial_sum[numpy.arange(number_of_nodes), self.spatial_mask] = 1
-        spatial_sum = spatial_sum.T
-        util.log_debug_array(LOG, spatial_sum, "spatial_sum")
-        nodes_per_area = numpy.sum(spatial_sum, axis=1)[:, numpy.newaxis]
-        self.spatial_mean = spatial_sum / nodes_per_area
-        util.log_debug_array(LOG, self.spatial_mean, "spatial_mean", owner=self.__class__.__name__)
+        if self.is_default_special_mask and simulator.region_average is not None:
+            self.spatial_mean = simulator.region_average
+        else:
+            self.spatial_mean = RegionAverage(self.spatial_mask, number_of_areas)
 
 
     def sample(self, step, state):
         if step % self.istep == 0:
             time = step * self.dt
-            monitored_state = numpy.dot(self.spatial_mean, state[self.voi, :])
-            return [time, monitored_state.transpose((1, 0, 2))]
+            monitored_state = self.spatial_mean(state[self.voi, :], axis=1)
+            return [time, monitored_state]
+
+    def record_block(self, step, observed):
+        return self.sample(step + observed.shape[0] - 1, observed[-1])
 
     def create_time_series(self, storage_path, connectivity=None, surface=None,
                            region_map=None, region_volume_map=None):
@@ -345,6 +542,9 @@ class GlobalAverage(Monitor):
             data = numpy.mean(state[self.voi, :], axis=1)[:, numpy.newaxis, :]
             return [time, data]
 
+    def record_block(self, step, observed):
+        return self.sample(step + observed.shape[0] - 1, observed[-1])
+
     def create_time_series(self, storage_path, connectivity=None, surface=None,
                            region_map=None, region_volume_map=None):
         # ignore connectivity and surface and let parent create a TimeSeries
@@ -360,6 +560,7 @@ class TemporalAverage(Monitor):
 
     """
     _ui_name = "Temporal average"
+    _run_state = ('_stock', )
 
     def config_for_sim(self, simulator):
         super(TemporalAverage, self).config_for_sim(simulator)
@@ -383,10 +584,16 @@ class TemporalAverage(Monitor):
             time = (step - self.istep / 2.0) * self.dt
             return [time, avg_stock]
 
+    def record_block(self, step, observed):
+        steps = numpy.r_[step:step + observed.shape[0]]
+        self._stock[(steps % self.istep) - 1] = observed[:, self.voi]
+        return self.sample(steps[-1], observed[-1])
+
 
 class Projection(Monitor):
     "Base class monitor providing lead field suppport."
     _ui_name = "Projection matrix"
+    _run_state = ('_state', '_source_state')
 
     region_mapping = RegionMapping(
         required=False,
@@ -395,6 +602,25 @@ class Projection(Monitor):
             " connectivity. For iEEG/EEG/MEG monitors, this must be specified when performing a region"
             " simulation but is optional for a surface simulation.")
 
+    accumulate = basic.Enumerate(
+        label="Accumulate",
+        options=["sensors", "sources"],
+        default=["sensors"],
+        select_multiple=False,
+        order=-1,
+        doc="""Space in which states are summed over a sampling period. With
+        'sensors', every step's state is projected and the projections are summed.
+        With 'sources', states are summed over the period and projected once
+        per sample, which gives the same result while the per-step cost no longer
+        depends on the size of the gain matrix.""")
+
+    gain_threshold = basic.Float(
+        label="Gain sparsity threshold", default=0.0, order=-1,
+        doc="""If positive, gain coefficients whose magnitude is at most this
+        fraction of the largest magnitude for their sensor are dropped, and the
+        remaining gain is stored as a sparse matrix when that is more compact,
+        as is typical for iEEG contacts which see mostly nearby sources.""")
+
     @staticmethod
     def oriented_gain(gain, orient):
         "Apply orientations to gain matrix."
@@ -502,17 +728,39 @@ class Projection(Monitor):
         LOG.debug('Zeroed %d NaN gain coefficients', nan_mask.sum())
 
         # attrs used for recording
+        self._projector = self._compact_gain(self.gain)
         self._state = numpy.zeros((self.gain.shape[0], len(self.voi)))
+        self._source_state = numpy.zeros((self.gain.shape[1], len(self.voi)))
         self._period_in_steps = int(self.period / self.dt)
         LOG.debug('State shape %s, period in steps %s', self._state.shape, self._period_in_steps)
 
         LOG.info('Projection configured gain shape %s', self.gain.shape)
 
+    def _compact_gain(self, gain):
+        "Drop negligible gain coefficients, returning a sparse gain if more compact."
+        if self.gain_threshold <= 0.0:
+            return gain
+        magnitude = numpy.abs(gain)
+        keep = magnitude > self.gain_threshold * magnitude.max(axis=1)[:, numpy.newaxis]
+        sparse_gain = scipy.sparse.csr_matrix(numpy.where(keep, gain, 0.0))
+        sparse_nbytes = sum(ary.nbytes for ary in (sparse_gain.data, sparse_gain.indices, sparse_gain.indptr))
+        LOG.debug('Gain threshold %g keeps %d of %d coefficients', self.gain_threshold, sparse_gain.nnz, gain.size)
+        if sparse_nbytes < gain.nbytes:
+            return sparse_gain
+        return numpy.where(keep, gain, 0.0)
+
     def sample(self, step, state):
         "Record state, returning sample at sampling frequency / period."
-        self._state += self.gain.dot(state[self.voi].sum(axis=-1).T)
+        source_state = state[self.voi].sum(axis=-1).T
+        if self.accumulate[0] == 'sources':
+            self._source_state += source_state
+        else:
+            self._state += self._projector.dot(source_state)
         if step % self._period_in_steps == 0:
             time = (step - self._period_in_steps / 2.0) * self.dt
+            if self.accumulate[0] == 'sources':
+                self._state[:] = self._projector.dot(self._source_state)
+                self._source_state[:] = 0.0
             sample = self._state.copy() / self._period_in_steps
             self._state[:] = 0.0
             return time, sample.T[..., numpy.newaxis] # for compatibility
@@ -738,6 +986,60 @@ class iEEG(Projection):
                               **self._transform_user_tags())
 
 
+class PartitionedConvolution(object):
+    """
+    Online convolution with a fixed kernel, of shape (n_lag, n_phase), of inputs
+    arriving one step at a time with shape (n_phase, ...), giving outputs of
+    shape (...) summed over phases, y[t] = sum_k sum_p g[k, p] x[t - k, p].
+
+    The first `direct_length` lags are evaluated directly. The rest of the kernel
+    is partitioned into blocks of doubling length s, each of which is convolved
+    by FFT with the last s inputs every s steps, accumulating contributions to
+    the next 2 s - 1 outputs. The amortized cost per step is therefore
+    O(direct_length + log(n_lag)**2) instead of O(n_lag).
+
+    """
+
+    def __init__(self, kernel, input_shape, direct_length=4):
+        self.n_lag, n_phase = kernel.shape
+        self.direct_length = min(direct_length, self.n_lag)
+        self.direct_kernel = kernel[:self.direct_length]
+        self.partitions = []
+        size = self.direct_length
+        while size < self.n_lag:
+            part = numpy.zeros((size, n_phase))
+            part[:min(size, self.n_lag - size)] = kernel[size:2 * size]
+            self.partitions.append((size, numpy.fft.rfft(part, n=2 * size, axis=0)))
+            size *= 2
+        self.n_input = max([self.direct_length] + [size for size, _ in self.partitions])
+        self.inputs = numpy.zeros((self.n_input, ) + input_shape)
+        self.n_output = 2 * self.n_input
+        self.outputs = numpy.zeros((self.n_output, ) + input_shape[1:])
+        self.step = 0
+        LOG.debug('partitioned convolution, %d direct lags, partitions %r',
+                  self.direct_length, [size for size, _ in self.partitions])
+
+    def __call__(self, x):
+        "Provide input for the current step, returning the output of the current step."
+        t = self.step
+        self.inputs[t % self.n_input] = x
+        # direct evaluation of the first lags
+        lags = (t - numpy.r_[:self.direct_length]) % self.n_input
+        y = numpy.tensordot(self.direct_kernel, self.inputs[lags], axes=([0, 1], [0, 1]))
+        y += self.outputs[t % self.n_output]
+        self.outputs[t % self.n_output] = 0.0
+        # partitions whose input block is complete contribute to future outputs
+        for size, part_f in self.partitions:
+            if (t + 1) % size == 0:
+                block = self.inputs[(t + 1 - size + numpy.r_[:size]) % self.n_input]
+                block_f = numpy.fft.rfft(block, n=2 * size, axis=0)
+                prod_f = numpy.einsum('fp,fp...->f...', part_f, block_f)
+                contrib = numpy.fft.irfft(prod_f, n=2 * size, axis=0)[:2 * size - 1]
+                self.outputs[(t + 1 + numpy.r_[:2 * size - 1]) % self.n_output] += contrib
+        self.step += 1
+        return y
+
+
 class Bold(Monitor):
     """
 
@@ -801,9 +1103,24 @@ class Bold(Monitor):
         doc= """Duration of the hrf kernel""",
         order=-1)
 
+    convolution = basic.Enumerate(
+        label="HRF convolution",
+        options=["dense", "partitioned"],
+        default=["dense"],
+        select_multiple=False,
+        order=-1,
+        doc="""Method of convolving the HRF kernel with the BOLD stock. The
+        'dense' method computes the full dot product at each sample. The
+        'partitioned' method uses a partitioned FFT convolution whose cost per
+        sample grows with the logarithm of the kernel length, which makes long
+        kernels affordable on surfaces.""")
+
     _interim_period = None
     _interim_istep = None
     _interim_stock = None
+    _block = None
+    _engine = None
+    _run_state = ('_stock', '_interim_stock', '_block', '_engine')
     _stock_steps = None
     _stock_time = None
     _stock_sample_rate = 2 ** -2
@@ -842,12 +1159,40 @@ class Bold(Monitor):
         self._interim_stock = numpy.zeros((self._interim_istep,) + sample_shape)
         LOG.debug("BOLD inner buffer %s %.2f MB" % (
             self._interim_stock.shape, self._interim_stock.nbytes/2**20))
-        self._stock = numpy.zeros((self._stock_steps,) + sample_shape)
-        LOG.debug("BOLD outer buffer %s %.2f MB" % (
-            self._stock.shape, self._stock.nbytes/2**20))
+        if self.convolution[0] == 'partitioned':
+            self._config_partitioned(sample_shape)
+        else:
+            self._engine = None
+            self._stock = numpy.zeros((self._stock_steps,) + sample_shape)
+            LOG.debug("BOLD outer buffer %s %.2f MB" % (
+                self._stock.shape, self._stock.nbytes/2**20))
+
+    def _config_partitioned(self, sample_shape):
+        """
+        Set up the partitioned convolution. The HRF lag k applies to the stock
+        sample k steps before the latest one, except the latest one which, as in
+        the dense method, gets the kernel's last value. The interim samples of
+        each period are the phases, i.e. the summed axis, of a convolution in
+        steps of the monitor period.
+
+        """
+        n_phase, remainder = divmod(self.istep, self._interim_istep)
+        if remainder:
+            raise ValueError("The partitioned BOLD convolution requires a period which is a multiple "
+                             "of the interim period %f ms." % (self._interim_period, ))
+        lag_kernel = numpy.roll(self.hemodynamic_response_function[0, ::-1], 1)
+        n_period = -(-lag_kernel.size // n_phase)
+        kernel = numpy.zeros((n_period * n_phase, ))
+        kernel[:lag_kernel.size] = lag_kernel
+        # (period lag, phase) with phase j being the interim sample j steps before the period's end
+        kernel = kernel.reshape((n_period, n_phase))
+        self._block = numpy.zeros((n_phase, ) + sample_shape)
+        self._engine = PartitionedConvolution(kernel, self._block.shape)
 
 
     def sample(self, step, state):
+        if self._engine is not None:
+            return self._sample_partitioned(step, state)
         # Update the interim-stock at every step
         self._interim_stock[((step % self._interim_istep) - 1), :] = state[self.voi, :]
         # At stock's period update it with the temporal average of interim-stock
@@ -869,6 +1214,20 @@ class Bold(Monitor):
             bold = bold.reshape(self._stock.shape[1:])
             return [time, bold]
 
+    def _sample_partitioned(self, step, state):
+        self._interim_stock[((step % self._interim_istep) - 1), :] = state[self.voi, :]
+        if step % self._interim_istep == 0:
+            n_phase = self._block.shape[0]
+            # newest interim sample of the period at phase 0
+            self._block[(-(step / self._interim_istep)) % n_phase] = numpy.mean(self._interim_stock, axis=0)
+        if step % self.istep == 0:
+            time = step * self.dt
+            bold = self._engine(self._block)
+            if isinstance(self.hrf_kernel, equations.FirstOrderVolterra):
+                k1_V0 = self.hrf_kernel.parameters["k_1"] * self.hrf_kernel.parameters["V_0"]
+                bold = (bold - 1.0) * k1_V0
+            return [time, bold]
+
 
 class BoldRegionROI(Bold):
     """
@@ -885,15 +1244,13 @@ class BoldRegionROI(Bold):
 
     def config_for_sim(self, simulator):
         super(BoldRegionROI, self).config_for_sim(simulator)
-        self.region_mapping = simulator.surface.region_mapping
+        self.region_average = simulator.region_average
 
-    def sample(self, step, state, array=numpy.array):
+    def sample(self, step, state):
         result = super(BoldRegionROI, self).sample(step, state)
         if result:
             t, data = result
-            # TODO use reduceat
-            return [t, array([data.flat[self.region_mapping==i].mean()
-                              for i in xrange(self.region_mapping.max())])]
+            return [t, self.region_average(data, axis=1)]
         else:
             return None
 
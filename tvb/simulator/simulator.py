@@ -39,10 +39,12 @@ simulation and the method for running the simulation.
 
 """
 
+import os
 import time
 import math
 import numpy
 import scipy.sparse
+from six.moves import cPickle as pickle
 from tvb.basic.profile import TvbProfile
 import tvb.basic.traits.core as core
 import tvb.basic.traits.types_basic as basic
@@ -51,13 +53,49 @@ from tvb.basic.filters.chain import UIFilter, FilterChain
 from tvb.datatypes import cortex, connectivity, arrays, patterns
 from tvb.simulator import models, integrators, monitors, coupling
 
-from .common import psutil, get_logger, numpy_add_at
-from .history import SparseHistory, DenseHistory
+from .common import psutil, get_logger, iround, RegionAverage
+from .history import SparseHistory, DenseHistory, OffsetSparseHistory
 
 
 LOG = get_logger(__name__)
 
 
+class SimulatorCheckpoint(object):
+    """
+    Snapshot of the state of a running simulation: the current step and state,
+    the history buffer, the noise stream, the state of each monitor and the
+    step at which the stimulus started, with its streaming state.
+
+    Restoring a checkpoint, see `Simulator.restore`, into a simulator
+    configured identically to the one it was taken from continues the
+    simulation exactly as if it had not been interrupted.
+
+    """
+
+    def __init__(self, current_step, end_step, current_state, history, noise, monitors,
+                 stimulus_origin=None, stimulus_stream=None):
+        self.current_step = current_step
+        self.end_step = end_step
+        self.current_state = current_state
+        self.history = history
+        self.noise = noise
+        self.monitors = monitors
+        self.stimulus_origin = stimulus_origin
+        self.stimulus_stream = stimulus_stream
+
+    def save(self, filename):
+        "Write checkpoint to file, replacing any previous file only once fully written."
+        partial = filename + '.partial'
+        with open(partial, 'wb') as fd:
+            pickle.dump(self, fd, pickle.HIGHEST_PROTOCOL)
+        os.rename(partial, filename)
+
+    @staticmethod
+    def load(filename):
+        with open(filename, 'rb') as fd:
+            return pickle.load(fd)
+
+
 # TODO with refactor, this becomes more of a builder, since iterator will account for
 # most of the runtime associated with a simulation.
 class Simulator(core.Type):
@@ -199,6 +237,17 @@ class Simulator(core.Type):
         order=9,
         doc="""The length of a simulation in milliseconds (ms).""")
 
+    backend = basic.Enumerate(
+        label="Integration backend",
+        options=["numpy", "numba"],
+        default=["numpy"],
+        select_multiple=False,
+        order=-1,
+        doc="""Implementation of the integration loop. The 'numba' backend
+        compiles the loop for region simulations with one of the common models,
+        couplings and integrators, returning to Python only at monitor sampling
+        points.""")
+
     history = None # type: SparseHistory
 
     @property
@@ -211,10 +260,17 @@ class Simulator(core.Type):
     calls = 0
     current_step = 0
     number_of_nodes = None
+    region_average = None
     _memory_requirement_guess = None
     _memory_requirement_census = None
     _storage_requirement = None
     _runtime = None
+    _checkpoint_file = None
+    _checkpoint_period = None
+    _resume_steps = None
+    # step at which the stimulus time is zero, and the stimulus streaming state to resume from
+    _stimulus_origin = None
+    _resume_stimulus_stream = None
 
     # methods consist of
     # 1) generic configure
@@ -248,6 +304,7 @@ class Simulator(core.Type):
             unmapped = self.connectivity.unmapped_indices(rm)
             self._regmap = numpy.r_[rm, unmapped]
             self.number_of_nodes = self._regmap.shape[0]
+            self.region_average = RegionAverage(self._regmap, self.connectivity.number_of_regions)
             LOG.info('Surface simulation with %d vertices + %d non-cortical, %d total nodes',
                      rm.size, unmapped.size, self.number_of_nodes)
         self._guesstimate_memory_requirement()
@@ -274,6 +331,9 @@ class Simulator(core.Type):
         if full_configure:
             # When run from GUI, preconfigure is run separately, and we want to avoid running that part twice
             self.preconfigure()
+        if self.backend[0] == 'numba':
+            from tvb.simulator._numba.cpu import check_support
+            check_support(self)
         # Make sure spatialised model parameters have the right shape (number_of_nodes, 1)
         excluded_params = ("state_variable_range", "variables_of_interest", "noise", "psi_table", "nerf_table")
         spatial_reshape = self.model.spatial_param_reshape
@@ -336,8 +396,11 @@ class Simulator(core.Type):
         if self.stimulus is None:
             stimulus = 0.0
         else:
-            time = numpy.r_[0.0 : self.simulation_length : self.integrator.dt]
-            self.stimulus.configure_time(time.reshape((1, -1)))
+            if self.stimulus.streaming:
+                self.stimulus.configure_streaming(self.integrator.dt, self.simulation_length)
+            else:
+                time = numpy.r_[0.0 : self.simulation_length : self.integrator.dt]
+                self.stimulus.configure_time(time.reshape((1, -1)))
             stimulus = numpy.zeros((self.model.nvar, self.number_of_nodes, 1))
             LOG.debug("stimulus shape is: %s", stimulus.shape)
         return stimulus
@@ -352,17 +415,17 @@ class Simulator(core.Type):
     def _loop_update_stimulus(self, step, stimulus):
         "Update stimulus values for current time step."
         if self.stimulus is not None:
-            # TODO stim_step != current step
-            stim_step = step - (self.current_step + 1)
-            stimulus[self.model.cvar, :, :] = self.stimulus(stim_step).reshape((1, -1, 1))
+            stim_step = step - self._stimulus_origin
+            if self.stimulus.streaming:
+                nodes, values = self.stimulus.stream(stim_step)
+                stimulus[self.model.cvar[:, numpy.newaxis], nodes, 0] = values
+            else:
+                stimulus[self.model.cvar, :, :] = self.stimulus(stim_step).reshape((1, -1, 1))
 
     def _loop_update_history(self, step, n_reg, state):
         "Update history."
         if self.surface is not None and state.shape[1] > self.connectivity.number_of_regions:
-            region_state = numpy.zeros((n_reg, state.shape[0], state.shape[2]))         # temp (node, cvar, mode)
-            numpy_add_at(region_state, self._regmap, state.transpose((1, 0, 2)))        # sum within region
-            region_state /= numpy.bincount(self._regmap).reshape((-1, 1, 1))            # div by n node in region
-            state = region_state.transpose((1, 0, 2))                                   # (cvar, node, mode)
+            state = self.region_average(state, axis=1)                                  # (cvar, region, mode)
         self.history.update(step, state)
 
     def _loop_monitor_output(self, step, state):
@@ -383,8 +446,15 @@ class Simulator(core.Type):
         """
 
         self.calls += 1
+        n_steps, self._resume_steps = self._resume_steps, None
+        resume_stream, self._resume_stimulus_stream = self._resume_stimulus_stream, None
         if simulation_length is not None:
             self.simulation_length = simulation_length
+            n_steps = None
+        # a resumed call continues the stimulus of the interrupted one, otherwise it starts now
+        if n_steps is None or self._stimulus_origin is None:
+            self._stimulus_origin = self.current_step + 1
+            resume_stream = None
 
         # intialization
         self._guesstimate_runtime()
@@ -393,11 +463,32 @@ class Simulator(core.Type):
         n_reg = self.connectivity.number_of_regions
         local_coupling = self._prepare_local_coupling()
         stimulus = self._prepare_stimulus()
+        if resume_stream is not None:
+            self.stimulus.set_stream_state(resume_stream)
         state = self.current_state
 
         # integration loop
-        n_steps = int(math.ceil(self.simulation_length / self.integrator.dt))
-        for step in xrange(self.current_step + 1, self.current_step + n_steps +1):
+        if n_steps is None:
+            n_steps = int(math.ceil(self.simulation_length / self.integrator.dt))
+        first_step, last_step = self.current_step + 1, self.current_step + n_steps
+        checkpoint_istep = None
+        if self._checkpoint_file is not None:
+            checkpoint_istep = max(1, iround(self._checkpoint_period / self.integrator.dt))
+        if self.backend[0] == 'numba':
+            from tvb.simulator._numba.cpu import RegionLoop
+            loop = RegionLoop(self)
+            last_checkpoint = self.current_step
+            for output in loop(first_step, n_steps, state):
+                yield output
+                # compiled loop returns only at samples, so checkpoint at the first after each interval
+                if checkpoint_istep is not None and loop.step - last_checkpoint >= checkpoint_istep:
+                    self._save_checkpoint(loop.step, loop.state, last_step)
+                    last_checkpoint = loop.step
+            self.current_state = loop.state
+            self.current_step = last_step - 1
+            return
+
+        for step in xrange(first_step, last_step + 1):
             # needs implementing by hsitory + coupling?
             node_coupling = self._loop_compute_node_coupling(step)
             self._loop_update_stimulus(step, stimulus)
@@ -406,9 +497,72 @@ class Simulator(core.Type):
             output = self._loop_monitor_output(step, state)
             if output is not None:
                 yield output
+            if checkpoint_istep is not None and step % checkpoint_istep == 0:
+                self._save_checkpoint(step, state, last_step)
 
         self.current_state = state
-        self.current_step = self.current_step + n_steps - 1  # -1 : don't repeat last point
+        self.current_step = last_step - 1  # -1 : don't repeat last point
+
+    def checkpoint(self, step=None, state=None, end_step=None):
+        """
+        Return a SimulatorCheckpoint of the simulation, by default of its
+        current step and state. The end step is the last step of an interrupted
+        call, which is completed by calling the restored simulator without a
+        simulation length.
+
+        """
+        noise = getattr(self.integrator, 'noise', None)
+        noise_state = None
+        if isinstance(self.integrator, integrators.IntegratorStochastic):
+            eta = getattr(noise, '_eta', None)
+            noise_state = noise.random_stream.get_state(), None if eta is None else eta.copy()
+        return SimulatorCheckpoint(
+            current_step=self.current_step if step is None else step,
+            end_step=end_step,
+            current_state=(self.current_state if state is None else state).copy(),
+            history=self.history.buffer.copy(),
+            noise=noise_state,
+            monitors=[monitor.get_run_state() for monitor in self.monitors],
+            stimulus_origin=self._stimulus_origin,
+            stimulus_stream=None if self.stimulus is None else self.stimulus.get_stream_state())
+
+    def restore(self, checkpoint):
+        """
+        Restore a checkpoint taken from a simulator configured identically to
+        this one, which must already be configured.
+
+        """
+        self.current_step = checkpoint.current_step
+        self.current_state = checkpoint.current_state.copy()
+        self.history.initialize(checkpoint.history.copy())
+        if checkpoint.noise is not None:
+            rng_state, eta = checkpoint.noise
+            self.integrator.noise.random_stream.set_state(rng_state)
+            if eta is not None:
+                self.integrator.noise._eta = eta.copy()
+        for monitor, run_state in zip(self.monitors, checkpoint.monitors):
+            monitor.set_run_state(run_state)
+        self._resume_steps = None
+        if checkpoint.end_step is not None:
+            self._resume_steps = checkpoint.end_step - checkpoint.current_step
+        self._stimulus_origin = getattr(checkpoint, 'stimulus_origin', None)
+        self._resume_stimulus_stream = getattr(checkpoint, 'stimulus_stream', None)
+        LOG.info('Restored checkpoint at step %d', self.current_step)
+
+    def checkpoint_to(self, filename, period):
+        """
+        Save a checkpoint to filename every period ms of simulated time while
+        the simulator is called, replacing the previous one. With the numba
+        backend, checkpoints are taken at the first monitor sample after each
+        period. Pass None as filename to stop checkpointing.
+
+        """
+        self._checkpoint_file = filename
+        self._checkpoint_period = period
+
+    def _save_checkpoint(self, step, state, end_step):
+        self.checkpoint(step, state, end_step).save(self._checkpoint_file)
+        LOG.debug('Saved checkpoint at step %d to %s', step, self._checkpoint_file)
 
     def _configure_history(self, initial_conditions):
         """
@@ -462,14 +616,9 @@ class Simulator(core.Type):
         self.current_state = history[self.current_step % self.horizon].copy()
         LOG.debug('initial state has shape %r' % (self.current_state.shape, ))
         if self.surface is not None and history.shape[2] > self.connectivity.number_of_regions:
-            n_reg = self.connectivity.number_of_regions
-            (nt, ns, _, nm), ax = history.shape, (2, 0, 1, 3)
-            region_history = numpy.zeros((nt, ns, n_reg, nm))
-            numpy_add_at(region_history.transpose(ax), self._regmap, history.transpose(ax))
-            region_history /= numpy.bincount(self._regmap).reshape((-1, 1))
-            history = region_history
+            history = self.region_average(history, axis=2)
         # create history query implementation
-        self.history = SparseHistory(
+        self.history = OffsetSparseHistory(
             self.connectivity.weights,
             self.connectivity.idelays,
             self.model.cvar,
@@ -724,22 +873,38 @@ class Simulator(core.Type):
         self._storage_requirement = int(strgreq)
 
     def run(self, **kwds):
-        "Convenience method to call the simulator with **kwds and collect output data."
+        """
+        Convenience method to call the simulator with **kwds and collect output data.
+
+        Output of monitors with a sink, see `Monitor.stream_to`, is written to disk as it is
+        produced, and the time and data of the sink's time series are returned instead.
+        Without framework storage, these are :class:`monitors.StreamedArray` views on the
+        files, which load from disk when indexed or passed to `numpy.asarray`, and grow as
+        later runs append samples.
+
+        """
         ts, xs = [], []
         for _ in self.monitors:
             ts.append([])
             xs.append([])
         wall_time_start = time.time()
         for data in self(**kwds):
-            for tl, xl, t_x in zip(ts, xs, data):
+            for monitor, tl, xl, t_x in zip(self.monitors, ts, xs, data):
                 if t_x is not None:
                     t, x = t_x
-                    tl.append(t)
-                    xl.append(x)
+                    if monitor.sink is not None:
+                        monitor.sink.write(t, x)
+                    else:
+                        tl.append(t)
+                        xl.append(x)
         elapsed_wall_time = time.time() - wall_time_start
         LOG.info("%.3f s elapsed, %.3fx real time", elapsed_wall_time,
                  elapsed_wall_time * 1e3 / self.simulation_length)
-        for i in range(len(ts)):
-            ts[i] = numpy.array(ts[i])
-            xs[i] = numpy.array(xs[i])
+        for i, monitor in enumerate(self.monitors):
+            if monitor.sink is not None:
+                ts[i] = monitor.sink.time_series.time
+                xs[i] = monitor.sink.time_series.data
+            else:
+                ts[i] = numpy.array(ts[i])
+                xs[i] = numpy.array(xs[i])
         return list(zip(ts, xs))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+"""
+Gather the tests of the analyzers.
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+
+import unittest
+from tvb.tests.library.analyzers import cross_correlation_test
+from tvb.tests.library.analyzers import fcd_matrix_test
+from tvb.tests.library.analyzers import fmri_balloon_test
+from tvb.tests.library.analyzers import graph_test
+from tvb.tests.library.analyzers import info_test
+from tvb.tests.library.analyzers import node_complex_coherence_test
+from tvb.tests.library.analyzers import node_covariance_test
+from tvb.tests.library.analyzers import pca_test
+from tvb.tests.library.analyzers import wavelet_test
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(cross_correlation_test.suite())
+    test_suite.addTest(fcd_matrix_test.suite())
+    test_suite.addTest(fmri_balloon_test.suite())
+    test_suite.addTest(graph_test.suite())
+    test_suite.addTest(info_test.suite())
+    test_suite.addTest(node_complex_coherence_test.suite())
+    test_suite.addTest(node_covariance_test.suite())
+    test_suite.addTest(pca_test.suite())
+    test_suite.addTest(wavelet_test.suite())
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
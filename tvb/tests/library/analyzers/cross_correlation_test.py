@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+"""
+Tests for the cross correlation analyzer.
+"""
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+import scipy.signal
+from tvb.analyzers import cross_correlation
+from tvb.datatypes import time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+class CrossCorrelateTest(BaseTestCase):
+
+    def _evaluate(self, data, max_lag=None):
+        ts = time_series.TimeSeries(data=data[:, numpy.newaxis, :, numpy.newaxis], sample_period=0.5)
+        return cross_correlation.CrossCorrelate(time_series=ts, max_lag=max_lag).evaluate()
+
+    def _check(self, tpts, max_lag=None):
+        data = numpy.random.RandomState(tpts).randn(tpts, 4)
+        result = self._evaluate(data, max_lag)
+        data = data - data.mean(axis=0)
+        first_lag, last_lag = -(tpts // 2), (tpts - 1) // 2
+        if max_lag is not None:
+            first_lag, last_lag = max(first_lag, -int(max_lag / 0.5)), min(last_lag, int(max_lag / 0.5))
+        kept = numpy.r_[first_lag:last_lag + 1] + tpts // 2
+        numpy.testing.assert_allclose(0.5 * numpy.r_[first_lag:last_lag + 1], result.time)
+        for n1 in range(4):
+            for n2 in range(4):
+                expected = scipy.signal.correlate(data[:, n1], data[:, n2], mode="same")[kept]
+                numpy.testing.assert_allclose(expected, result.array_data[:, n1, n2, 0, 0], atol=1e-10)
+
+    def test_all_lags(self):
+        # more lags than max_lagged_products are computed from cross spectra
+        self._check(300)
+        self._check(301)
+
+    def test_max_lag(self):
+        self._check(300, max_lag=10.0)
+        self._check(301, max_lag=10.0)
+        self._check(300, max_lag=100.0)
+        self._check(301, max_lag=100.0)
+
+    def test_spectral_blocks(self):
+        data = numpy.random.RandomState(42).randn(100, 5)
+        expected = cross_correlation.lagged_products(data, -20, 30)
+        for block_bytes in (1, 2 ** 12, 2 ** 26):
+            numpy.testing.assert_allclose(expected, cross_correlation.spectral_products(data, -20, 30, block_bytes),
+                                          atol=1e-10)
+
+    def test_negative_max_lag(self):
+        self.assertRaises(ValueError, self._evaluate, numpy.random.randn(20, 2), -1.0)
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(CrossCorrelateTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
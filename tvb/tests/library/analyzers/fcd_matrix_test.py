@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+"""
+Tests for the functional connectivity dynamics analyzer.
+"""
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.analyzers import fcd_matrix
+from tvb.datatypes import time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+class FcdCalculatorTest(BaseTestCase):
+
+    def _windowed_corrcoef(self, data, sw, sp):
+        "The FCD as previously computed, one numpy.corrcoef per window and per pair of windows."
+        n_windows = int((data.shape[0] - sw) / sp)
+        triangular = numpy.triu_indices(data.shape[1], 1)
+        fc_stream = [numpy.corrcoef(data[i * sp:i * sp + sw + 1].T)[triangular] for i in range(n_windows)]
+        fcd = numpy.zeros((n_windows, n_windows))
+        for i in range(n_windows):
+            for j in range(i, n_windows):
+                fcd[i, j] = fcd[j, i] = numpy.corrcoef(fc_stream[i], fc_stream[j])[0, 1]
+        return fcd
+
+    def test_fcd(self):
+        data = numpy.random.RandomState(42).randn(600, 1, 6, 1).cumsum(axis=0)
+        ts = time_series.TimeSeriesRegion(data=data, sample_period=0.5)
+        fcd = fcd_matrix.FcdCalculator(time_series=ts, sw=50.0, sp=5.0).evaluate()[0]
+        expected = self._windowed_corrcoef(data[:, 0, :, 0], 100, 10)
+        self.assertEqual((50, 50, 1, 1), fcd.shape)
+        numpy.testing.assert_allclose(expected, fcd[:, :, 0, 0], rtol=0, atol=1e-14)
+
+    def test_fc_stream_correlation(self):
+        fc_stream = numpy.random.RandomState(42).randn(37, 15)
+        expected = numpy.corrcoef(fc_stream)
+        for block_bytes in (1, 8 * 37 * 5, 2 ** 26):
+            fcd = fcd_matrix.fc_stream_correlation(fc_stream, block_bytes)
+            numpy.testing.assert_allclose(expected, fcd, rtol=0, atol=1e-14)
+            numpy.testing.assert_array_equal(fcd, fcd.T)
+        numpy.testing.assert_array_equal(numpy.corrcoef(fc_stream), expected)
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(FcdCalculatorTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
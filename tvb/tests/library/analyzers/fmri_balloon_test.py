@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+"""
+Tests for the balloon model analyzer.
+"""
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.analyzers import fmri_balloon
+from tvb.datatypes import time_series
+from tvb.simulator import integrators
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+class BalloonModelTest(BaseTestCase):
+
+    def setUp(self):
+        super(BalloonModelTest, self).setUp()
+        data = numpy.random.RandomState(42).randn(400, 2, 3, 2) * 0.1
+        self.time_series = time_series.TimeSeriesRegion(data=data, sample_period=1.0)
+        self.time_series.configure()
+
+    def _stepwise(self, integrator):
+        "BOLD signal integrating the balloon model one step at a time with the integrator's scheme."
+        model = fmri_balloon.BalloonModel(time_series=self.time_series, dt=0.001, integrator=integrator)
+        neural_input = self.time_series.data[:, 0:1]
+        neural_input = neural_input - neural_input.mean(axis=0)
+        integrator.dt = 0.001
+        integrator.configure()
+        state = numpy.ones((4, 3, 2))
+        state[0] = 0.0
+        v, q = numpy.ones((400, 3, 2)), numpy.ones((400, 3, 2))
+        for step in range(1, 400):
+            state = integrator.scheme(state, model.balloon_dfun, neural_input[step], 0.0, 0.0)
+            v[step], q[step] = state[2], state[3]
+        k1, k2, k3 = model.compute_derived_parameters()
+        return (model.V0 * (k1 * (1. - q) + k2 * (1. - q / v) + k3 * (1. - v)))[:, numpy.newaxis]
+
+    def _evaluate(self, integrator, block_bytes=2 ** 26, transformation="none"):
+        model = fmri_balloon.BalloonModel(time_series=self.time_series, dt=0.001, integrator=integrator,
+                                          neural_input_transformation=transformation)
+        model.block_bytes = block_bytes
+        return model.evaluate().data
+
+    def test_compiled_schemes(self):
+        for integrator_class in (integrators.HeunDeterministic, integrators.EulerDeterministic):
+            bold = self._evaluate(integrator_class())
+            self.assertEqual((400, 1, 3, 2), bold.shape)
+            numpy.testing.assert_allclose(self._stepwise(integrator_class()), bold, rtol=1e-10, atol=1e-12)
+
+    def test_other_scheme(self):
+        bold = self._evaluate(integrators.RungeKutta4thOrderDeterministic())
+        numpy.testing.assert_allclose(self._stepwise(integrators.RungeKutta4thOrderDeterministic()), bold,
+                                   rtol=1e-10, atol=1e-12)
+
+    def test_block_size(self):
+        # blocks of 1 and 7 time points, and all at once
+        for transformation in ("none", "sum", "abs_diff"):
+            expected = self._evaluate(integrators.HeunDeterministic(), transformation=transformation)
+            self.assertFalse(numpy.isnan(expected).any())
+            for block_bytes in (8, 7 * 2 * 3 * 2 * 8):
+                numpy.testing.assert_allclose(
+                    expected, self._evaluate(integrators.HeunDeterministic(), block_bytes, transformation),
+                    rtol=1e-10, atol=1e-12)
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(BalloonModelTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
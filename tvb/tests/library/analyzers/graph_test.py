@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+"""
+Tests for the graph analyses, on small graphs whose measures are known.
+"""
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.analyzers import graph
+from tvb.basic.logger.builder import get_logger
+from tvb.tests.library.base_testcase import BaseTestCase
+
+LOG = get_logger(__name__)
+
+
+
+class WhiteMatter(object):
+    "Stands in for a Connectivity, the deletion strategies only use its weights."
+
+    def __init__(self, weights):
+        self.weights = weights
+
+
+
+def path_graph(weights):
+    "Undirected path through the nodes, with the given edge weights."
+    A = numpy.zeros((len(weights) + 1,) * 2)
+    for i, weight in enumerate(weights):
+        A[i, i + 1] = A[i + 1, i] = weight
+    return A
+
+
+
+def undirected_graph(number_of_nodes, edges):
+    A = numpy.zeros((number_of_nodes, number_of_nodes))
+    for i, j in edges:
+        A[i, j] = A[j, i] = 1.0
+    return A
+
+
+
+class GraphTest(BaseTestCase):
+
+    def setUp(self):
+        super(GraphTest, self).setUp()
+        self.path = path_graph([1.0, 2.0, 3.0, 4.0])
+        rng = numpy.random.RandomState(42)
+        self.random = rng.rand(12, 12) * (rng.rand(12, 12) < 0.3)
+        numpy.fill_diagonal(self.random, 0.0)
+
+
+    def test_betweenness_bin(self):
+        # ordered pairs of nodes whose shortest paths go through each node
+        numpy.testing.assert_allclose([0, 6, 8, 6, 0], graph.betweenness_bin(self.path > 0))
+        # weights count as numbers of paths, as in the algebraic path count of BCT
+        numpy.testing.assert_allclose([0, 9, 4, 2, 16], graph.betweenness_bin(self.path))
+        # two shortest paths between opposite nodes of a square share the count
+        square = undirected_graph(4, [(0, 1), (0, 2), (1, 3), (2, 3)])
+        numpy.testing.assert_allclose([1, 1, 1, 1], graph.betweenness_bin(square))
+        star = undirected_graph(4, [(0, 1), (0, 2), (0, 3)])
+        numpy.testing.assert_allclose([6, 0, 0, 0], graph.betweenness_bin(star))
+        directed = numpy.zeros((3, 3))
+        directed[0, 1] = directed[1, 2] = 1.0
+        numpy.testing.assert_allclose([0, 1, 0], graph.betweenness_bin(directed))
+
+
+    def test_efficiency_bin(self):
+        # inverse distances 1 (4 pairs), 1/2 (3), 1/3 (2) and 1/4 (1), averaged over 10 pairs
+        numpy.testing.assert_allclose(77.0 / 120.0, graph.efficiency_bin(self.path))
+        # disconnected nodes add nothing
+        numpy.testing.assert_allclose(1.0 / 3.0, graph.efficiency_bin(undirected_graph(4, [(0, 1), (2, 3)])))
+        # a triangle with a pendant node on node 0
+        A = undirected_graph(4, [(0, 1), (0, 2), (1, 2), (0, 3)])
+        numpy.testing.assert_allclose([[1.0 / 3.0], [1.0], [1.0], [0.0]],
+                                      graph.efficiency_bin(A, compute_local_efficiency=True))
+
+
+    def test_get_components_sizes(self):
+        A = undirected_graph(5, [(0, 1), (1, 2), (3, 4)])
+        self.assertEqual(3, graph.get_components_sizes(A))
+        self.assertRaises(ValueError, graph.get_components_sizes, numpy.zeros((2, 3)))
+
+
+    def _reference_deletion(self, weights, sequence):
+        "Measures of the binary graph, recomputed after each node of sequence is removed."
+        A = weights.copy()
+        A[A > 0.0] = 1.0
+        efficiency, component = [], []
+        for node in sequence:
+            A[node, :] = A[:, node] = 0.0
+            efficiency.append(graph.efficiency_bin(A))
+            component.append(graph.get_components_sizes(A))
+        return numpy.array(efficiency), numpy.array(component)
+
+
+    def test_sequential_random_deletion(self):
+        strength, degree, efficiency, component = graph.sequential_random_deletion(WhiteMatter(self.path), [2, 4, 3], 5)
+        numpy.testing.assert_allclose([[2, 2, 2], [2, 2, 2], [0, 0, 0], [8, 0, 0], [8, 0, 0]], strength)
+        numpy.testing.assert_allclose([[2, 2, 2], [2, 2, 2], [0, 0, 0], [2, 0, 0], [2, 0, 0]], degree)
+        numpy.testing.assert_allclose([0.2, 0.1, 0.1], efficiency)
+        numpy.testing.assert_allclose([2, 2, 2], component)
+        # the weights are left untouched
+        numpy.testing.assert_array_equal(path_graph([1.0, 2.0, 3.0, 4.0]), self.path)
+
+        sequence = numpy.random.RandomState(0).permutation(12)[:10]
+        _, _, efficiency, component = graph.sequential_random_deletion(WhiteMatter(self.random), sequence, 12)
+        expected_efficiency, expected_component = self._reference_deletion(self.random, sequence)
+        numpy.testing.assert_allclose(expected_efficiency, efficiency)
+        numpy.testing.assert_allclose(expected_component, component)
+
+
+    def test_sequential_targeted_deletion(self):
+        strength, degree, betweenness, efficiency, component = graph.sequential_targeted_deletion(
+            WhiteMatter(self.path), 5)
+        numpy.testing.assert_allclose([2, 6, 10, 14, 8], strength[:, 0])
+        numpy.testing.assert_allclose([2, 4, 4, 4, 2], degree[:, 0])
+        numpy.testing.assert_allclose([0, 9, 4, 2, 16], betweenness[:, 0])
+        # the strongest node 3 goes first, then node 1
+        numpy.testing.assert_allclose([0.25, 0.0], efficiency[:2, 0])
+        numpy.testing.assert_allclose([3, 1], component[:2, 0])
+        # the most central node 4 goes first
+        self.assertAlmostEqual(13.0 / 30.0, efficiency[0, 2])
+        self.assertEqual(4, component[0, 2])
+
+        measures = graph.sequential_targeted_deletion(WhiteMatter(self.random), 12)
+        for j in range(3):
+            # nodes removed are those with the largest measure at each step
+            sequence = numpy.argsort(measures[j], axis=0)[-1]
+            expected_efficiency, expected_component = self._reference_deletion(self.random, sequence)
+            numpy.testing.assert_allclose(expected_efficiency, measures[3][:, j])
+            numpy.testing.assert_allclose(expected_component, measures[4][:, j])
+        # betweenness is that of the graph left by the previous deletions
+        A = self.random.copy()
+        for step, node in enumerate(numpy.argsort(measures[2], axis=0)[-1]):
+            numpy.testing.assert_allclose(graph.betweenness_bin(A), measures[2][:, step])
+            A[node, :] = A[:, node] = 0.0
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(GraphTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+"""
+Tests for the information theoretic analyzers.
+"""
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.analyzers import info
+from tvb.basic.logger.builder import get_logger
+from tvb.tests.library.base_testcase import BaseTestCase
+
+LOG = get_logger(__name__)
+
+
+class SampleEntropyTest(BaseTestCase):
+
+    def _pairwise_matches(self, y, n, r):
+        "Count matching template pairs by comparing every pair, as sampen did previously."
+        templates = y[numpy.r_[0:n] + numpy.r_[0:y.size - n + 1][:, numpy.newaxis]]
+        return sum((abs(templates[i] - templates[i + 1:]) < r).all(axis=1).sum()
+                   for i in range(templates.shape[0] - 1))
+
+    def _check(self, y, m, r):
+        e, p, c2, c1 = info.sampen(y, m=m, r=r, info=True)
+        LOG.debug("%d and %d matches of %d and %d values within %f", c1, c2, m, m + 1, r)
+        self.assertEqual(self._pairwise_matches(y, m, r), c1)
+        self.assertEqual(self._pairwise_matches(y, m + 1, r), c2)
+        self.assertEqual(-numpy.log(c2 * 1.0 / c1), e)
+
+    def test_distances_equal_to_r(self):
+        random = numpy.random.RandomState(42)
+        # small integers, most template distances are whole numbers, many equal to r
+        y = random.randint(0, 5, 500).astype(numpy.float64)
+        for r in (1.0, 2.0):
+            self._check(y, 2, r)
+        # decimal steps, whose differences round to just below or above r
+        self._check(random.randint(0, 8, 500) * 0.1, 2, 0.2)
+        self._check(random.randint(0, 8, 500) * 0.1, 3, 0.3)
+
+    def test_random(self):
+        y = numpy.random.RandomState(42).randn(1000)
+        self._check(y, 2, 0.15 * y.std())
+
+    def test_columns(self):
+        y = numpy.random.RandomState(42).randn(300, 3)
+        e = info.sampen(y, m=2)
+        self.assertEqual((3, ), e.shape)
+        for i in range(3):
+            self.assertEqual(info.sampen(y[:, i], m=2), e[i])
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(SampleEntropyTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
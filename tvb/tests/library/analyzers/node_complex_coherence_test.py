@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+"""
+Tests for the complex coherence analyzer.
+"""
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.analyzers import node_complex_coherence
+from tvb.datatypes import time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+class NodeComplexCoherenceTest(BaseTestCase):
+
+    def _outer_products(self, data, epoch_tpts, seg_tpts, seg_shift_tpts, nfreq, average_segments):
+        "Cross spectrum and coherence with one outer product per frequency, as formulated previously."
+        nepochs, nchan = data.shape[0] // epoch_tpts, data.shape[1]
+        nseg = (epoch_tpts - seg_tpts) // seg_shift_tpts + 1
+        shape = (nchan, nchan, nfreq) if average_segments else (nchan, nchan, nfreq, nseg)
+        cs = numpy.zeros(shape, dtype=numpy.complex128)
+        av = numpy.zeros(shape[1:], dtype=numpy.complex128)
+        window = numpy.hanning(seg_tpts)[:, numpy.newaxis]
+        for j in range(nepochs):
+            epoch = data[j * epoch_tpts:(j + 1) * epoch_tpts]
+            for i in range(nseg):
+                fft = numpy.fft.fft(epoch[i * seg_shift_tpts:i * seg_shift_tpts + seg_tpts] * window, axis=0)
+                for f in range(nfreq):
+                    index = (f, ) if average_segments else (f, i)
+                    cs[(Ellipsis, ) + index] += numpy.outer(fft[f], fft[f].conj())
+                    av[(Ellipsis, ) + index] += fft[f]
+        nave = nepochs * nseg if average_segments else nepochs
+        cs, av = cs / nave, av / nave
+        coh = numpy.zeros_like(cs)
+        for index in numpy.ndindex(*shape[2:]):
+            at = (Ellipsis, ) + index
+            cs[at] -= numpy.outer(av[at], av[at].conj())
+            auto = cs[at].diagonal()
+            coh[at] = cs[at] / numpy.sqrt(numpy.outer(auto.conj(), auto))
+        return cs, coh
+
+    def _check(self, average_segments):
+        # 3 epochs of 200 points, 7 half-overlapping segments of 50 points each
+        data = numpy.random.RandomState(42).randn(640, 2, 5, 3)
+        ts = time_series.TimeSeries(data=data, sample_period=0.5)
+        expected_cs, expected_coh = self._outer_products(data.mean(axis=-1).mean(axis=1), 200, 50, 25, 26,
+                                                         average_segments)
+        for block_bytes in (1, 2 ** 14, 2 ** 26):
+            analyzer = node_complex_coherence.NodeComplexCoherence(
+                time_series=ts, epoch_length=100.0, segment_length=25.0, segment_shift=12.5,
+                average_segments=average_segments)
+            analyzer.block_bytes = block_bytes
+            spectra = analyzer.evaluate()
+            numpy.testing.assert_allclose(expected_cs, spectra.cross_spectrum, rtol=1e-12, atol=1e-12)
+            numpy.testing.assert_allclose(expected_coh, spectra.array_data, rtol=1e-12, atol=1e-12)
+
+    def test_average_segments(self):
+        self._check(True)
+
+    def test_segments(self):
+        self._check(False)
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(NodeComplexCoherenceTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
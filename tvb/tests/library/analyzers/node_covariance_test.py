@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+"""
+Tests for the node covariance analyzer and the streaming covariance.
+"""
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.analyzers import node_covariance
+from tvb.datatypes import time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+class StreamingCovarianceTest(BaseTestCase):
+
+    def setUp(self):
+        super(StreamingCovarianceTest, self).setUp()
+        # offset means, for the merge of running means to matter
+        self.data = numpy.random.RandomState(42).randn(301, 2, 7, 3) + numpy.arange(7)[:, numpy.newaxis] * 10.0
+
+    def _check(self, stream, data):
+        for mode in range(data.shape[3]):
+            for var in range(data.shape[1]):
+                numpy.testing.assert_allclose(numpy.cov(data[:, var, :, mode].T),
+                                              stream.covariance[:, :, var, mode], rtol=1e-12, atol=1e-12)
+                numpy.testing.assert_allclose(numpy.corrcoef(data[:, var, :, mode].T),
+                                              stream.correlation[:, :, var, mode], rtol=1e-12, atol=1e-12)
+
+    def _stream(self, block_tpts=None):
+        stream = node_covariance.StreamingCovariance()
+        if block_tpts is not None:
+            stream.block_bytes = 8 * 2 * 7 * 3 * block_tpts
+        return stream
+
+    def test_uneven_blocks(self):
+        for block_tpts in (None, 16):
+            stream = self._stream(block_tpts)
+            for start, stop in ((0, 1), (1, 40), (40, 41), (41, 200), (200, 301)):
+                stream.update(self.data[start:stop])
+            self._check(stream, self.data)
+            self.assertEqual(301, stream.count)
+
+    def test_samples(self):
+        for block_tpts in (None, 1, 16):
+            stream = self._stream(block_tpts)
+            for sample in self.data:
+                stream.update(sample)
+            self._check(stream, self.data)
+            # more data after the results
+            stream.update(self.data[:50])
+            self._check(stream, numpy.concatenate((self.data, self.data[:50])))
+
+    def test_merge(self):
+        first, second = self._stream(), self._stream(16)
+        first.update(self.data[:120])
+        for sample in self.data[120:]:
+            second.update(sample)
+        first.merge(second)
+        first.merge(self._stream())
+        self.assertEqual(301, first.count)
+        self._check(first, self.data)
+        # into an empty stream
+        empty = self._stream()
+        empty.merge(first)
+        self._check(empty, self.data)
+
+    def test_shape_mismatch(self):
+        stream = self._stream()
+        stream.update(self.data[:10])
+        self.assertRaises(ValueError, stream.update, self.data[:10, :, :6])
+        self.assertRaises(ValueError, stream.update, self.data[0, :1])
+        other = self._stream()
+        other.update(self.data[:10, :1])
+        self.assertRaises(ValueError, stream.merge, other)
+
+    def test_node_covariance(self):
+        ts = time_series.TimeSeries(data=self.data)
+        covariance = node_covariance.NodeCovariance(time_series=ts).evaluate()
+        self.assertEqual((7, 7, 2, 3), covariance.array_data.shape)
+        numpy.testing.assert_allclose(numpy.cov(self.data[:, 1, :, 2].T), covariance.array_data[:, :, 1, 2])
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(StreamingCovarianceTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+"""
+Tests for the principal component analyzer.
+"""
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.analyzers import pca
+from tvb.datatypes import time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+class PCATest(BaseTestCase):
+
+    def setUp(self):
+        super(PCATest, self).setUp()
+        # 3 sources mixed into 12 nodes, for 2 state variables
+        random = numpy.random.RandomState(42)
+        sources = random.randn(200, 2, 3, 1) * numpy.r_[5.0, 2.0, 1.0][:, numpy.newaxis]
+        mixing = random.randn(3, 12)
+        data = numpy.einsum('tvsm,sn->tvnm', sources, mixing)
+        self.time_series = time_series.TimeSeries(data=data)
+
+    def _expected(self):
+        "Fractions of variance and component weights from the correlation matrices, sign as PCA."
+        data = self.time_series.data
+        fractions = numpy.zeros((12, 2, 1))
+        weights = numpy.zeros((12, 12, 2, 1))
+        for var in range(2):
+            eigenvalues, eigenvectors = numpy.linalg.eigh(numpy.corrcoef(data[:, var, :, 0].T))
+            fractions[:, var, 0] = eigenvalues[::-1].clip(0.0, None) / eigenvalues.sum()
+            weights[:, :, var, 0] = eigenvectors[:, ::-1].T
+        return fractions, weights
+
+    def _check_signs(self, weights):
+        "The largest weight of each component is positive."
+        largest = abs(weights).argmax(axis=1)
+        for component in range(weights.shape[0]):
+            for var in range(weights.shape[2]):
+                self.assertTrue(weights[component, largest[component, var, 0], var, 0] > 0.0)
+
+    def _check_components(self, result, n_components):
+        fractions, weights = self._expected()
+        self.assertEqual((n_components, 12, 2, 1), result.weights.shape)
+        self.assertEqual((n_components, 2, 1), result.fractions.shape)
+        numpy.testing.assert_allclose(fractions[:n_components], result.fractions, atol=1e-10)
+        # only the 3 components with nonzero variance are unique, up to sign
+        n_unique = min(n_components, 3)
+        signs = numpy.sign((weights[:n_unique] * result.weights[:n_unique]).sum(axis=1))
+        numpy.testing.assert_allclose(weights[:n_unique] * signs[:, numpy.newaxis], result.weights[:n_unique],
+                                      atol=1e-8)
+        self._check_signs(result.weights)
+
+    def test_all_components(self):
+        result = pca.PCA(time_series=self.time_series).evaluate()
+        self._check_components(result, 12)
+        numpy.testing.assert_allclose(1.0, result.fractions.sum(axis=0))
+
+    def test_n_components(self):
+        result = pca.PCA(time_series=self.time_series, n_components=2).evaluate()
+        self._check_components(result, 2)
+
+    def test_explained_variance(self):
+        fractions, _ = self._expected()
+        cutoff = float(fractions[0].max()) + 0.01
+        # the second component is needed for the state variable with the larger first fraction
+        self.assertTrue((fractions[:2].sum(axis=0) > cutoff).all())
+        result = pca.PCA(time_series=self.time_series, explained_variance=cutoff).evaluate()
+        self._check_components(result, 2)
+        # no more than n_components
+        result = pca.PCA(time_series=self.time_series, explained_variance=0.999999, n_components=2).evaluate()
+        self._check_components(result, 2)
+
+    def test_incremental(self):
+        expected = pca.correlation_components(self.time_series, 3)
+        fractions, weights = pca.incremental_components(self.time_series, 3, oversampling=2, block_bytes=2 ** 12)
+        numpy.testing.assert_allclose(expected[0], fractions, atol=1e-10)
+        signs = numpy.sign((expected[1] * weights).sum(axis=1))
+        numpy.testing.assert_allclose(expected[1], weights * signs[:, numpy.newaxis], atol=1e-8)
+        # and through the analyzer, with the correlation matrix too large for the instance
+        analyzer = pca.PCA(time_series=self.time_series, n_components=3)
+        analyzer.max_covariance_nodes = 4
+        self._check_components(analyzer.evaluate(), 3)
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(PCATest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+"""
+Tests for the continuous wavelet transform analyzer.
+"""
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+import scipy.signal
+from tvb.analyzers import wavelet
+from tvb.datatypes import time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+class ContinuousWaveletTransformTest(BaseTestCase):
+
+    def test_decimated_convolutions(self):
+        random = numpy.random.RandomState(42)
+        data = random.randn(301, 3)
+        wavelets = [random.randn(n) + 1j * random.randn(n) for n in (1, 7, 31, 401)]
+        for temporal_step in (1, 3, 4):
+            nt = int(numpy.ceil(301.0 / temporal_step))
+            coef = wavelet.decimated_convolutions(data, wavelets, temporal_step, nt)
+            self.assertEqual((4, nt, 3), coef.shape)
+            for i, wvlt in enumerate(wavelets):
+                for k in range(3):
+                    expected = scipy.signal.convolve(data[:, k], wvlt, 'same')[::temporal_step]
+                    numpy.testing.assert_allclose(expected, coef[i, :, k], rtol=1e-10, atol=1e-10)
+
+    def test_blocks_and_processes(self):
+        data = numpy.random.RandomState(42).randn(512, 2, 5, 1)
+        ts = time_series.TimeSeries(data=data, sample_period=1.0)
+        ts.configure()
+        expected = wavelet.ContinuousWaveletTransform(time_series=ts, sample_period=4.0).evaluate().array_data
+        self.assertEqual((26, 128, 2, 5, 1), expected.shape)
+        for block_bytes, processes in ((1, 1), (2 ** 17, 1), (2 ** 17, 2)):
+            analyzer = wavelet.ContinuousWaveletTransform(time_series=ts, sample_period=4.0,
+                                                          block_bytes=block_bytes, processes=processes)
+            numpy.testing.assert_array_equal(expected, analyzer.evaluate().array_data)
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(ContinuousWaveletTransformTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
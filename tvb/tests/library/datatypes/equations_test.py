@@ -36,6 +36,8 @@ if __name__ == "__main__":
     from tvb.tests.library import setup_test_console_env
     setup_test_console_env()
 
+import numexpr
+import numpy
 import unittest
 from tvb.datatypes import equations
 from tvb.tests.library.base_testcase import BaseTestCase
@@ -107,7 +109,52 @@ class EquationsTest(BaseTestCase):
         dt = equations.PulseTrain()
         self.assertEqual(dt.parameters, {'onset': 30.0, 'tau': 13.0, 'T': 42.0, 'amp': 1.0})
 
-        
+
+    def test_pulsetrain_onset(self):
+        dt = equations.PulseTrain()
+        dt.parameters.update(onset=10.0, T=7.0, tau=2.5, amp=3.0)
+        var = numpy.r_[0:100] * 0.5
+        dt.pattern = var
+        # pulses of 2.5 ms every 7 ms, starting at the onset sample
+        expected = numpy.where((var >= 10.0) & ((var - 10.0) % 7.0 < 2.5), 3.0, 0.0)
+        numpy.testing.assert_array_equal(expected, dt.pattern)
+        self.assertEqual(3.0, dt.pattern[20])
+        self.assertEqual(0.0, dt.pattern[19])
+
+
+    def test_compiled_expressions(self):
+        var = numpy.linspace(0.0, 50.0, 101).reshape((1, -1))
+        for cls in (equations.Linear, equations.Gaussian, equations.DoubleGaussian, equations.Sigmoid,
+                    equations.GeneralizedSigmoid, equations.Sinusoid, equations.Cosine, equations.Alpha,
+                    equations.PulseTrain, equations.Gamma, equations.DoubleExponential,
+                    equations.FirstOrderVolterra, equations.MixtureOfGammas):
+            first, second = cls(), cls()
+            first.pattern = var.copy()
+            second.pattern = var.copy()
+            numpy.testing.assert_array_equal(first.pattern, second.pattern)
+            _, _, programs = equations._compiled_expressions[first.equation]
+            self.assertEqual(1, len(programs))
+        # same results as evaluating with numexpr directly
+        sinusoid = equations.Sinusoid()
+        sinusoid.pattern = var
+        numpy.testing.assert_array_equal(numexpr.evaluate(sinusoid.equation, local_dict={'var': var},
+                                                          global_dict=sinusoid.parameters), sinusoid.pattern)
+        # integer parameters keep numexpr integer arithmetic
+        parameters = {'a': 3, 'b': 2}
+        numpy.testing.assert_array_equal(numexpr.evaluate('a / b * var', local_dict={'var': var},
+                                                          global_dict=parameters),
+                                         equations._evaluate('a / b * var', parameters, var))
+
+
+    def test_compiled_expressions_bounded(self):
+        var = numpy.linspace(0.0, 1.0, 11)
+        for i in range(equations._COMPILED_EXPRESSIONS_SIZE + 10):
+            numpy.testing.assert_allclose(var + i, equations._evaluate('var + %d' % i, {}, var))
+        self.assertEqual(equations._COMPILED_EXPRESSIONS_SIZE, len(equations._compiled_expressions))
+        # most recently used programs are kept
+        self.assertIn('var + %d' % i, equations._compiled_expressions)
+
+
 def suite():
     """
     Gather all the tests in a test suite.
@@ -67,6 +67,23 @@ class ModeDecompositionsTest(BaseTestCase):
         self.assertEqual(dt.normalised_component_time_series.shape, (10, 10, 10, 10))
         
         
+    def test_principalcomponents_retained(self):
+        data = numpy.random.random((10, 2, 6, 3))
+        ts = time_series.TimeSeries(data=data)
+        dt = mode_decompositions.PrincipalComponents(source = ts,
+                                                    fractions = numpy.random.random((4, 2, 3)),
+                                                    weights = numpy.random.random((4, 6, 2, 3)))
+        dt.configure()
+        dt.compute_norm_source()
+        dt.compute_component_time_series()
+        dt.compute_normalised_component_time_series()
+        self.assertEqual(dt.norm_source.shape, (10, 2, 6, 3))
+        self.assertEqual(dt.component_time_series.shape, (10, 2, 4, 3))
+        self.assertEqual(dt.normalised_component_time_series.shape, (10, 2, 4, 3))
+        expected = numpy.dot(dt.weights[:, :, 1, 2], data[:, 1, :, 2].T).T
+        self.assertTrue(numpy.allclose(dt.component_time_series[:, 1, :, 2], expected))
+        
+        
     def test_independentcomponents(self):
         data = numpy.random.random((10, 10, 10, 10))
         ts = time_series.TimeSeries(data=data)
@@ -93,6 +93,42 @@ class PatternsTest(BaseTestCase):
         self.assertTrue(dt.temporal_pattern is None)
         self.assertTrue(dt.time is None)
         
+
+    def test_stimuliregion_streaming(self):
+        conn = connectivity.Connectivity(load_default=True)
+        conn.configure()
+        for temporal in (equations.Sinusoid(), equations.PulseTrain()):
+            dt = patterns.StimuliRegion(connectivity=conn, temporal=temporal, streaming=True)
+            dt.weight = [0.0] * conn.number_of_regions
+            dt.weight[3], dt.weight[40] = 1.0, 0.5
+            dt.configure_space()
+            dt.configure_time(numpy.r_[0.0:50.0:0.5].reshape((1, -1)))
+            expected = dt()
+            dt.stream_block_length = 16
+            dt.configure_streaming(0.5, 50.0)
+            for step in range(100):
+                nodes, values = dt.stream(step)
+                self.assertEqual([3, 40], nodes.tolist())
+                numpy.testing.assert_array_equal(expected[nodes, step], values)
+                self.assertFalse(numpy.delete(expected[:, step], nodes).any())
+
+    def test_pulsetrain_streaming(self):
+        conn = connectivity.Connectivity(load_default=True)
+        conn.configure()
+        dt = patterns.StimuliRegion(connectivity=conn, temporal=equations.PulseTrain(), streaming=True)
+        dt.temporal.parameters.update(onset=10.2, T=7.0, tau=2.5, amp=3.0)
+        dt.weight = [0.0] * conn.number_of_regions
+        dt.weight[3] = 2.0
+        dt.configure_space()
+        dt.stream_block_length = 24
+        dt.configure_streaming(0.1, 50.0)
+        # pulses of 2.5 ms every 7 ms from 10.2 ms on, evaluated block by block
+        time = numpy.r_[0:500] * 0.1
+        phase = (time - 10.2) % 7.0
+        expected = numpy.where((time >= 10.2) & (phase < 2.5), 6.0, 0.0)
+        values = numpy.array([dt.stream(step)[1][0] for step in range(500)])
+        numpy.testing.assert_array_equal(expected, values)
+
      
     def test_stimulisurface(self):
         srf = surfaces.CorticalSurface(load_default=True)
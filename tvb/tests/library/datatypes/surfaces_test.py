@@ -42,7 +42,7 @@ if __name__ == "__main__":
 import unittest
 import sys
 import numpy
-from tvb.datatypes import surfaces
+from tvb.datatypes import equations, surfaces
 from tvb.tests.library.base_testcase import BaseTestCase
 
 
@@ -120,6 +120,42 @@ class SurfacesTest(BaseTestCase):
         self.assertEqual(0, holes.size)
 
 
+    def test_surface_topology_arrays(self):
+        dt = surfaces.Surface()
+        dt.vertices = numpy.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1], [0, 0, 2]]).astype(numpy.float64)
+        dt.triangles = numpy.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]])
+        dt.configure()
+
+        topology = dt.topology
+        self.assertTrue(topology is dt.topology)
+        self.assertEqual(topology.edges.tolist(), [[0, 1], [0, 2], [0, 3], [1, 2], [1, 3], [2, 3]])
+        self.assertEqual(list(dt.edges), [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)])
+        self.assertEqual(dt.vertex_neighbours[3], frozenset([0, 1, 2]))
+        self.assertEqual(dt.vertex_neighbours[-1], frozenset())
+        self.assertEqual(dt.vertex_triangles[1], frozenset([0, 1, 3]))
+        self.assertEqual(dt.edge_triangles[0], frozenset([0, 1]))
+        self.assertEqual(dt.nth_ring(4, contains=True), frozenset())
+        self.assertTrue(numpy.allclose(dt.vertex_normals[4], [0, 0, 1]))
+
+
+    def test_surface_region_boundaries(self):
+        dt = surfaces.Surface()
+        dt.vertices = numpy.array([[0, 0, 0], [6, 0, 0], [0, 6, 0], [0, 0, 6]]).astype(numpy.float64)
+        dt.triangles = numpy.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]])
+        dt.configure()
+        dt.split_slices = dict((str(k), v) for k, v in dt.split_slices.items())
+        region_mapping = RegionMapping(array_data=numpy.array([0, 0, 1, 2]))
+
+        (vertices, ), (lines, ), (normals, ) = dt.generate_region_boundaries(region_mapping)
+        # a line in each of the first two triangles, spanning two regions, and a star in the other two
+        self.assertEqual(3 * (2 * 2 + 2 * 4), len(vertices))
+        self.assertEqual(len(vertices), len(normals))
+        self.assertEqual([0, 1, 2, 3, 4, 5, 4, 6, 4, 7], lines[:10])
+        self.assertEqual([0.0, 3.0, 0.0, 3.0, 3.0, 0.0], vertices[:6])
+        self.assertTrue(dt.generate_region_boundaries(RegionMapping(array_data=numpy.array([0, 0, 1, 2])))
+                        is dt.generate_region_boundaries(region_mapping))
+
+
     def test_cortical_topology_isolated_vertex(self):
         dt = surfaces.Surface()
         dt.vertices = numpy.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1], [0, 0, 2]]).astype(numpy.float64)
@@ -210,6 +246,63 @@ class SurfacesTest(BaseTestCase):
         self.assertTrue(dt.surface is None)
 
 
+    @staticmethod
+    def _wavy_sheet(n=24):
+        "Triangulated n x n grid with a folded height profile, spacing 1 mm."
+        x, y = numpy.mgrid[:n, :n].astype(numpy.float64)
+        vertices = numpy.c_[x.ravel(), y.ravel(), 3.0 * numpy.sin(x.ravel() / 3.0)]
+        corners = (x[:-1, :-1] * n + y[:-1, :-1]).astype(numpy.int32).ravel()
+        triangles = numpy.r_[numpy.c_[corners, corners + n, corners + 1],
+                             numpy.c_[corners + 1, corners + n, corners + n + 1]]
+        return vertices, triangles
+
+
+    def test_local_gdist_matrix_processes(self):
+        vertices, triangles = self._wavy_sheet()
+        expected = surfaces.gdist.local_gdist_matrix(vertices, triangles, max_distance=4.0)
+        dist = surfaces.local_gdist_matrix(vertices, triangles, 4.0, processes=3)
+        self.assertEqual(dist.format, 'csc')
+        self.assertEqual(dist.nnz, expected.nnz)
+        self.assertEqual((dist != expected).nnz, 0)
+
+
+    def test_localconnectivity_reuses_gdist(self):
+        surface = surfaces.CorticalSurface()
+        surface.vertices, surface.triangles = self._wavy_sheet()
+        dt = LocalConnectivity(surface=surface, cutoff=4.0)
+        dt.compute_sparse_matrix(processes=2)
+        gdist_matrix = surface.geodesic_distance_matrix
+        distances = gdist_matrix.data.copy()
+        gaussian = dt.matrix
+        dt.equation = equations.DoubleGaussian()
+        dt.compute_sparse_matrix(processes=2)
+        self.assertTrue(surface.geodesic_distance_matrix is gdist_matrix)
+        self.assertTrue(numpy.array_equal(gdist_matrix.data, distances))
+        self.assertEqual(dt.matrix.shape, gaussian.shape)
+        self.assertNotEqual(abs(dt.matrix - gaussian).max(), 0.0)
+        # a different mesh gets its own distances
+        surface.vertices = surface.vertices * 2.0
+        dt.compute_sparse_matrix()
+        self.assertFalse(surface.geodesic_distance_matrix is gdist_matrix)
+        self.assertTrue(surface.geodesic_distance_matrix.nnz < gdist_matrix.nnz)
+
+
+    def test_localconnectivity_processes_and_clear(self):
+        surface = surfaces.CorticalSurface()
+        surface.vertices, surface.triangles = self._wavy_sheet()
+        dt = LocalConnectivity(surface=surface, cutoff=4.0, processes=2)
+        self.assertEqual(2, dt.processes)
+        dt.compute_sparse_matrix()
+        gdist_matrix = surface.geodesic_distance_matrix
+        expected = surfaces.gdist.local_gdist_matrix(surface.vertices, surface.triangles, max_distance=4.0)
+        self.assertEqual(0, (gdist_matrix != expected).nnz)
+        surface.clear_geodesic_distance_matrix()
+        self.assertTrue(surface.geodesic_distance_matrix is None)
+        dt.compute_sparse_matrix()
+        self.assertFalse(surface.geodesic_distance_matrix is gdist_matrix)
+        self.assertEqual(0, (surface.geodesic_distance_matrix != gdist_matrix).nnz)
+
+
     @unittest.skipIf(sys.maxsize <= 2147483647, "Cannot deal with local connectivity on a 32-bit machine.")
     def test_cortexdata(self):
 
@@ -36,6 +36,9 @@ if __name__ == "__main__":
     from tvb.tests.library import setup_test_console_env
     setup_test_console_env()
     
+import os
+import shutil
+import tempfile
 import numpy
 import unittest
 from tvb.datatypes import time_series
@@ -121,6 +124,27 @@ class TimeseriesTest(BaseTestCase):
         self.assertEqual(dt.time.shape, (0,))  
         
         
+    def test_timeseries_from_data_file(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            file_name = os.path.join(temp_dir, 'data.npy')
+            dt = time_series.TimeSeries.from_data_file(file_name, shape=(100, 2, 3, 1), sample_period=0.5)
+            self.assertTrue(isinstance(dt.data, numpy.memmap))
+            data = numpy.random.random((100, 2, 3, 1))
+            dt.data[:] = data
+            dt.data.flush()
+            del dt
+            dt = time_series.TimeSeries.from_data_file(file_name, sample_period=0.5)
+            self.assertEqual(dt.sample_period, 0.5)
+            self.assertEqual(dt.read_data_shape(), (100, 2, 3, 1))
+            blocks = list(dt.read_data_blocks(start=10, stop=90, block_bytes=8 * 6 * 7))
+            self.assertEqual([first for first, _ in blocks], range(10, 90, 7))
+            self.assertTrue(numpy.array_equal(numpy.concatenate([block for _, block in blocks]), data[10:90]))
+            del dt, blocks
+        finally:
+            shutil.rmtree(temp_dir)
+        
+        
 def suite():
     """
     Gather all the tests in a test suite.
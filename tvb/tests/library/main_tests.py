@@ -87,6 +87,7 @@ if __name__ == "__main__":
 
 import unittest
 import datetime
+from tvb.tests.library.analyzers import analyzers_test_main
 from tvb.tests.library.basic import basic_test_main
 from tvb.tests.library.datatypes import datatypes_test_main
 from tvb.tests.library.simulator import simulator_test_main
@@ -98,6 +99,7 @@ def suite():
     Gather all the tests in a test suite.
     """
     test_suite = unittest.TestSuite()
+    test_suite.addTest(analyzers_test_main.suite())
     test_suite.addTest(basic_test_main.suite())
     test_suite.addTest(datatypes_test_main.suite())
     test_suite.addTest(simulator_test_main.suite())
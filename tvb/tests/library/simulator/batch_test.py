@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Scientific Package. This package holds all simulators, and
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test for tvb.simulator.batch module
+
+.. moduleauthor:: Marmaduke Woodman <marmaduke.woodman@univ-amu.fr>
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.datatypes.connectivity import Connectivity
+from tvb.simulator import coupling, integrators, models, monitors, noise
+from tvb.simulator.batch import BatchSimulator
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class BatchSimulatorTest(BaseTestCase):
+
+    def _build(self, integrator, sweep):
+        conn = Connectivity(load_default=True)
+        conn.speed = numpy.r_[3.0]
+        sim = BatchSimulator(connectivity=conn,
+                             coupling=coupling.Linear(),
+                             model=models.Generic2dOscillator(),
+                             integrator=integrator,
+                             monitors=(monitors.Raw(), monitors.TemporalAverage(period=1.0)),
+                             sweep=sweep,
+                             simulation_length=10.0)
+        return sim.configure()
+
+
+    def _check_instances(self, sim, rtol):
+        batch_output = sim.run()
+        self.assertEqual(sim.number_of_instances, len(batch_output))
+        for i, instance_output in enumerate(batch_output):
+            single_output = sim.instance_simulator(i).run(simulation_length=sim.simulation_length)
+            for (bt, bx), (st, sx) in zip(instance_output, single_output):
+                numpy.testing.assert_allclose(bt, st)
+                self.assertEqual(sx.shape, bx.shape)
+                numpy.testing.assert_allclose(bx, sx, rtol=rtol, atol=1e-10)
+
+
+    def test_deterministic(self):
+        sim = self._build(integrators.HeunDeterministic(dt=0.1),
+                          {'coupling.a': [0.0, 0.01, 0.1], 'model.a': [-2.0, -1.5, -1.0]})
+        self.assertEqual(3, sim.number_of_instances)
+        self.assertEqual((2, 76, 3), sim.current_state.shape)
+        self._check_instances(sim, 1e-7)
+
+
+    def test_stochastic(self):
+        integrator = integrators.HeunStochastic(dt=0.1, noise=noise.Additive(nsig=numpy.r_[1e-3]))
+        sim = self._build(integrator, {'integrator.noise.nsig': [1e-5, 1e-3], 'coupling.a': [0.01, 0.02]})
+        self._check_instances(sim, 1e-7)
+
+
+    def test_stochastic_noise_shape(self):
+        # more instances than state variables, as in the class docstring
+        integrator = integrators.HeunStochastic(dt=0.1, noise=noise.Additive(nsig=numpy.r_[1e-3]))
+        sim = self._build(integrator, {'integrator.noise.nsig': [1e-5, 1e-5, 1e-4],
+                                       'coupling.a': [0.001, 0.002, 0.004]})
+        self.assertEqual((2, 1, 3), sim.integrator.noise.nsig.shape)
+        self._check_instances(sim, 1e-7)
+
+
+    def test_coloured_noise(self):
+        integrator = integrators.HeunStochastic(dt=0.1, noise=noise.Additive(nsig=numpy.r_[1e-3], ntau=1.0))
+        sim = self._build(integrator, {'integrator.noise.nsig': [1e-5, 1e-4, 1e-3]})
+        self._check_instances(sim, 1e-7)
+
+
+    def test_unequal_sweep(self):
+        sim = BatchSimulator(connectivity=Connectivity(load_default=True),
+                             sweep={'coupling.a': [0.1, 0.2], 'model.a': [1.0]})
+        self.assertRaises(ValueError, sim.configure)
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(BatchSimulatorTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
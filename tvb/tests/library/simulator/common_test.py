@@ -97,6 +97,19 @@ class CommonTest(BaseTestCase):
             common._add_at(actual, map, source)
             self.assertTrue(numpy.allclose(expected, actual))
 
+    def test_region_average(self):
+        region_mapping = numpy.r_[2, 0, 1, 1, 0, 2, 2, 3]
+        data = numpy.random.randn(3, region_mapping.size, 2)
+        expected = numpy.zeros((3, 4, 2))
+        numpy.add.at(expected.transpose((1, 0, 2)), region_mapping, data.transpose((1, 0, 2)))
+        expected /= numpy.bincount(region_mapping).reshape((-1, 1))
+        average = common.RegionAverage(region_mapping)
+        self.assertEqual(average.n_region, 4)
+        self.assertTrue(numpy.allclose(expected, average(data, axis=1)))
+
+    def test_region_average_empty_region(self):
+        self.assertRaises(ValueError, common.RegionAverage, numpy.r_[0, 0, 2], 3)
+
     def setUp(self):
         pass
         
@@ -144,6 +144,51 @@ class CouplingTest(BaseTestCase):
         self._apply_coupling_2sv(k)
 
 
+class SeparableCouplingTest(BaseTestCase):
+    """
+    Compare the sparse matrix product used by separable couplings with a
+    direct evaluation over delayed states.
+
+    """
+
+    def setUp(self):
+        super(SeparableCouplingTest, self).setUp()
+        n_node, n_time, self.n_mode = 30, 12, 2
+        weights = numpy.random.rand(n_node, n_node)
+        weights[weights < 0.6] = 0.0
+        delays = numpy.random.randint(0, n_time, (n_node, n_node))
+        self.history = SparseHistory(weights, delays, numpy.r_[0, 1], self.n_mode)
+        self.history.initialize(numpy.random.randn(n_time, 2, n_node, self.n_mode))
+
+    def _check(self, k, step=7):
+        k.configure()
+        reference = copy.deepcopy(k)
+        reference.separable = False
+        self.assertTrue(k.separable)
+        numpy.testing.assert_allclose(k(step, self.history), reference(step, self.history), rtol=1e-5, atol=1e-6)
+
+    def test_linear(self):
+        self._check(coupling.Linear(a=numpy.r_[0.5], b=numpy.r_[0.1]))
+
+    def test_scaling(self):
+        self._check(coupling.Scaling(a=0.2))
+
+    def test_hyperbolic_tangent(self):
+        self._check(coupling.HyperbolicTangent())
+
+    def test_sigmoidal(self):
+        self._check(coupling.Sigmoidal(sigma=numpy.r_[1.0]))
+
+    def test_sigmoidal_jr(self):
+        k = coupling.SigmoidalJansenRit()
+        k.configure()
+        step, h = 7, self.history
+        x_i, x_j = h.query(step) # dense (to, ncv, from, m) delayed states, zero for null weights
+        pre = k.cmax / (1.0 + numpy.exp(k.r * (k.midpoint - (x_j[:, 0] - x_j[:, 1]))))
+        expected = k.a * (h.weights[:, :, numpy.newaxis] * pre).sum(axis=1)[numpy.newaxis]
+        numpy.testing.assert_allclose(k(step, h), expected, rtol=1e-5, atol=1e-8)
+
+
 class CouplingShapeTest(BaseTestCase):
 
     def test_shape(self):
@@ -183,6 +228,7 @@ def suite():
     """
     test_suite = unittest.TestSuite()
     test_suite.addTest(unittest.makeSuite(CouplingTest))
+    test_suite.addTest(unittest.makeSuite(SeparableCouplingTest))
     test_suite.addTest(unittest.makeSuite(CouplingShapeTest))
     return test_suite
 
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+"""
+Test for tvb.simulator.farm module
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.datatypes.connectivity import Connectivity
+from tvb.simulator import coupling, integrators, models, monitors, noise, simulator
+from tvb.simulator.farm import SimulationFarm
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class SimulationFarmTest(BaseTestCase):
+
+    def _simulator(self, **params):
+        conn = Connectivity(load_default=True)
+        conn.speed = numpy.r_[3.0]
+        sim = simulator.Simulator(connectivity=conn,
+                                  coupling=coupling.Linear(a=numpy.r_[params.get('a', 0.0)]),
+                                  model=models.Generic2dOscillator(tau=numpy.r_[params.get('tau', 1.0)]),
+                                  integrator=integrators.HeunStochastic(
+                                      dt=0.1, noise=noise.Additive(nsig=numpy.r_[params.get('nsig', 1e-3)])),
+                                  monitors=(monitors.TemporalAverage(period=1.0), ),
+                                  simulation_length=10.0)
+        numpy.random.seed(42)
+        return sim.configure()
+
+
+    def test_grid(self):
+        farm = SimulationFarm(self._simulator(), {'coupling.a': [0.0, 0.01], 'model.tau': [1.0, 2.0],
+                                                  'integrator.noise.nsig': [1e-4]}, processes=2)
+        self.assertEqual(4, farm.number_of_points)
+        results = list(farm.run())
+        self.assertEqual(range(4), sorted(result.index for result in results))
+        self.assertEqual({}, farm.failed)
+        for result in results:
+            self.assertIsNone(result.error)
+            params = result.parameters
+            single = self._simulator(a=params['coupling.a'], tau=params['model.tau'],
+                                     nsig=params['integrator.noise.nsig'])
+            (t, x), = single.run()
+            (farm_t, farm_x), = result.output
+            numpy.testing.assert_allclose(farm_t, t)
+            numpy.testing.assert_allclose(farm_x, x)
+
+
+    def test_failed_points(self):
+        farm = SimulationFarm(self._simulator(), [{'coupling.a': 0.01}, {'coupling.a': 'bad'}], processes=1)
+        results = dict((result.index, result) for result in farm.run())
+        self.assertIsNone(results[0].error)
+        self.assertIsNotNone(results[1].error)
+        self.assertEqual([1], farm.failed.keys())
+        farm.points[1] = {'coupling.a': 0.02}
+        retried, = farm.retry()
+        self.assertEqual(1, retried.index)
+        self.assertIsNone(retried.error)
+        self.assertEqual({}, farm.failed)
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(SimulationFarmTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
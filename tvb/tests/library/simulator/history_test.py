@@ -39,11 +39,13 @@ if __name__ == "__main__":
     from tvb.tests.library import setup_test_console_env
     setup_test_console_env()
 
+import copy
 import numpy
 import unittest
 import tvb.basic.traits.types_basic as basic
 from tvb.datatypes.connectivity import Connectivity
 from tvb.simulator.coupling import Coupling
+from tvb.simulator.history import SparseHistory, OffsetSparseHistory
 from tvb.simulator.integrators import Identity
 from tvb.simulator.models import Model
 from tvb.simulator.monitors import Raw
@@ -121,12 +123,64 @@ class ExactPropagationTests(BaseTestCase):
 
 
 
+
+class OffsetSparseHistoryTests(BaseTestCase):
+
+    def test_query_matches_sparse(self):
+        n_node, n_time, n_mode = 20, 15, 3
+        weights = numpy.random.rand(n_node, n_node)
+        weights[weights < 0.5] = 0.0
+        delays = numpy.random.randint(0, n_time, (n_node, n_node))
+        cvars = numpy.r_[0, 2]
+        init = numpy.random.randn(n_time, 3, n_node, n_mode)
+        sparse = SparseHistory(weights, delays, cvars, n_mode)
+        offset = OffsetSparseHistory(weights, delays, cvars, n_mode)
+        sparse.initialize(init)
+        offset.initialize(init)
+        for step in range(1, 4 * n_time):
+            (x_i, x_j), (y_i, y_j) = sparse.query_sparse(step), offset.query_sparse(step)
+            numpy.testing.assert_array_equal(x_i, y_i)
+            numpy.testing.assert_array_equal(x_j, y_j)
+            numpy.testing.assert_array_equal(sparse.query(step)[1], offset.query(step)[1])
+            new_state = numpy.random.randn(3, n_node, n_mode)
+            sparse.update(step, new_state)
+            offset.update(step, new_state)
+
+    def test_query_sparse_reuses_array(self):
+        n_node, n_time = 10, 5
+        weights = numpy.random.rand(n_node, n_node)
+        delays = numpy.random.randint(0, n_time, (n_node, n_node))
+        history = OffsetSparseHistory(weights, delays, numpy.r_[0], 1)
+        history.initialize(numpy.random.randn(n_time, 1, n_node, 1))
+        delayed = history.query_sparse(1)[1]
+        kept = delayed.copy()
+        # the next query overwrites the delayed state of the previous one
+        self.assertIs(delayed, history.query_sparse(2)[1])
+        numpy.testing.assert_array_equal(kept, history.query_sparse(1)[1])
+
+    def test_deepcopy(self):
+        n_node, n_time = 10, 5
+        weights = numpy.random.rand(n_node, n_node)
+        delays = numpy.random.randint(0, n_time, (n_node, n_node))
+        history = OffsetSparseHistory(weights, delays, numpy.r_[0], 1)
+        history.initialize(numpy.random.randn(n_time, 1, n_node, 1))
+        history_copy = copy.deepcopy(history)
+        self.assertEqual(history.n_nnzw, history_copy.n_nnzw)
+        self.assertIs(history.nnz_offsets, history_copy.nnz_offsets)
+        self.assertIsNot(history.buffer, history_copy.buffer)
+        numpy.testing.assert_array_equal(history.query_sparse(3)[1], history_copy.query_sparse(3)[1])
+        history_copy.update(3, numpy.zeros((1, n_node, 1)))
+        self.assertTrue(history.buffer[3].any())
+
+
+
 def suite():
     """
     Gather all the tests in a test suite.
     """
     test_suite = unittest.TestSuite()
     test_suite.addTest(unittest.makeSuite(ExactPropagationTests))
+    test_suite.addTest(unittest.makeSuite(OffsetSparseHistoryTests))
     return test_suite
 
 
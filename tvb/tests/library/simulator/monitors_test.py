@@ -37,14 +37,18 @@ handling of projection matrices, etc.
 
 """
 
+import os
+import shutil
+import tempfile
 import unittest
 import numpy
+import scipy.sparse
 
 if __name__ == "__main__":
     from tvb.tests.library import setup_test_console_env
     setup_test_console_env()
 
-from tvb.datatypes import sensors
+from tvb.datatypes import equations, sensors
 from tvb.simulator import monitors, models, coupling, integrators, noise, simulator
 from tvb.basic.logger.builder import get_logger
 from tvb.tests.library.base_testcase import BaseTestCase
@@ -52,6 +56,7 @@ from tvb.datatypes import connectivity
 from tvb.datatypes.cortex import Cortex
 from tvb.datatypes.region_mapping import RegionMapping
 from tvb.datatypes.sensors import SensorsInternal
+from tvb.datatypes.time_series import TimeSeriesRegion
 
 
 LOG = get_logger(__name__)
@@ -130,6 +135,127 @@ class MonitorsConfigurationTest(BaseTestCase):
         self.assertEqual(monitor.period, 2000.0)
 
 
+class BoldConvolutionTest(BaseTestCase):
+    "Partitioned and dense HRF convolutions in the Bold monitor."
+
+    def _run(self, convolution, hrf_kernel, period=500.0, hrf_length=2000.0, simulation_length=4000.0):
+        sim = simulator.Simulator(connectivity=connectivity.Connectivity(load_default=True),
+                                  model=models.Generic2dOscillator(),
+                                  integrator=integrators.HeunDeterministic(dt=0.5),
+                                  monitors=(monitors.Bold(period=period, hrf_length=hrf_length, hrf_kernel=hrf_kernel,
+                                                          convolution=convolution), ),
+                                  simulation_length=simulation_length)
+        numpy.random.seed(42)
+        sim.configure()
+        engine = sim.monitors[0]._engine
+        (t, x), = sim.run()
+        return t, x, engine
+
+    def _check(self, hrf_kernel_class, **kwargs):
+        dense_t, dense_x, _ = self._run("dense", hrf_kernel_class(), **kwargs)
+        part_t, part_x, engine = self._run("partitioned", hrf_kernel_class(), **kwargs)
+        self.assertEqual(dense_x.shape, part_x.shape)
+        numpy.testing.assert_allclose(dense_t, part_t)
+        numpy.testing.assert_allclose(dense_x, part_x, rtol=1e-10, atol=1e-12)
+        return engine
+
+    def test_volterra(self):
+        self._check(equations.FirstOrderVolterra)
+
+    def test_gamma(self):
+        self._check(equations.Gamma)
+
+    def test_long_kernel(self):
+        # default 20 s kernel sampled every 8 ms, outputs reaching past several FFT partitions
+        engine = self._check(equations.FirstOrderVolterra, period=8.0, hrf_length=20000.0, simulation_length=4000.0)
+        self.assertEqual((2500, 2), (engine.n_lag, engine.inputs.shape[1]))
+        self.assertEqual([4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048], [size for size, _ in engine.partitions])
+
+
+class MonitorStreamingTest(BaseTestCase):
+    "Streaming monitor output to disk during Simulator.run."
+
+    def setUp(self):
+        super(MonitorStreamingTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_stream_matches_memory(self):
+        conn = connectivity.Connectivity(load_default=True)
+        streamed = monitors.TemporalAverage(period=0.5)
+        time_series = TimeSeriesRegion(connectivity=conn, sample_period=streamed.period)
+        sink = streamed.stream_to(time_series, self.directory)
+        sim = simulator.Simulator(connectivity=conn, model=models.Generic2dOscillator(),
+                                  integrator=integrators.HeunDeterministic(dt=0.1),
+                                  monitors=(streamed, monitors.TemporalAverage(period=0.5)),
+                                  simulation_length=5.0)
+        sim.configure()
+        _, (_, expected_first) = sim.run()
+        # samples written so far are readable before the simulation is continued
+        self.assertEqual((10, 1, 76, 1), time_series.read_data_shape())
+        numpy.testing.assert_allclose(time_series.read_data_slice((slice(0, 10), )), expected_first)
+        self.assertEqual((10, 76), time_series.read_data_page(0, 10).shape)
+        (t, x), (expected_t, expected_x) = sim.run()
+        sink.close()
+        self.assertEqual(20, time_series.length_1d)
+        numpy.testing.assert_allclose(x[10:], expected_x)
+        numpy.testing.assert_allclose(t[10:], expected_t)
+        # a reader elsewhere finds the sample shape next to the data
+        reader = monitors.StreamedArray(time_series.data.path)
+        self.assertEqual((20, 1, 76, 1), reader.shape)
+        numpy.testing.assert_array_equal(x[:], reader[:])
+
+    def test_temporary_directory(self):
+        conn = connectivity.Connectivity(load_default=True)
+        streamed = monitors.TemporalAverage(period=0.5)
+        time_series = TimeSeriesRegion(connectivity=conn, sample_period=streamed.period)
+        sim = simulator.Simulator(connectivity=conn, model=models.Generic2dOscillator(),
+                                  integrator=integrators.HeunDeterministic(dt=0.1),
+                                  monitors=(streamed, ), simulation_length=5.0)
+        sim.configure()
+        with streamed.stream_to(time_series) as sink:
+            (_, x), = sim.run()
+        # closed on leaving the block
+        self.assertIsNone(time_series.data._file)
+        self.assertEqual(10, time_series.length_1d)
+        directory = sink.temporary_directory
+        self.assertTrue(os.path.isdir(directory))
+        sink.remove()
+        self.assertFalse(os.path.exists(directory))
+
+
+class ProjectionAccumulateTest(BaseTestCase):
+    "Projection monitors accumulating in source space or with thresholded gain."
+
+    def _run(self, **kwds):
+        eeg = monitors.EEG.from_file(period=1.0, **kwds)
+        sim = simulator.Simulator(connectivity=connectivity.Connectivity(load_default=True),
+                                  model=models.Generic2dOscillator(),
+                                  integrator=integrators.HeunDeterministic(dt=0.1),
+                                  monitors=(eeg, ), simulation_length=20.0)
+        numpy.random.seed(42)
+        sim.configure()
+        (t, x), = sim.run()
+        return t, x, eeg
+
+    def test_sources(self):
+        expected_t, expected_x, _ = self._run()
+        t, x, _ = self._run(accumulate="sources")
+        numpy.testing.assert_allclose(t, expected_t)
+        numpy.testing.assert_allclose(x, expected_x, rtol=1e-10, atol=1e-12)
+
+    def test_gain_threshold(self):
+        _, expected_x, _ = self._run()
+        _, x, eeg = self._run(accumulate="sources", gain_threshold=0.5)
+        self.assertTrue(scipy.sparse.issparse(eeg._projector))
+        self.assertTrue(eeg._projector.nnz < eeg.gain.size / 2)
+        self.assertEqual(expected_x.shape, x.shape)
+        _, x, _ = self._run(gain_threshold=1e-9)
+        numpy.testing.assert_allclose(x, expected_x, rtol=1e-6, atol=1e-9)
+
+
 class SubcorticalProjectionTest(BaseTestCase):
     """
     Cortical surface with subcortical regions, sEEG, EEG & MEG, using a stochastic
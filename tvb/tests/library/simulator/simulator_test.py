@@ -45,11 +45,15 @@ if True or __name__ == "__main__":
     from tvb.tests.library import setup_test_console_env
     setup_test_console_env()
 
+import os
+import shutil
+import tempfile
 import numpy
 import unittest
 import itertools
 from tvb.simulator.common import get_logger
 from tvb.simulator import simulator, models, coupling, integrators, monitors, noise
+from tvb.datatypes import equations, patterns
 from tvb.datatypes.connectivity import Connectivity
 from tvb.datatypes.cortex import Cortex
 from tvb.datatypes.local_connectivity import LocalConnectivity
@@ -57,6 +61,12 @@ from tvb.datatypes.region_mapping import RegionMapping
 from tvb.basic.traits.parameters_factory import get_traited_subclasses
 from tvb.tests.library.base_testcase import BaseTestCase
 
+try:
+    import numba
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
 LOG = get_logger(__name__)
 
 AVAILABLE_MODELS = get_traited_subclasses(models.Model)
@@ -190,6 +200,210 @@ class SimulatorTest(BaseTestCase):
             LOG.debug("Surface simulation finished for defaultConnectivity= %s" % str(default_connectivity))
 
 
+    def test_surface_spatial_average(self):
+        "Region averages of a surface simulation cover every region, including unmapped ones."
+        test_simulator = Simulator()
+        test_simulator.monitors = (monitors.Raw(), monitors.SpatialAverage(period=2 ** -3))
+        test_simulator.configure(surface_sim=True)
+        sim = test_simulator.sim
+        n_reg = sim.connectivity.number_of_regions
+        self.assertEqual(sim.region_average.n_region, n_reg)
+        raw, savg = test_simulator.run_simulation(simulation_length=2 ** -1)
+        for (_, raw_x), (_, savg_x) in zip(raw, savg):
+            self.assertEqual(savg_x.shape, (raw_x.shape[0], n_reg, raw_x.shape[2]))
+            expected = numpy.zeros(savg_x.shape)
+            numpy.add.at(expected.transpose((1, 0, 2)), sim._regmap, raw_x.transpose((1, 0, 2)))
+            expected /= numpy.bincount(sim._regmap).reshape((-1, 1))
+            numpy.testing.assert_allclose(savg_x, expected)
+
+
+
+    def test_streaming_stimulus(self):
+        outputs = []
+        for streaming, temporal in itertools.product((False, True), (equations.Sinusoid, equations.PulseTrain)):
+            conn = Connectivity(load_default=True)
+            conn.configure()
+            stimulus = patterns.StimuliRegion(connectivity=conn, streaming=streaming, temporal=temporal())
+            if temporal is equations.PulseTrain:
+                stimulus.temporal.parameters.update(onset=5.0, T=4.0, tau=1.5)
+            stimulus.weight = [0.0] * conn.number_of_regions
+            stimulus.weight[10], stimulus.weight[50] = 1.0, 2.0
+            stimulus.stream_block_length = 32
+            sim = simulator.Simulator(connectivity=conn, model=models.Generic2dOscillator(), stimulus=stimulus,
+                                      integrator=integrators.HeunDeterministic(dt=0.1),
+                                      monitors=(monitors.Raw(), ), simulation_length=20.0)
+            numpy.random.seed(42)
+            sim.configure()
+            (_, raw), = sim.run()
+            outputs.append(raw)
+        numpy.testing.assert_array_equal(outputs[0], outputs[2])
+        numpy.testing.assert_array_equal(outputs[1], outputs[3])
+
+
+@unittest.skipIf(not HAVE_NUMBA, "Numba unavailable")
+class NumbaBackendTest(BaseTestCase):
+
+    def _run(self, backend, model, cfun, integrator, monitors_):
+        conn = Connectivity(load_default=True)
+        conn.speed = numpy.r_[3.0]
+        sim = simulator.Simulator(connectivity=conn, model=model, coupling=cfun, integrator=integrator,
+                                  monitors=monitors_, backend=backend, simulation_length=20.0)
+        # initial history is drawn during configure
+        numpy.random.seed(42)
+        sim.configure()
+        return sim.run(random_state=numpy.random.RandomState(42).get_state()), sim
+
+
+    def _compare(self, make_model, make_cfun, make_integrator,
+                 make_monitors=lambda: (monitors.Raw(), monitors.TemporalAverage(period=1.0))):
+        "Compare both backends, building fresh components, e.g. noise streams, for each run."
+        np_outputs, np_sim = self._run("numpy", make_model(), make_cfun(), make_integrator(), make_monitors())
+        nb_outputs, nb_sim = self._run("numba", make_model(), make_cfun(), make_integrator(), make_monitors())
+        for (np_t, np_x), (nb_t, nb_x) in zip(np_outputs, nb_outputs):
+            numpy.testing.assert_allclose(np_t, nb_t)
+            self.assertEqual(np_x.shape, nb_x.shape)
+            numpy.testing.assert_allclose(np_x, nb_x, rtol=1e-4, atol=1e-5)
+        self.assertEqual(np_sim.current_step, nb_sim.current_step)
+        numpy.testing.assert_allclose(np_sim.current_state, nb_sim.current_state, rtol=1e-4, atol=1e-5)
+
+
+    def test_g2d_linear_heun(self):
+        self._compare(models.Generic2dOscillator, coupling.Linear,
+                      lambda: integrators.HeunDeterministic(dt=0.1))
+
+
+    def test_kuramoto_rk4(self):
+        # weak coupling, as strongly coupled phases amplify float32 history rounding differences
+        self._compare(models.Kuramoto, lambda: coupling.Kuramoto(a=numpy.r_[0.01]),
+                      lambda: integrators.RungeKutta4thOrderDeterministic(dt=0.1))
+
+
+    def test_stochastic(self):
+        self._compare(models.Generic2dOscillator, coupling.Difference,
+                      lambda: integrators.HeunStochastic(dt=0.1, noise=noise.Additive(nsig=numpy.r_[1e-4])))
+
+
+    def test_subsampling_monitors(self):
+        # without Raw, blocks end at the monitor periods and the monitors record whole blocks
+        self._compare(models.Generic2dOscillator, coupling.Linear, lambda: integrators.HeunDeterministic(dt=0.1),
+                      lambda: (monitors.TemporalAverage(period=1.0), monitors.SubSample(period=0.5),
+                               monitors.SpatialAverage(period=2.0)))
+
+
+    def test_temporal_average_only(self):
+        self._compare(models.Generic2dOscillator, coupling.Linear, lambda: integrators.HeunDeterministic(dt=0.1),
+                      lambda: (monitors.TemporalAverage(period=0.7), ))
+
+
+    def test_bold_only(self):
+        self._compare(models.Generic2dOscillator, coupling.Linear, lambda: integrators.HeunDeterministic(dt=0.1),
+                      lambda: (monitors.Bold(period=4.0, convolution="partitioned"), ))
+
+
+    def test_rww_euler(self):
+        self._compare(models.ReducedWongWang, lambda: coupling.Linear(a=numpy.r_[0.01]),
+                      lambda: integrators.EulerDeterministic(dt=0.1))
+
+
+    def test_linear_rk4(self):
+        self._compare(models.Linear, lambda: coupling.Linear(a=numpy.r_[0.01]),
+                      lambda: integrators.RungeKutta4thOrderDeterministic(dt=0.1))
+
+
+    def test_unsupported(self):
+        conn = Connectivity(load_default=True)
+        sim = simulator.Simulator(connectivity=conn, model=models.JansenRit(), backend="numba",
+                                  simulation_length=1.0)
+        with self.assertRaises(ValueError) as context:
+            sim.configure()
+        self.assertIn("model JansenRit", str(context.exception))
+
+
+
+class CheckpointTest(BaseTestCase):
+
+    def setUp(self):
+        super(CheckpointTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'sim.ckpt')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _simulator(self, backend="numpy", streaming=None):
+        "Build a simulator, with a pulse train stimulus unless streaming is None."
+        conn = Connectivity(load_default=True)
+        conn.speed = numpy.r_[3.0]
+        stimulus = None
+        if streaming is not None:
+            conn.configure()
+            stimulus = patterns.StimuliRegion(connectivity=conn, streaming=streaming, temporal=equations.PulseTrain())
+            stimulus.temporal.parameters.update(onset=5.0, T=12.0, tau=3.0, amp=2.0)
+            stimulus.weight = [0.0] * conn.number_of_regions
+            stimulus.weight[10], stimulus.weight[50] = 1.0, 2.0
+            stimulus.stream_block_length = 32
+        sim = simulator.Simulator(connectivity=conn, model=models.Generic2dOscillator(), stimulus=stimulus,
+                                  coupling=coupling.Linear(a=numpy.r_[0.01]), backend=backend,
+                                  integrator=integrators.HeunStochastic(dt=0.1, noise=noise.Additive(nsig=numpy.r_[1e-3])),
+                                  monitors=(monitors.Raw(), monitors.TemporalAverage(period=1.0),
+                                            monitors.Bold(period=4.0, convolution="partitioned")),
+                                  simulation_length=40.0)
+        numpy.random.seed(42)
+        return sim.configure()
+
+    def _collect(self, outputs, n_output=None):
+        "Collect monitor outputs, stopping early after n_output outputs."
+        collected = [[] for _ in range(3)]
+        for i, output in enumerate(outputs):
+            for samples, sample in zip(collected, output):
+                if sample is not None:
+                    samples.append(sample)
+            if i + 1 == n_output:
+                break
+        return collected
+
+    def _check_resume(self, backend, streaming=None):
+        expected = self._collect(self._simulator(backend, streaming)())
+        interrupted = self._simulator(backend, streaming)
+        interrupted.checkpoint_to(self.filename, 10.0)
+        self._collect(interrupted(), n_output=250)
+        checkpoint = simulator.SimulatorCheckpoint.load(self.filename)
+        self.assertEqual(200, checkpoint.current_step)
+        resumed = self._simulator(backend, streaming)
+        resumed.restore(checkpoint)
+        actual = self._collect(resumed())
+        for expected_samples, samples in zip(expected, actual):
+            self.assertTrue(len(samples) > 0)
+            for (expected_t, expected_x), (t, x) in zip(expected_samples[-len(samples):], samples):
+                self.assertEqual(expected_t, t)
+                numpy.testing.assert_array_equal(expected_x, x)
+
+    def test_resume(self):
+        self._check_resume("numpy")
+
+    def test_resume_stimulus(self):
+        self._check_resume("numpy", streaming=False)
+
+    def test_resume_streaming_stimulus(self):
+        self._check_resume("numpy", streaming=True)
+
+    @unittest.skipIf(not HAVE_NUMBA, "Numba unavailable")
+    def test_resume_numba(self):
+        self._check_resume("numba")
+
+    def test_fork(self):
+        sim = self._simulator()
+        sim.run(simulation_length=10.0)
+        checkpoint = sim.checkpoint()
+        forks = [self._simulator() for _ in range(2)]
+        outputs = []
+        for fork in forks:
+            fork.restore(checkpoint)
+            outputs.append(fork.run(simulation_length=5.0))
+        numpy.testing.assert_array_equal(outputs[0][0][1], outputs[1][0][1])
+        numpy.testing.assert_array_equal(sim.run(simulation_length=5.0)[0][1], outputs[0][0][1])
+
+
 
 def suite():
     """
@@ -197,6 +411,8 @@ def suite():
     """
     test_suite = unittest.TestSuite()
     test_suite.addTest(unittest.makeSuite(SimulatorTest))
+    test_suite.addTest(unittest.makeSuite(NumbaBackendTest))
+    test_suite.addTest(unittest.makeSuite(CheckpointTest))
     return test_suite
 
 
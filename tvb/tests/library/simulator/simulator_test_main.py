@@ -43,8 +43,10 @@ if __name__ == "__main__":
 
 
 import unittest
+from tvb.tests.library.simulator import batch_test
 from tvb.tests.library.simulator import common_test
 from tvb.tests.library.simulator import coupling_test
+from tvb.tests.library.simulator import farm_test
 from tvb.tests.library.simulator import integrators_test
 from tvb.tests.library.simulator import models_test
 from tvb.tests.library.simulator import monitors_test
@@ -59,8 +61,10 @@ def suite():
     Gather all the tests in a test suite.
     """
     test_suite = unittest.TestSuite()
+    test_suite.addTest(batch_test.suite())
     test_suite.addTest(common_test.suite())
     test_suite.addTest(coupling_test.suite())
+    test_suite.addTest(farm_test.suite())
     test_suite.addTest(integrators_test.suite())
     test_suite.addTest(history_test.suite())
     test_suite.addTest(models_test.suite())